@@ -0,0 +1,5 @@
+import time
+
+# Instante en que empezó a importarse la aplicación: el informe de arranque
+# (app/arranque.py) mide desde aquí la fase de importación.
+INICIO_IMPORTACION = time.perf_counter()
@@ -0,0 +1,276 @@
+# app/admision.py
+"""
+Control de admisión y descarte de carga por clase de ruta.
+
+Cada request HTTP se clasifica en `lectura` (GET/HEAD), `escritura` (el resto) o
+`lote` (exportaciones, importación, procesamiento, archivado y cambios masivos; ver
+`RUTAS_LOTE`). Cada clase tiene un `Limitador`: hasta `concurrencia` requests en
+curso y hasta `cola` esperando turno, cada uno como mucho `espera` segundos. Con la
+cola llena el request se rechaza al instante, y si se agota la espera también, con
+503 y `Retry-After`, en lugar de acumular requests que terminarían por el timeout
+del pool. Los límites por ruta de `ADMISION_LIMITES_RUTA` se aplican antes que los
+de la clase y rechazan con 429.
+
+Las rutas de lote usan además su propio pool de conexiones (`app.database.engine_lotes`),
+así que un trabajo pesado no deja sin conexiones a `GET /solicitudes/{id}`.
+
+Los límites son por worker. Las rutas de /internal y /health, la documentación y el flujo SSE de
+/api/eventos (conexiones largas que no usan la base) no pasan por aquí. Métricas:
+`admision_en_curso` y `admision_en_cola` (indicadores), `admision_rechazos` (por
+motivo) y `admision_espera_ms`; el estado actual está en `/internal/admision`.
+"""
+import asyncio
+import logging
+import math
+import re
+import time
+from collections import Counter, deque
+from typing import List, Optional
+
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+LECTURA = "lectura"
+ESCRITURA = "escritura"
+LOTE = "lote"
+
+METODOS_LECTURA = ("GET", "HEAD")
+
+# Diagnóstico, documentación y conexiones SSE de larga duración.
+PREFIJOS_EXENTOS = ("/internal", "/health", "/docs", "/redoc", "/openapi.json", "/api/eventos")
+
+RUTAS_LOTE = (
+    ("GET", "/api/solicitudes/export"),
+    ("GET", "/api/solicitudes/export/servicios"),
+    ("POST", "/api/solicitudes/bulk"),
+    ("PATCH", "/api/servicios/bulk"),
+    ("POST", "/api/procesar_solicitudes"),
+    ("POST", "/api/archivar_solicitudes"),
+)
+
+# Cota del Retry-After sugerido, en segundos.
+MAX_REINTENTO_SEGUNDOS = 60
+
+
+class Rechazado(Exception):
+    def __init__(self, limitador: "Limitador", motivo: str):
+        self.limitador = limitador
+        self.motivo = motivo
+        self.reintentar_en = limitador.reintentar_en()
+        super().__init__(f"{limitador.nombre}: {motivo}")
+
+
+class Limitador:
+    """
+    Semáforo con cola acotada y espera máxima. Vive en el event loop del worker, por lo
+    que no necesita locks. Al liberar, el turno pasa directo al primero de la cola.
+    """
+
+    def __init__(self, nombre: str, concurrencia: int, cola: int, espera: float, codigo: int = 503):
+        self.nombre = nombre
+        self.concurrencia = concurrencia
+        self.cola = cola
+        self.espera = espera
+        self.codigo = codigo
+        self.en_curso = 0
+        self.admitidos = 0
+        self.rechazos: Counter = Counter()
+        self._esperando: deque = deque()
+        # Media móvil de cuánto se ocupa un turno, para estimar el Retry-After.
+        self._duracion_media: Optional[float] = None
+
+    @property
+    def en_cola(self) -> int:
+        return len(self._esperando)
+
+    def reintentar_en(self) -> int:
+        """Segundos estimados hasta que se libere un turno para un request nuevo."""
+        duracion = self._duracion_media or 1.0
+        return max(1, min(MAX_REINTENTO_SEGUNDOS, math.ceil(duracion * (self.en_cola + 1) / self.concurrencia)))
+
+    async def adquirir(self) -> None:
+        if self.en_curso < self.concurrencia and not self._esperando:
+            self.en_curso += 1
+            self.admitidos += 1
+            self._indicadores()
+            return
+        if len(self._esperando) >= self.cola:
+            raise self._rechazar("cola_llena")
+
+        turno = asyncio.get_running_loop().create_future()
+        self._esperando.append(turno)
+        self._indicadores()
+        inicio = time.perf_counter()
+        try:
+            await asyncio.wait({turno}, timeout=self.espera)
+        except asyncio.CancelledError:  # el cliente se desconectó mientras esperaba
+            self._abandonar(turno)
+            raise
+        finally:
+            metricas.observar("admision_espera_ms", (time.perf_counter() - inicio) * 1000, limitador=self.nombre)
+        if not turno.done():
+            self._abandonar(turno)
+            raise self._rechazar("espera_agotada")
+        self.admitidos += 1
+
+    def liberar(self, duracion: Optional[float] = None) -> None:
+        if duracion is not None:
+            self._duracion_media = duracion if self._duracion_media is None else 0.8 * self._duracion_media + 0.2 * duracion
+        while self._esperando:
+            turno = self._esperando.popleft()
+            if not turno.done():
+                # El turno pasa al que espera: `en_curso` no cambia.
+                turno.set_result(None)
+                self._indicadores()
+                return
+        self.en_curso -= 1
+        self._indicadores()
+
+    def _abandonar(self, turno: asyncio.Future) -> None:
+        if turno.done():
+            # Recibió el turno a la vez que se rendía: se lo pasa al siguiente.
+            self.liberar()
+            return
+        turno.cancel()
+        self._esperando.remove(turno)
+        self._indicadores()
+
+    def _rechazar(self, motivo: str) -> Rechazado:
+        self.rechazos[motivo] += 1
+        metricas.incrementar("admision_rechazos", limitador=self.nombre, motivo=motivo)
+        return Rechazado(self, motivo)
+
+    def _indicadores(self) -> None:
+        metricas.fijar("admision_en_curso", self.en_curso, limitador=self.nombre)
+        metricas.fijar("admision_en_cola", len(self._esperando), limitador=self.nombre)
+
+    def estado(self) -> dict:
+        return {
+            "concurrencia": self.concurrencia,
+            "cola": self.cola,
+            "espera_segundos": self.espera,
+            "en_curso": self.en_curso,
+            "en_cola": self.en_cola,
+            "admitidos": self.admitidos,
+            "rechazos": dict(self.rechazos),
+            "duracion_media_s": round(self._duracion_media, 3) if self._duracion_media is not None else None,
+        }
+
+
+def _patron(ruta: str) -> re.Pattern:
+    """`/api/solicitudes/{id}` -> expresión que acepta cualquier valor en `{id}`."""
+    partes = re.split(r"\{[^/}]+\}", ruta.rstrip("/"))
+    return re.compile("^" + "[^/]+".join(re.escape(parte) for parte in partes) + "/?$")
+
+
+class Admision:
+    """Limitadores por clase y por ruta, y la clasificación de cada request."""
+
+    def __init__(self):
+        self.clases = {}
+        for clase, concurrencia, cola, espera in (
+            (LECTURA, settings.ADMISION_LECTURA_CONCURRENCIA, settings.ADMISION_LECTURA_COLA, settings.ADMISION_LECTURA_ESPERA_SEGUNDOS),
+            (ESCRITURA, settings.ADMISION_ESCRITURA_CONCURRENCIA, settings.ADMISION_ESCRITURA_COLA, settings.ADMISION_ESCRITURA_ESPERA_SEGUNDOS),
+            (LOTE, settings.ADMISION_LOTE_CONCURRENCIA, settings.ADMISION_LOTE_COLA, settings.ADMISION_LOTE_ESPERA_SEGUNDOS),
+        ):
+            if concurrencia > 0:
+                self.clases[clase] = Limitador(clase, concurrencia, cola, espera)
+        self.rutas_lote = {(metodo, ruta) for metodo, ruta in RUTAS_LOTE}
+        self.rutas = self._limites_ruta(settings.ADMISION_LIMITES_RUTA)
+
+    def _limites_ruta(self, configuracion: str) -> list:
+        """Lee "METODO /ruta=concurrencia[:cola]" separados por comas; omite (con aviso) los mal formados."""
+        rutas = []
+        for entrada in filter(None, (parte.strip() for parte in configuracion.split(","))):
+            try:
+                destino, limites = entrada.rsplit("=", 1)
+                metodo, ruta = destino.split()
+                concurrencia, _, cola = limites.partition(":")
+                metodo = metodo.upper()
+                clase = self.clasificar(metodo, ruta)
+                espera = self.clases[clase].espera if clase in self.clases else settings.ADMISION_LECTURA_ESPERA_SEGUNDOS
+                limitador = Limitador(f"{metodo} {ruta}", int(concurrencia), int(cola or 0), espera, codigo=429)
+            except ValueError:
+                logger.warning("Límite de admisión inválido en ADMISION_LIMITES_RUTA: %r", entrada)
+                continue
+            if limitador.concurrencia > 0:
+                rutas.append((metodo, _patron(ruta), limitador))
+        return rutas
+
+    def clasificar(self, metodo: str, ruta: str) -> Optional[str]:
+        """Clase del request, o None si está exento."""
+        if ruta.startswith(PREFIJOS_EXENTOS):
+            return None
+        if (metodo, ruta.rstrip("/")) in self.rutas_lote:
+            return LOTE
+        return LECTURA if metodo in METODOS_LECTURA else ESCRITURA
+
+    def limitadores(self, metodo: str, ruta: str) -> List[Limitador]:
+        """Limitadores que debe atravesar el request, en orden: los de su ruta y el de su clase."""
+        clase = self.clasificar(metodo, ruta)
+        if clase is None:
+            return []
+        limitadores = [limitador for m, patron, limitador in self.rutas if m == metodo and patron.match(ruta)]
+        if clase in self.clases:
+            limitadores.append(self.clases[clase])
+        return limitadores
+
+    def estado(self) -> dict:
+        return {
+            "activa": settings.ADMISION_ACTIVA,
+            "clases": {clase: limitador.estado() for clase, limitador in self.clases.items()},
+            "rutas": {limitador.nombre: limitador.estado() for _, _, limitador in self.rutas},
+        }
+
+
+admision = Admision()
+
+
+class ControlAdmision:
+    """Middleware ASGI: admite cada request según `admision` o lo rechaza con 503/429 y `Retry-After`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISION_ACTIVA:
+            await self.app(scope, receive, send)
+            return
+        limitadores = admision.limitadores(scope["method"], scope["path"])
+        if not limitadores:
+            await self.app(scope, receive, send)
+            return
+
+        adquiridos = []
+        try:
+            for limitador in limitadores:
+                await limitador.adquirir()
+                adquiridos.append(limitador)
+        except Rechazado as rechazo:
+            self._liberar(adquiridos)
+            respuesta = JSONResponse(
+                status_code=rechazo.limitador.codigo,
+                content={"detail": "El servicio está saturado; reintente más tarde.", "limitador": rechazo.limitador.nombre, "motivo": rechazo.motivo},
+                headers={"Retry-After": str(rechazo.reintentar_en)},
+            )
+            await respuesta(scope, receive, send)
+            return
+        except BaseException:
+            self._liberar(adquiridos)
+            raise
+
+        # El turno se conserva hasta terminar de enviar la respuesta (exportaciones en flujo incluidas).
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._liberar(adquiridos, time.perf_counter() - inicio)
+
+    @staticmethod
+    def _liberar(adquiridos: List[Limitador], duracion: Optional[float] = None) -> None:
+        for limitador in reversed(adquiridos):
+            limitador.liberar(duracion)
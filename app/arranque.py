@@ -0,0 +1,243 @@
+# app/arranque.py
+"""
+Arranque del worker, desde el lifespan de FastAPI (app/main.py).
+
+Importar la aplicación no toca la base de datos: los motores de SQLAlchemy no conectan
+hasta su primer uso y ya no se ejecuta DDL al importar. El lifespan recorre estas
+fases y mide cada una:
+
+1. `esquema`: según DB_ESQUEMA_MODO, comprueba sin DDL que existan las tablas y que la
+   base esté en la última migración de Alembic ('verificar'), las crea ('crear', para
+   desarrollo y pruebas) o no hace nada ('ninguno');
+2. `pool`: abre DB_POOL_PRECALENTAR conexiones en cada pool (principal, asíncrono,
+   lotes y réplicas), para que los primeros requests no paguen la conexión;
+3. `consultas`: ejecuta en cada una de esas conexiones las consultas de las rutas más
+   usadas, que quedan compiladas en la caché de SQLAlchemy y preparadas en la caché
+   de sentencias de la conexión (sqlite3, asyncpg);
+4. `tareas`: arranca el publicador de eventos y los programadores.
+
+Si la base no responde el arranque no falla: registra el error y el worker queda vivo
+(`/health/live`) pero no listo (`/health/ready`) hasta que la base responda y el
+esquema sea el esperado. El informe, con la fase de importación, está en
+`/internal/arranque`.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from alembic.script import ScriptDirectory
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from app import INICIO_IMPORTACION
+from app.config import settings
+from app.database import Base, async_engine, engine, engine_lotes
+from app.metricas import metricas
+from app.models import archivo, estadistica, evento, idempotencia, servicio, solicitud, tarea  # noqa: F401  (registra las tablas en Base.metadata)
+from app.replicas import replicas
+from app.services import solicitudes as servicio_solicitudes
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_MIGRACIONES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+MODOS_ESQUEMA = ("verificar", "crear", "ninguno")
+
+
+def revision_esperada() -> Optional[str]:
+    """Última revisión de Alembic del repositorio, o None si no están las migraciones."""
+    if not os.path.isdir(DIRECTORIO_MIGRACIONES):
+        return None
+    return ScriptDirectory(DIRECTORIO_MIGRACIONES).get_current_head()
+
+
+def verificar_esquema(conexion) -> List[str]:
+    """Diferencias entre la base y los modelos: tablas que faltan y migraciones pendientes."""
+    existentes = set(inspect(conexion).get_table_names())
+    problemas = [f"falta la tabla {tabla}" for tabla in sorted(set(Base.metadata.tables) - existentes)]
+    # Una base creada con create_all no tiene alembic_version: basta con las tablas.
+    if "alembic_version" in existentes:
+        actual = conexion.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        esperada = revision_esperada()
+        if esperada is not None and actual != esperada:
+            problemas.append(f"la base está en la revisión {actual} y se espera {esperada} (alembic upgrade head)")
+    return problemas
+
+
+def modo_esquema() -> str:
+    return settings.DB_ESQUEMA_MODO if settings.DB_ESQUEMA_MODO in MODOS_ESQUEMA else "verificar"
+
+
+def preparar_esquema(modo: str) -> List[str]:
+    if modo == "crear":
+        Base.metadata.create_all(bind=engine)
+        return []
+    if modo == "verificar":
+        with engine.connect() as conexion:
+            return verificar_esquema(conexion)
+    return []
+
+
+def consultas_frecuentes(conexion) -> int:
+    """
+    Ejecuta sobre `conexion` las consultas de detalle y del listado por defecto (sin
+    resultados que importen) y devuelve cuántas sentencias ejecutó.
+    """
+    ejecutadas = 0
+
+    def contar_sentencia(*_):
+        nonlocal ejecutadas
+        ejecutadas += 1
+
+    event.listen(conexion, "before_cursor_execute", contar_sentencia)
+    try:
+        with Session(bind=conexion) as db:
+            servicio_solicitudes.detalle(db, 0)
+            servicio_solicitudes.detalle(db, 0, archivada=True)
+            query, entidad = servicio_solicitudes.consulta_listado(db, False)
+            query = servicio_solicitudes.ordenar(db, query, "fecha_solicitud", "asc", None, entidad)
+            servicio_solicitudes.contar(db, query, "exacto")
+            query.offset(0).limit(10).all()
+    finally:
+        event.remove(conexion, "before_cursor_execute", contar_sentencia)
+    return ejecutadas
+
+
+class Arranque:
+    """Fases del arranque de este worker y estado para /health/ready."""
+
+    def __init__(self):
+        self.fases: Dict[str, float] = {}
+        self.errores: Dict[str, str] = {}
+        self.conexiones: Dict[str, int] = {}
+        self.sentencias_preparadas = 0
+        # None mientras el esquema no pudo comprobarse (p. ej. base caída al arrancar).
+        self.problemas_esquema: Optional[List[str]] = None
+        self.completo = False
+        self.apagando = False
+
+    @contextmanager
+    def fase(self, nombre: str):
+        """Mide la fase `nombre`; un error se registra y no interrumpe el arranque."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            logger.exception("Falló la fase '%s' del arranque", nombre)
+            self.errores[nombre] = str(e)
+        finally:
+            self.fases[nombre] = round((time.perf_counter() - inicio) * 1000, 2)
+            metricas.fijar("arranque_fase_ms", self.fases[nombre], fase=nombre)
+
+    def _motores(self) -> Dict[str, object]:
+        motores = {"principal": engine}
+        if async_engine is not None:
+            motores["async"] = async_engine
+        if engine_lotes is not engine:
+            motores["lotes"] = engine_lotes
+        for replica in replicas.replicas:
+            motores[replica.nombre] = replica.async_engine or replica.engine
+        return motores
+
+    async def _abrir(self, nombre: str, motor, cantidad: int) -> list:
+        conexiones = []
+        try:
+            for _ in range(cantidad):
+                conexiones.append(await motor.connect() if isinstance(motor, AsyncEngine) else await run_in_threadpool(motor.connect))
+        except Exception as e:
+            logger.warning("No se pudo precalentar el pool %s: %s", nombre, e)
+            self.errores[f"pool:{nombre}"] = str(e)
+        self.conexiones[nombre] = len(conexiones)
+        return conexiones
+
+    async def _preparar(self, nombre: str, conexion) -> None:
+        try:
+            if isinstance(conexion, AsyncConnection):
+                self.sentencias_preparadas += await conexion.run_sync(consultas_frecuentes)
+            else:
+                self.sentencias_preparadas += await run_in_threadpool(consultas_frecuentes, conexion)
+        except Exception as e:
+            logger.warning("No se pudieron preparar las consultas en %s: %s", nombre, e)
+            self.errores[f"consultas:{nombre}"] = str(e)
+
+    @staticmethod
+    async def _cerrar(conexion) -> None:
+        if isinstance(conexion, AsyncConnection):
+            await conexion.close()
+        else:
+            await run_in_threadpool(conexion.close)
+
+    async def iniciar(self) -> None:
+        """Fases de esquema, pool y consultas. La de tareas la ejecuta el lifespan con `fase`."""
+        self.fases["importacion"] = round((time.perf_counter() - INICIO_IMPORTACION) * 1000, 2)
+        metricas.fijar("arranque_fase_ms", self.fases["importacion"], fase="importacion")
+
+        if settings.DB_ESQUEMA_MODO not in MODOS_ESQUEMA:
+            logger.warning("DB_ESQUEMA_MODO=%r no es válido; se usa 'verificar'", settings.DB_ESQUEMA_MODO)
+        with self.fase("esquema"):
+            self.problemas_esquema = await run_in_threadpool(preparar_esquema, modo_esquema())
+            for problema in self.problemas_esquema:
+                logger.error("Esquema: %s", problema)
+
+        abiertas = {}
+        with self.fase("pool"):
+            for nombre, motor in self._motores().items():
+                # Los pools sin tamaño (SQLite en memoria) se precalientan con una conexión.
+                tamano = motor.pool.size() if isinstance(motor.pool, QueuePool) else 1
+                abiertas[nombre] = await self._abrir(nombre, motor, min(settings.DB_POOL_PRECALENTAR, tamano))
+        with self.fase("consultas"):
+            # Con un esquema incompleto las consultas fallarían: solo se abren las conexiones.
+            if self.problemas_esquema == []:
+                for nombre, conexiones in abiertas.items():
+                    for conexion in conexiones:
+                        await self._preparar(nombre, conexion)
+        # Al cerrarlas vuelven al pool, abiertas y con sus sentencias preparadas.
+        for conexiones in abiertas.values():
+            for conexion in conexiones:
+                await self._cerrar(conexion)
+
+    def terminar(self) -> None:
+        self.completo = True
+        self.fases["total"] = round((time.perf_counter() - INICIO_IMPORTACION) * 1000, 2)
+        logger.info(
+            "Arranque en %.0f ms (%s)",
+            self.fases["total"],
+            ", ".join(f"{nombre} {ms:.0f} ms" for nombre, ms in self.fases.items() if nombre != "total"),
+        )
+
+    def reverificar_esquema(self) -> None:
+        """
+        Repite la comprobación del esquema mientras no haya dado bien (base caída al
+        arrancar, migración aún no aplicada). Síncrona.
+        """
+        if self.problemas_esquema != []:
+            self.problemas_esquema = preparar_esquema(modo_esquema())
+            self.errores.pop("esquema", None)
+
+    def problemas(self) -> List[str]:
+        """Motivos por los que el worker no está listo, sin consultar la base."""
+        if self.apagando:
+            return ["el worker se está deteniendo"]
+        if not self.completo:
+            return ["el arranque no terminó"]
+        if self.problemas_esquema is None:
+            return ["no se pudo comprobar el esquema"]
+        return list(self.problemas_esquema)
+
+    def informe(self) -> dict:
+        return {
+            "completo": self.completo,
+            "fases_ms": self.fases,
+            "esquema": {"modo": modo_esquema(), "problemas": self.problemas_esquema},
+            "conexiones_precalentadas": self.conexiones,
+            "sentencias_preparadas": self.sentencias_preparadas,
+            "errores": self.errores,
+        }
+
+
+arranque = Arranque()
@@ -0,0 +1,306 @@
+# app/cache.py
+"""
+Caché de respuestas serializadas para las lecturas más frecuentes.
+
+Guarda los bytes JSON ya serializados junto con su ETag, en dos niveles:
+- un LRU en proceso con TTL (siempre), y
+- opcionalmente un backend compartido entre workers (Redis, o `BackendMemoria`
+  como sustituto local en pruebas).
+
+Las escrituras invalidan con precisión las claves de las solicitudes afectadas.
+Las claves llevan un contador de generación: una lectura que empezó antes de una
+invalidación no puede volver a guardar datos viejos.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional, Protocol
+
+from fastapi import Request, Response, status
+
+from app.config import settings
+from app.metricas import metricas
+
+
+class Entrada(NamedTuple):
+    contenido: bytes
+    etag: str
+
+
+def clave_solicitud(id_solicitud: int) -> str:
+    return f"solicitud:{id_solicitud}"
+
+
+def clave_servicios(id_solicitud: int) -> str:
+    return f"solicitud:{id_solicitud}:servicios"
+
+
+def claves_de_solicitud(id_solicitud: int):
+    return clave_solicitud(id_solicitud), clave_servicios(id_solicitud)
+
+
+def calcular_etag(contenido: bytes, version: Optional[int] = None) -> str:
+    """
+    ETag fuerte del contenido. Con `version` (la de la fila) queda `"<version>-<hash>"`:
+    If-Match en las escrituras toma la versión de ahí (ver `versiones_if_match`).
+    """
+    resumen = hashlib.sha1(contenido).hexdigest()
+    if version is None:
+        return f'"{resumen}"'
+    return f'"{version}-{resumen[:16]}"'
+
+
+class CacheLRU:
+    """LRU en proceso con TTL, seguro entre hilos."""
+
+    def __init__(self, max_entradas: int, ttl_segundos: float):
+        self.max_entradas = max_entradas
+        self.ttl = ttl_segundos
+        self._datos: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave: str) -> Optional[Entrada]:
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                return None
+            entrada, expira = item
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return entrada
+
+    def set(self, clave: str, entrada: Entrada, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._datos[clave] = (entrada, time.monotonic() + (ttl or self.ttl))
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                metricas.incrementar("cache_desalojos")
+
+    def delete(self, *claves: str) -> None:
+        with self._lock:
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+
+class BackendCompartido(Protocol):
+    """Interfaz mínima de un backend de caché compartido entre workers."""
+
+    def get(self, clave: str) -> Optional[bytes]: ...
+    def set(self, clave: str, valor: bytes, ttl_segundos: float) -> None: ...
+    def delete(self, *claves: str) -> None: ...
+    def clear(self) -> None: ...
+
+
+class BackendMemoria:
+    """Backend compartido en memoria: sustituto local de Redis para pruebas."""
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None or item[1] < time.monotonic():
+                self._datos.pop(clave, None)
+                return None
+            return item[0]
+
+    def set(self, clave: str, valor: bytes, ttl_segundos: float) -> None:
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + ttl_segundos)
+
+    def delete(self, *claves: str) -> None:
+        with self._lock:
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+
+class BackendRedis:
+    """Backend compartido sobre Redis. Requiere el paquete opcional `redis`."""
+
+    PREFIJO = "api-cache:"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:  # pragma: no cover - dependencia opcional
+            raise RuntimeError("CACHE_URL requiere el paquete 'redis' (pip install redis).") from e
+        self._cliente = redis.Redis.from_url(url)
+
+    def get(self, clave: str) -> Optional[bytes]:
+        return self._cliente.get(self.PREFIJO + clave)
+
+    def set(self, clave: str, valor: bytes, ttl_segundos: float) -> None:
+        self._cliente.set(self.PREFIJO + clave, valor, px=int(ttl_segundos * 1000))
+
+    def delete(self, *claves: str) -> None:
+        if claves:
+            self._cliente.delete(*(self.PREFIJO + c for c in claves))
+
+    def clear(self) -> None:
+        for clave in self._cliente.scan_iter(self.PREFIJO + "*"):
+            self._cliente.delete(clave)
+
+
+class CacheRespuestas:
+    def __init__(
+        self,
+        max_entradas: int,
+        ttl_segundos: float,
+        compartido: Optional[BackendCompartido] = None,
+        ttl_local_segundos: Optional[float] = None,
+        activa: bool = True,
+    ):
+        self.activa = activa
+        self.ttl = ttl_segundos
+        ttl_local = min(ttl_segundos, ttl_local_segundos) if compartido and ttl_local_segundos else ttl_segundos
+        self.local = CacheLRU(max_entradas, ttl_local)
+        self.compartido = compartido
+        self.max_entradas = max_entradas
+        # Generación por clave invalidada más una época global (vaciado completo).
+        self._epoca = 0
+        self._generaciones = {}
+        self._lock = threading.Lock()
+
+    def generacion(self, clave: str) -> tuple:
+        with self._lock:
+            return self._epoca, self._generaciones.get(clave, 0)
+
+    def obtener(self, clave: str) -> Optional[Entrada]:
+        if not self.activa:
+            return None
+        entrada = self.local.get(clave)
+        if entrada is None and self.compartido is not None:
+            crudo = self.compartido.get(clave)
+            if crudo is not None:
+                etag, _, contenido = crudo.partition(b"\n")
+                entrada = Entrada(contenido, etag.decode())
+                self.local.set(clave, entrada)
+        metricas.incrementar("cache_aciertos" if entrada is not None else "cache_fallos")
+        return entrada
+
+    def guardar(self, clave: str, contenido: bytes, generacion: Optional[tuple] = None, version: Optional[int] = None) -> Entrada:
+        """
+        Guarda `contenido` y devuelve la entrada con su ETag. Si se indica la
+        `generacion` leída antes de consultar la base y la clave se invalidó desde
+        entonces, no se guarda (los datos podrían ser anteriores a la escritura).
+        """
+        entrada = Entrada(contenido, calcular_etag(contenido, version))
+        if not self.activa or (generacion is not None and generacion != self.generacion(clave)):
+            return entrada
+        self.local.set(clave, entrada)
+        if self.compartido is not None:
+            self.compartido.set(clave, entrada.etag.encode() + b"\n" + contenido, self.ttl)
+        return entrada
+
+    def invalidar(self, *claves: str) -> None:
+        with self._lock:
+            if len(self._generaciones) > 4 * self.max_entradas:
+                # Acota la memoria: una época nueva invalida también las lecturas en curso.
+                self._epoca += 1
+                self._generaciones.clear()
+            for clave in claves:
+                self._generaciones[clave] = self._generaciones.get(clave, 0) + 1
+        self.local.delete(*claves)
+        if self.compartido is not None:
+            self.compartido.delete(*claves)
+        metricas.incrementar("cache_invalidaciones", len(claves))
+
+    def invalidar_solicitudes(self, ids: Optional[Iterable[int]]) -> None:
+        """Invalida las lecturas de las solicitudes `ids`; con None vacía la caché completa."""
+        if ids is None:
+            self.limpiar()
+            return
+        claves = [clave for id_solicitud in ids for clave in claves_de_solicitud(id_solicitud)]
+        if claves:
+            self.invalidar(*claves)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            # Toda lectura en curso queda invalidada.
+            self._epoca += 1
+            self._generaciones.clear()
+        self.local.clear()
+        if self.compartido is not None:
+            self.compartido.clear()
+
+    def estadisticas(self) -> dict:
+        return {
+            "activa": self.activa,
+            "entradas_locales": len(self.local),
+            "backend_compartido": type(self.compartido).__name__ if self.compartido else None,
+            "aciertos": metricas.contador("cache_aciertos"),
+            "fallos": metricas.contador("cache_fallos"),
+            "desalojos": metricas.contador("cache_desalojos"),
+            "invalidaciones": metricas.contador("cache_invalidaciones"),
+        }
+
+
+def coincide_etag(request: Request, etag: str) -> bool:
+    """True si el encabezado If-None-Match del cliente incluye `etag` (o es '*')."""
+    valor = request.headers.get("if-none-match")
+    if not valor:
+        return False
+    candidatos = [c.strip() for c in valor.split(",")]
+    return "*" in candidatos or any(c.removeprefix("W/") == etag for c in candidatos)
+
+
+def versiones_if_match(request: Request) -> Optional[List[int]]:
+    """
+    Versiones de fila que acepta el encabezado If-Match, tomadas de ETags `"<version>"`
+    o `"<version>-<hash>"`. None si no hay encabezado o es '*'. Una lista vacía (solo
+    ETags débiles o ajenos) no coincide con ninguna versión.
+    """
+    valor = request.headers.get("if-match")
+    if not valor:
+        return None
+    candidatos = [c.strip() for c in valor.split(",")]
+    if "*" in candidatos:
+        return None
+    versiones = []
+    for candidato in candidatos:
+        # If-Match usa comparación fuerte: los ETags débiles nunca coinciden.
+        if candidato.startswith("W/"):
+            continue
+        prefijo = candidato.strip('"').split("-", 1)[0]
+        if prefijo.isdigit():
+            versiones.append(int(prefijo))
+    return versiones
+
+
+def respuesta_json(request: Request, entrada: Entrada) -> Response:
+    """200 con los bytes cacheados, o 304 sin cuerpo si el cliente ya tiene esa versión."""
+    headers = {"ETag": entrada.etag, "Cache-Control": "no-cache"}
+    if coincide_etag(request, entrada.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entrada.contenido, media_type="application/json", headers=headers)
+
+
+def crear_cache() -> CacheRespuestas:
+    compartido = BackendRedis(settings.CACHE_URL) if settings.CACHE_URL else None
+    return CacheRespuestas(
+        max_entradas=settings.CACHE_MAX_ENTRADAS,
+        ttl_segundos=settings.CACHE_TTL_SEGUNDOS,
+        compartido=compartido,
+        ttl_local_segundos=settings.CACHE_TTL_LOCAL_SEGUNDOS,
+        activa=settings.CACHE_ACTIVA,
+    )
+
+
+cache_respuestas = crear_cache()
@@ -2,7 +2,125 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+def _url_async(url: str) -> str:
+    """Deriva la URL del driver asíncrono equivalente (asyncpg / aiosqlite)."""
+    if not url:
+        return url
+    esquema, separador, resto = url.partition("://")
+    dialecto = esquema.split("+")[0]
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}.get(dialecto)
+    return f"{dialecto}+{driver}{separador}{resto}" if driver else url
+
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL")
 
+    # Pool de conexiones (app/pool.py). Se aplica al motor síncrono y al asíncrono.
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # Segundos que un request espera una conexión libre antes de fallar.
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # Segundos tras los que se reemplaza una conexión (-1: nunca); útil detrás de firewalls o PgBouncer.
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Tiempo máximo por sentencia en PostgreSQL (0: sin límite). Se fija con SET LOCAL en
+    # cada transacción de la sesión; una sesión puede cambiarlo con
+    # session.info["statement_timeout_ms"].
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    # Pool aparte para los trabajos por lotes (exportaciones, importación, procesamiento,
+    # archivado, tareas programadas), para que no ocupen las conexiones de las lecturas.
+    # Cada trabajo usa hasta dos conexiones (en PostgreSQL, la del advisory lock de
+    # app/services/coordinacion.py y la de su sesión) y por worker puede haber a la vez
+    # las 5 tareas del programador y ADMISION_LOTE_CONCURRENCIA rutas de lote:
+    # 2 x (5 + 2) = 14 = DB_POOL_LOTES_SIZE + DB_POOL_LOTES_MAX_OVERFLOW.
+    DB_POOL_LOTES_SIZE: int = int(os.getenv("DB_POOL_LOTES_SIZE", "4"))
+    DB_POOL_LOTES_MAX_OVERFLOW: int = int(os.getenv("DB_POOL_LOTES_MAX_OVERFLOW", "10"))
+
+    # Control de admisión por clase de ruta (app/admision.py): requests en curso, en
+    # espera y segundos máximos de espera por clase. Concurrencia 0: sin límite.
+    ADMISION_ACTIVA: bool = os.getenv("ADMISION_ACTIVA", "true").lower() == "true"
+    ADMISION_LECTURA_CONCURRENCIA: int = int(os.getenv("ADMISION_LECTURA_CONCURRENCIA", "32"))
+    ADMISION_LECTURA_COLA: int = int(os.getenv("ADMISION_LECTURA_COLA", "128"))
+    ADMISION_LECTURA_ESPERA_SEGUNDOS: float = float(os.getenv("ADMISION_LECTURA_ESPERA_SEGUNDOS", "5"))
+    # Por debajo de DB_POOL_SIZE + DB_MAX_OVERFLOW: las conexiones restantes quedan para las lecturas.
+    ADMISION_ESCRITURA_CONCURRENCIA: int = int(os.getenv("ADMISION_ESCRITURA_CONCURRENCIA", "8"))
+    ADMISION_ESCRITURA_COLA: int = int(os.getenv("ADMISION_ESCRITURA_COLA", "64"))
+    ADMISION_ESCRITURA_ESPERA_SEGUNDOS: float = float(os.getenv("ADMISION_ESCRITURA_ESPERA_SEGUNDOS", "5"))
+    ADMISION_LOTE_CONCURRENCIA: int = int(os.getenv("ADMISION_LOTE_CONCURRENCIA", "2"))
+    ADMISION_LOTE_COLA: int = int(os.getenv("ADMISION_LOTE_COLA", "2"))
+    ADMISION_LOTE_ESPERA_SEGUNDOS: float = float(os.getenv("ADMISION_LOTE_ESPERA_SEGUNDOS", "10"))
+    # Límites adicionales por ruta: "METODO /ruta=concurrencia[:cola]" separados por comas,
+    # p. ej. "GET /api/solicitudes/export=1,POST /api/procesar_solicitudes=1:0".
+    ADMISION_LIMITES_RUTA: str = os.getenv("ADMISION_LIMITES_RUTA", "")
+
+    # Arranque (app/arranque.py). Esquema al arrancar: 'verificar' (tablas y revisión de
+    # Alembic, sin DDL), 'crear' (create_all, para desarrollo y pruebas) o 'ninguno'.
+    DB_ESQUEMA_MODO: str = os.getenv("DB_ESQUEMA_MODO", "verificar")
+    # Conexiones que se abren en cada pool al arrancar (0: ninguna).
+    DB_POOL_PRECALENTAR: int = int(os.getenv("DB_POOL_PRECALENTAR", str(DB_POOL_SIZE)))
+    # Segundos máximos de la comprobación de la base en /health/ready.
+    SALUD_TIMEOUT_SEGUNDOS: float = float(os.getenv("SALUD_TIMEOUT_SEGUNDOS", "2"))
+
+    # Conteo de consultas SQL por request (app/instrumentacion.py)
+    CONSULTAS_INSTRUMENTACION: bool = os.getenv("CONSULTAS_INSTRUMENTACION", "true").lower() == "true"
+    # Veces que una misma forma de sentencia debe repetirse en un request para marcarlo como N+1.
+    CONSULTAS_UMBRAL_N_MAS_1: int = int(os.getenv("CONSULTAS_UMBRAL_N_MAS_1", "5"))
+    # Consultas permitidas por request (0: sin límite). En modo estricto superarlo hace fallar el request.
+    CONSULTAS_PRESUPUESTO: int = int(os.getenv("CONSULTAS_PRESUPUESTO", "0"))
+    CONSULTAS_MODO_ESTRICTO: bool = os.getenv("CONSULTAS_MODO_ESTRICTO", "false").lower() == "true"
+
+    # Programador del procesamiento de vencidos (app/programador.py)
+    PROGRAMADOR_ACTIVO: bool = os.getenv("PROGRAMADOR_ACTIVO", "true").lower() == "true"
+    PROGRAMADOR_INTERVALO_SEGUNDOS: float = float(os.getenv("PROGRAMADOR_INTERVALO_SEGUNDOS", "60"))
+    # Duración del lease de la tarea (motores sin advisory locks); se renueva entre lotes.
+    PROGRAMADOR_LEASE_SEGUNDOS: float = float(os.getenv("PROGRAMADOR_LEASE_SEGUNDOS", "300"))
+    # Cada cuánto se aplican al resumen de GET /api/estadisticas los buckets marcados por las escrituras.
+    ESTADISTICAS_INTERVALO_SEGUNDOS: float = float(os.getenv("ESTADISTICAS_INTERVALO_SEGUNDOS", "10"))
+
+    # Acceso asíncrono a la base de datos (AsyncEngine/AsyncSession) en los routers.
+    DB_MODO_ASYNC: bool = os.getenv("DB_MODO_ASYNC", "false").lower() == "true"
+    ASYNC_DATABASE_URL: str = os.getenv("ASYNC_DATABASE_URL") or _url_async(DATABASE_URL)
+
+    # Réplicas de lectura (app/replicas.py): URLs separadas por comas. Vacío: todo va a la primaria.
+    DB_REPLICA_URLS: list = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+    # 'turno' (round-robin) o 'menos_ocupada' (menos conexiones en uso en su pool).
+    DB_REPLICA_SELECCION: str = os.getenv("DB_REPLICA_SELECCION", "turno")
+    # Segundos que una réplica con errores de conexión queda fuera de la rotación.
+    DB_REPLICA_REINTENTO_SEGUNDOS: float = float(os.getenv("DB_REPLICA_REINTENTO_SEGUNDOS", "30"))
+    # Cota del retraso de replicación: durante este tiempo tras una escritura, las lecturas
+    # que envían su token (X-Token-Lectura) van a la primaria.
+    DB_REPLICA_VENTANA_RYW_SEGUNDOS: float = float(os.getenv("DB_REPLICA_VENTANA_RYW_SEGUNDOS", "5"))
+
+    # Caché de respuestas de lectura (app/cache.py)
+    CACHE_ACTIVA: bool = os.getenv("CACHE_ACTIVA", "true").lower() == "true"
+    CACHE_TTL_SEGUNDOS: float = float(os.getenv("CACHE_TTL_SEGUNDOS", "60"))
+    CACHE_MAX_ENTRADAS: int = int(os.getenv("CACHE_MAX_ENTRADAS", "10000"))
+    # Backend compartido opcional entre workers (p. ej. redis://localhost:6379/0).
+    CACHE_URL: str = os.getenv("CACHE_URL")
+    # Con backend compartido, la copia local de cada worker vive poco: las invalidaciones
+    # de otros workers solo llegan al backend compartido.
+    CACHE_TTL_LOCAL_SEGUNDOS: float = float(os.getenv("CACHE_TTL_LOCAL_SEGUNDOS", "2"))
+
+    # Archivado de solicitudes finalizadas (app/services/archivo.py)
+    # Días desde la última modificación de una solicitud Cerrada/Cancelada para archivarla; 0 lo desactiva.
+    ARCHIVO_DIAS: int = int(os.getenv("ARCHIVO_DIAS", "90"))
+    ARCHIVO_INTERVALO_SEGUNDOS: float = float(os.getenv("ARCHIVO_INTERVALO_SEGUNDOS", "3600"))
+    ARCHIVO_TAMANO_LOTE: int = int(os.getenv("ARCHIVO_TAMANO_LOTE", "500"))
+
+    # Idempotency-Key en los POST de creación (app/services/idempotencia.py): cuánto se
+    # guarda la respuesta para repetirla a los reintentos.
+    IDEMPOTENCIA_TTL_SEGUNDOS: float = float(os.getenv("IDEMPOTENCIA_TTL_SEGUNDOS", "86400"))
+
+    # Flujo de eventos GET /api/eventos (app/eventos.py)
+    # Cada cuánto el publicador de cada worker lee los eventos nuevos.
+    EVENTOS_INTERVALO_SEGUNDOS: float = float(os.getenv("EVENTOS_INTERVALO_SEGUNDOS", "0.5"))
+    # Antigüedad máxima de los eventos guardados para reanudar con Last-Event-ID.
+    EVENTOS_RETENCION_SEGUNDOS: float = float(os.getenv("EVENTOS_RETENCION_SEGUNDOS", "3600"))
+    EVENTOS_LATIDO_SEGUNDOS: float = float(os.getenv("EVENTOS_LATIDO_SEGUNDOS", "15"))
+    # Eventos pendientes por conexión; al superarlos la conexión se cierra y el cliente reanuda.
+    EVENTOS_MAX_COLA: int = int(os.getenv("EVENTOS_MAX_COLA", "1000"))
+    # Eventos máximos que se reenvían al reanudar; más allá el cliente debe recargar.
+    EVENTOS_MAX_REANUDACION: int = int(os.getenv("EVENTOS_MAX_REANUDACION", "10000"))
+    # Espera ante un hueco de ids (transacción aún sin confirmar) antes de saltarlo.
+    EVENTOS_ESPERA_HUECO_SEGUNDOS: float = float(os.getenv("EVENTOS_ESPERA_HUECO_SEGUNDOS", "2"))
+
 settings = Settings()
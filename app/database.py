@@ -1,18 +1,141 @@
-from sqlalchemy import create_engine
+from typing import Union
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
-from dotenv import load_dotenv
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+from app.pool import opciones_motor, registrar_errores
+from app.replicas import CABECERA_TOKEN, replicas
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+DATABASE_URL = settings.DATABASE_URL
+engine = create_engine(DATABASE_URL, **opciones_motor(DATABASE_URL))
+registrar_errores(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Motor de los trabajos por lotes: su propio pool, para que una exportación o el
+# procesamiento no dejen sin conexiones a las lecturas interactivas. Una base SQLite en
+# memoria existe solo dentro de su motor, así que ahí se comparte el principal.
+if opciones_motor(DATABASE_URL):
+    engine_lotes = create_engine(
+        DATABASE_URL,
+        **opciones_motor(DATABASE_URL, "lotes", tamano=settings.DB_POOL_LOTES_SIZE, desbordamiento=settings.DB_POOL_LOTES_MAX_OVERFLOW),
+    )
+    registrar_errores(engine_lotes)
+else:
+    engine_lotes = engine
+SessionLotes = sessionmaker(autocommit=False, autoflush=False, bind=engine_lotes)
 Base = declarative_base()
 
-def get_db():
+# Modo asíncrono (DB_MODO_ASYNC=true): los routers usan AsyncSession sobre un AsyncEngine
+# y no ocupan hilos del threadpool mientras esperan a la base de datos.
+# expire_on_commit=False porque fuera de la sesión no se puede recargar un atributo expirado.
+async_engine = (
+    create_async_engine(settings.ASYNC_DATABASE_URL, **opciones_motor(settings.ASYNC_DATABASE_URL, "async", asincrono=True))
+    if settings.DB_MODO_ASYNC
+    else None
+)
+if async_engine is not None:
+    registrar_errores(async_engine.sync_engine)
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if async_engine is not None else None
+)
+
+SesionBD = Union[Session, AsyncSession]
+
+
+# Las AsyncSession delegan en una Session interna, así que este evento cubre ambos modos.
+@event.listens_for(Session, "after_begin")
+def _aplicar_statement_timeout(session, transaccion, conexion):
+    """Fija statement_timeout para la transacción que empieza (solo PostgreSQL)."""
+    if conexion.dialect.name != "postgresql":
+        return
+    milisegundos = session.info.get("statement_timeout_ms", settings.DB_STATEMENT_TIMEOUT_MS)
+    if milisegundos or "statement_timeout_ms" in session.info:
+        conexion.exec_driver_sql(f"SET LOCAL statement_timeout = {int(milisegundos)}")
+
+
+async def get_db():
+    """Sesión de base de datos por request: `AsyncSession` en modo asíncrono, `Session` si no."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        await run_in_threadpool(db.close)
+
+
+async def get_db_lotes():
+    """
+    Sesión síncrona del pool de lotes (`engine_lotes`) para las rutas de trabajos
+    masivos, también en modo asíncrono: se usa con `ejecutar`, que la corre en el threadpool.
+    """
+    db = SessionLotes()
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+
+async def get_db_lectura(request: Request):
+    """
+    Sesión para rutas de solo lectura: de una réplica (ver `app/replicas.py`) o de la
+    primaria si no hay réplicas sanas o el request trae un token de escritura reciente.
+    """
+    replica = replicas.elegir(request.headers.get(CABECERA_TOKEN))
+    if replica is not None:
+        # La conexión se abre aquí (la usaría igual la primera consulta) para que una
+        # réplica caída se descarte en este mismo request en lugar de hacerlo fallar.
+        if replica.sesiones_async is not None:
+            db = replica.sesiones_async()
+            try:
+                await db.connection()
+            except exc.DBAPIError:
+                await db.close()
+            else:
+                async with db:
+                    yield db
+                return
+        else:
+            db = replica.sesiones()
+            try:
+                await run_in_threadpool(db.connection)
+            except exc.DBAPIError:
+                await run_in_threadpool(db.close)
+            else:
+                try:
+                    yield db
+                finally:
+                    await run_in_threadpool(db.close)
+                return
+    async for db in get_db():
+        yield db
+
+
+def fabrica_lectura(request: Request) -> sessionmaker:
+    """Fábrica de sesiones síncronas de solo lectura, con la misma elección que `get_db_lectura`."""
+    replica = replicas.elegir(request.headers.get(CABECERA_TOKEN))
+    return SessionLocal if replica is None else replica.sesiones
+
+
+def fabrica_lotes(request: Request) -> sessionmaker:
+    """Como `fabrica_lectura`, pero sin réplica disponible usa el pool de lotes en lugar del principal."""
+    replica = replicas.elegir(request.headers.get(CABECERA_TOKEN))
+    return SessionLotes if replica is None else replica.sesiones
+
+
+async def ejecutar(db: SesionBD, fn, *args, **kwargs):
+    """
+    Ejecuta `fn(session, *args, **kwargs)`, escrita con la API síncrona del ORM, sin
+    bloquear el event loop: con `AsyncSession` mediante `run_sync` (la E/S se espera
+    de forma asíncrona en el mismo hilo) y con `Session` en el threadpool.
+
+    `fn` debe devolver datos ya cargados (esquemas Pydantic, dicts, ids): fuera de ella
+    no hay carga perezosa de relaciones en modo asíncrono.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
@@ -0,0 +1,175 @@
+# app/eventos.py
+"""
+Publicador del flujo de eventos (GET /api/eventos, Server-Sent Events).
+
+Cada worker tiene un único `Publicador`: una tarea asyncio que, mientras haya
+conexiones abiertas, lee cada `EVENTOS_INTERVALO_SEGUNDOS` los eventos nuevos de la
+tabla `eventos` (una consulta por worker, sin importar cuántas conexiones haya) y los
+copia a la cola de cada `Suscripcion` cuyos filtros aceptan el evento.
+
+Los eventos se reparten en orden de id. Una transacción que todavía no confirmó puede
+tener un id menor que otra ya confirmada: ante un hueco, el publicador espera hasta
+`EVENTOS_ESPERA_HUECO_SEGUNDOS` a que aparezca (si no, era un id descartado por un
+rollback), de modo que un cliente que reanuda con `Last-Event-ID` no pierde eventos.
+
+Una conexión cuya cola se llena (cliente lento) se cierra; el cliente reconecta con
+su `Last-Event-ID` y recupera lo perdido desde la tabla.
+"""
+import asyncio
+import logging
+import time
+from typing import List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metricas import metricas
+from app.services import eventos
+
+logger = logging.getLogger(__name__)
+
+# Eventos leídos de la tabla por consulta.
+TAMANO_LECTURA = 1000
+
+
+class Suscripcion:
+    """Cola y filtros de una conexión SSE."""
+
+    def __init__(self, cliente: Optional[str] = None, ids_solicitud: Optional[List[int]] = None):
+        self.cliente = cliente
+        self.ids_solicitud = set(ids_solicitud) if ids_solicitud else None
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTOS_MAX_COLA)
+        # True si se descartaron eventos por cola llena o el publicador se detuvo.
+        self.cerrada = False
+
+    def acepta(self, evento: dict) -> bool:
+        if self.cliente is not None and evento["cliente"] != self.cliente:
+            return False
+        return self.ids_solicitud is None or evento["id_solicitud"] in self.ids_solicitud
+
+    def entregar(self, evento: dict) -> None:
+        if self.cerrada or not self.acepta(evento):
+            return
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.cerrar()
+            metricas.incrementar("eventos_suscripciones_desbordadas")
+
+    def cerrar(self) -> None:
+        self.cerrada = True
+        # Despierta al consumidor si está esperando; si la cola está llena ya tiene qué leer.
+        try:
+            self.cola.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+def _leer(desde_id: int, limite: int, hasta_id: Optional[int] = None) -> List[dict]:
+    with SessionLocal() as db:
+        return eventos.leer(db, desde_id, limite, hasta_id)
+
+
+def _extremos():
+    with SessionLocal() as db:
+        return eventos.extremos(db)
+
+
+class Publicador:
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self.suscripciones: Set[Suscripcion] = set()
+        # Último id repartido; None mientras no hay suscripciones.
+        self.cursor: Optional[int] = None
+        self._hueco_desde: Optional[float] = None
+        self._inicializando = asyncio.Lock()
+        self._tarea_asyncio: Optional[asyncio.Task] = None
+
+    @property
+    def activo(self) -> bool:
+        return self._tarea_asyncio is not None and not self._tarea_asyncio.done()
+
+    def iniciar(self) -> None:
+        if not self.activo:
+            self._tarea_asyncio = asyncio.create_task(self._bucle())
+
+    async def detener(self) -> None:
+        for suscripcion in list(self.suscripciones):
+            suscripcion.cerrar()
+        if self._tarea_asyncio is None:
+            return
+        self._tarea_asyncio.cancel()
+        try:
+            await self._tarea_asyncio
+        except asyncio.CancelledError:
+            pass
+        self._tarea_asyncio = None
+
+    async def suscribir(self, suscripcion: Suscripcion) -> int:
+        """
+        Registra `suscripcion` y devuelve el cursor actual: los eventos con id mayor
+        llegarán a su cola; los anteriores se leen con `historial`.
+        """
+        async with self._inicializando:
+            if self.cursor is None:
+                self.cursor = (await run_in_threadpool(_extremos))[1] or 0
+                self._hueco_desde = None
+            self.suscripciones.add(suscripcion)
+        metricas.fijar("eventos_suscripciones", len(self.suscripciones))
+        return self.cursor
+
+    def desuscribir(self, suscripcion: Suscripcion) -> None:
+        self.suscripciones.discard(suscripcion)
+        metricas.fijar("eventos_suscripciones", len(self.suscripciones))
+
+    async def historial(self, desde_id: int, hasta_id: int):
+        """
+        Eventos en (desde_id, hasta_id] para reanudar una conexión. None si parte de ese
+        rango ya se podó o excede EVENTOS_MAX_REANUDACION: el cliente debe recargar.
+        """
+        if desde_id >= hasta_id:
+            return []
+        minimo, _ = await run_in_threadpool(_extremos)
+        if minimo is None or minimo > desde_id + 1:
+            return None
+        filas = await run_in_threadpool(_leer, desde_id, settings.EVENTOS_MAX_REANUDACION + 1, hasta_id)
+        return filas if len(filas) <= settings.EVENTOS_MAX_REANUDACION else None
+
+    async def publicar_pendientes(self) -> int:
+        """Lee los eventos nuevos y los reparte. Devuelve cuántos repartió."""
+        filas = await run_in_threadpool(_leer, self.cursor, TAMANO_LECTURA)
+        repartidos = 0
+        for evento in filas:
+            if evento["id"] != self.cursor + 1:
+                # Hueco: puede ser una transacción con id menor aún sin confirmar.
+                if self._hueco_desde is None:
+                    self._hueco_desde = time.monotonic()
+                if time.monotonic() - self._hueco_desde < settings.EVENTOS_ESPERA_HUECO_SEGUNDOS:
+                    break
+            self._hueco_desde = None
+            self.cursor = evento["id"]
+            for suscripcion in list(self.suscripciones):
+                suscripcion.entregar(evento)
+            repartidos += 1
+        if repartidos:
+            metricas.incrementar("eventos_publicados", repartidos)
+        return repartidos
+
+    async def _bucle(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo)
+            if not self.suscripciones:
+                # Sin conexiones no se lee; la próxima suscripción parte del último id.
+                self.cursor = None
+                continue
+            try:
+                while await self.publicar_pendientes() == TAMANO_LECTURA:
+                    pass
+            except Exception:
+                # Un error transitorio de la base no debe detener el publicador.
+                logger.exception("Error al publicar eventos")
+                metricas.incrementar("eventos_errores_publicador")
+
+
+publicador = Publicador(settings.EVENTOS_INTERVALO_SEGUNDOS)
@@ -0,0 +1,195 @@
+# app/instrumentacion.py
+"""
+Conteo de consultas SQL por request y detección de patrones N+1.
+
+Los eventos `before/after_cursor_execute` de SQLAlchemy (registrados sobre la clase
+`Engine`, por lo que cubren todos los motores, incluido el `sync_engine` del modo
+asíncrono) anotan cada sentencia en las estadísticas del request en curso, que viven
+en una ContextVar fijada por `InstrumentacionConsultas`. Ese middleware ASGI añade
+la cabecera `Server-Timing`, alimenta histogramas por ruta en `app.metricas` y
+registra las formas de sentencia repetidas (sospechas de N+1).
+
+Con `CONSULTAS_PRESUPUESTO` > 0 un request que lo supera se reporta; si además
+`CONSULTAS_MODO_ESTRICTO=true` (pensado para tests) la consulta que lo excede lanza
+`PresupuestoConsultasExcedido` y el request falla con 500.
+"""
+import logging
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+# Últimos requests con formas repetidas, para /internal/consultas.
+SOSPECHAS_N_MAS_1: deque = deque(maxlen=50)
+
+
+class PresupuestoConsultasExcedido(RuntimeError):
+    def __init__(self, estadisticas: "EstadisticasConsultas"):
+        self.estadisticas = estadisticas
+        super().__init__(
+            f"El request superó el presupuesto de {estadisticas.presupuesto} consultas SQL."
+        )
+
+
+_RE_LISTA_PARAMETROS = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_RE_PARAMETRO = re.compile(r"%\(\w+\)s|\$\d+|%s")
+_RE_CADENA = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+def forma_sentencia(sentencia: str) -> str:
+    """
+    Normaliza una sentencia para agrupar las que solo difieren en sus valores:
+    literales y parámetros pasan a `?` y las listas `IN (...)` expandidas a `(?)`.
+    """
+    forma = _RE_ESPACIOS.sub(" ", sentencia).strip()
+    forma = _RE_CADENA.sub("?", forma)
+    forma = _RE_PARAMETRO.sub("?", forma)
+    forma = _RE_NUMERO.sub("?", forma)
+    return _RE_LISTA_PARAMETROS.sub("(?)", forma)
+
+
+class EstadisticasConsultas:
+    __slots__ = ("consultas", "tiempo_db_ms", "formas", "presupuesto")
+
+    def __init__(self, presupuesto: int = 0):
+        self.consultas = 0
+        self.tiempo_db_ms = 0.0
+        self.formas: Counter = Counter()
+        self.presupuesto = presupuesto
+
+    def registrar(self, sentencia: str, milisegundos: float) -> None:
+        self.consultas += 1
+        self.tiempo_db_ms += milisegundos
+        self.formas[forma_sentencia(sentencia)] += 1
+
+    @property
+    def excedido(self) -> bool:
+        return bool(self.presupuesto) and self.consultas > self.presupuesto
+
+    def repetidas(self, umbral: Optional[int] = None) -> list:
+        """Formas ejecutadas al menos `umbral` veces, de la más a la menos frecuente."""
+        umbral = umbral or settings.CONSULTAS_UMBRAL_N_MAS_1
+        return [(forma, veces) for forma, veces in self.formas.most_common() if veces >= umbral]
+
+
+_estadisticas: ContextVar[Optional[EstadisticasConsultas]] = ContextVar("estadisticas_consultas", default=None)
+
+
+def estadisticas_actuales() -> Optional[EstadisticasConsultas]:
+    """Estadísticas del request en curso (None fuera de un request instrumentado)."""
+    return _estadisticas.get()
+
+
+def presupuesto_consultas(maximo: int):
+    """
+    Dependencia de FastAPI que fija el presupuesto de consultas de una ruta:
+    `@router.get(..., dependencies=[Depends(presupuesto_consultas(2))])`.
+    """
+    def fijar():
+        estadisticas = _estadisticas.get()
+        if estadisticas is not None:
+            estadisticas.presupuesto = maximo
+    return fijar
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+    estadisticas = _estadisticas.get()
+    if estadisticas is None:
+        return
+    if settings.CONSULTAS_MODO_ESTRICTO and estadisticas.presupuesto and estadisticas.consultas >= estadisticas.presupuesto:
+        estadisticas.consultas += 1
+        raise PresupuestoConsultasExcedido(estadisticas)
+    contexto._consulta_inicio = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+    estadisticas = _estadisticas.get()
+    inicio = getattr(contexto, "_consulta_inicio", None)
+    if estadisticas is not None and inicio is not None:
+        estadisticas.registrar(sentencia, (time.perf_counter() - inicio) * 1000)
+
+
+def _ruta(scope) -> str:
+    """Plantilla de la ruta atendida (p. ej. `/api/solicitudes/{id}`), con el prefijo del router."""
+    plantilla = getattr(scope.get("route"), "path", None)
+    if not plantilla:
+        return "sin_ruta"
+    # `route.path` no incluye el prefijo de include_router: se recupera de la URL real.
+    try:
+        resuelta = plantilla.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return plantilla
+    if resuelta and scope["path"].endswith(resuelta):
+        return scope["path"][: -len(resuelta)] + plantilla
+    return plantilla
+
+
+class InstrumentacionConsultas:
+    """Middleware ASGI: una `EstadisticasConsultas` por request HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.CONSULTAS_INSTRUMENTACION:
+            await self.app(scope, receive, send)
+            return
+
+        estadisticas = EstadisticasConsultas(settings.CONSULTAS_PRESUPUESTO)
+        marca = _estadisticas.set(estadisticas)
+        inicio = time.perf_counter()
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                # Lo ejecutado después (cuerpos en flujo) entra en las métricas, no en la cabecera.
+                total_ms = (time.perf_counter() - inicio) * 1000
+                valor = (
+                    f'db;dur={estadisticas.tiempo_db_ms:.2f};desc="{estadisticas.consultas} consultas", '
+                    f"app;dur={total_ms:.2f}"
+                )
+                mensaje.setdefault("headers", [])
+                mensaje["headers"] = list(mensaje["headers"]) + [(b"server-timing", valor.encode("latin-1"))]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _estadisticas.reset(marca)
+            self._registrar(scope, estadisticas, (time.perf_counter() - inicio) * 1000)
+
+    @staticmethod
+    def _registrar(scope, estadisticas: EstadisticasConsultas, total_ms: float) -> None:
+        etiquetas = {"ruta": _ruta(scope), "metodo": scope["method"]}
+        metricas.observar("http_request_duracion_ms", total_ms, **etiquetas)
+        metricas.observar("http_request_db_ms", estadisticas.tiempo_db_ms, **etiquetas)
+        # Se reutilizan los buckets de los histogramas: aquí cuentan consultas, no ms.
+        metricas.observar("http_request_consultas", estadisticas.consultas, **etiquetas)
+
+        if estadisticas.excedido:
+            metricas.incrementar("consultas_presupuesto_excedido", **etiquetas)
+            logger.warning(
+                "%s %s ejecutó %d consultas (presupuesto %d)",
+                etiquetas["metodo"], etiquetas["ruta"], estadisticas.consultas, estadisticas.presupuesto,
+            )
+        repetidas = estadisticas.repetidas()
+        if repetidas:
+            metricas.incrementar("consultas_n_mas_1", **etiquetas)
+            SOSPECHAS_N_MAS_1.append({**etiquetas, "consultas": estadisticas.consultas, "repetidas": repetidas[:5]})
+            logger.warning(
+                "Posible N+1 en %s %s: %s",
+                etiquetas["metodo"], etiquetas["ruta"],
+                "; ".join(f"{veces}x {forma[:120]}" for forma, veces in repetidas[:3]),
+            )
@@ -1,20 +1,76 @@
-from fastapi import FastAPI
-from app.routers import solicitudes, servicios, procesamiento
-from app.database import Base, engine
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.routers import solicitudes, servicios, procesamiento, estadisticas, eventos, internal, salud
+from app.admision import ControlAdmision
+from app.arranque import arranque
+from app.config import settings
+from app.eventos import publicador
+from app.instrumentacion import InstrumentacionConsultas, PresupuestoConsultasExcedido
+from app.programador import (
+    programador, programador_archivo, programador_estadisticas, programador_eventos, programador_idempotencia,
+)
+from app.replicas import CABECERA_TOKEN, ConsistenciaLecturas
 from fastapi.middleware.cors import CORSMiddleware
 
-Base.metadata.create_all(bind=engine)
+# Importar este módulo no conecta con la base: el esquema, el pool y las tareas se
+# preparan en el lifespan (ver app/arranque.py).
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await arranque.iniciar()
+    with arranque.fase("tareas"):
+        publicador.iniciar()
+        if settings.PROGRAMADOR_ACTIVO:
+            programador.iniciar()
+            programador_estadisticas.iniciar()
+            programador_eventos.iniciar()
+            programador_idempotencia.iniciar()
+            if settings.ARCHIVO_DIAS > 0:
+                programador_archivo.iniciar()
+    arranque.terminar()
+    yield
+    # /health/ready responde 503 desde ahora, para que el balanceador deje de enviar tráfico.
+    arranque.apagando = True
+    # Cierra primero las conexiones SSE abiertas para que el apagado no las espere.
+    await publicador.detener()
+    await programador.detener()
+    await programador_estadisticas.detener()
+    await programador_eventos.detener()
+    await programador_idempotencia.detener()
+    await programador_archivo.detener()
 
-app = FastAPI(title="API Servicios de Ingeniería")
+app = FastAPI(title="API Servicios de Ingeniería", lifespan=lifespan)
 
+# Por dentro de CORS, para que los rechazos (503/429) lleven sus cabeceras.
+app.add_middleware(ControlAdmision)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After", CABECERA_TOKEN],
 )
+# Devuelve el token de lectura-de-lo-escrito a los requests que escribieron (réplicas de lectura).
+app.add_middleware(ConsistenciaLecturas)
+# Se añade después de CORS para quedar por fuera y medir el request completo.
+app.add_middleware(InstrumentacionConsultas)
+
+@app.exception_handler(PresupuestoConsultasExcedido)
+async def presupuesto_excedido(request: Request, exc: PresupuestoConsultasExcedido):
+    return JSONResponse(
+        status_code=500,
+        content={
+            "detail": str(exc),
+            "consultas": exc.estadisticas.consultas,
+            "formas": exc.estadisticas.formas.most_common(5),
+        },
+    )
 
 app.include_router(solicitudes.router, prefix="/api", tags=["Solicitudes"])
 app.include_router(servicios.router, prefix="/api", tags=["Servicios"])
 app.include_router(procesamiento.router, prefix="/api", tags=["Procesamiento Automático"])
+app.include_router(estadisticas.router, prefix="/api", tags=["Estadísticas"])
+app.include_router(eventos.router, prefix="/api", tags=["Eventos"])
+app.include_router(internal.router)
+app.include_router(salud.router)
@@ -0,0 +1,129 @@
+# app/metricas.py
+"""
+Registro de métricas en proceso (contadores, indicadores e histogramas).
+
+Es deliberadamente simple: vive en la memoria de cada worker, es seguro entre hilos
+y se expone en JSON (`/internal/metricas`) o en formato de texto de Prometheus.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Tuple
+
+# Límites superiores de los buckets de los histogramas, en milisegundos.
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+Clave = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _clave(nombre: str, etiquetas: dict) -> Clave:
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+class Histograma:
+    __slots__ = ("conteos", "suma", "total")
+
+    def __init__(self):
+        self.conteos = [0] * len(BUCKETS_MS)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.suma += valor
+        self.total += 1
+        for i, limite in enumerate(BUCKETS_MS):
+            if valor <= limite:
+                self.conteos[i] += 1
+                break
+
+    def percentil(self, p: float) -> float:
+        """Aproximación por bucket: límite superior del bucket que contiene el percentil."""
+        if not self.total:
+            return 0.0
+        objetivo = p * self.total
+        acumulado = 0
+        for limite, conteo in zip(BUCKETS_MS, self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return limite
+        return BUCKETS_MS[-1]
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores: Dict[Clave, float] = defaultdict(float)
+        self._indicadores: Dict[Clave, float] = {}
+        self._histogramas: Dict[Clave, Histograma] = {}
+
+    def incrementar(self, nombre: str, valor: float = 1, **etiquetas) -> None:
+        with self._lock:
+            self._contadores[_clave(nombre, etiquetas)] += valor
+
+    def fijar(self, nombre: str, valor: float, **etiquetas) -> None:
+        with self._lock:
+            self._indicadores[_clave(nombre, etiquetas)] = valor
+
+    def observar(self, nombre: str, valor_ms: float, **etiquetas) -> None:
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = Histograma()
+            histograma.observar(valor_ms)
+
+    def contador(self, nombre: str, **etiquetas) -> float:
+        with self._lock:
+            return self._contadores.get(_clave(nombre, etiquetas), 0)
+
+    def instantanea(self) -> dict:
+        """Copia en forma de dict, apta para JSON."""
+        def percentil(histograma: Histograma, p: float):
+            # Por encima del último bucket finito no hay límite que informar (JSON no admite inf).
+            valor = histograma.percentil(p)
+            return None if valor == float("inf") else valor
+
+        def nombre_con_etiquetas(clave: Clave) -> str:
+            nombre, etiquetas = clave
+            if not etiquetas:
+                return nombre
+            return nombre + "{" + ",".join(f"{k}={v}" for k, v in etiquetas) + "}"
+
+        with self._lock:
+            return {
+                "contadores": {nombre_con_etiquetas(k): v for k, v in self._contadores.items()},
+                "indicadores": {nombre_con_etiquetas(k): v for k, v in self._indicadores.items()},
+                "histogramas": {
+                    nombre_con_etiquetas(k): {
+                        "total": h.total,
+                        "suma_ms": round(h.suma, 3),
+                        "p50_ms": percentil(h, 0.50),
+                        "p95_ms": percentil(h, 0.95),
+                        "p99_ms": percentil(h, 0.99),
+                    }
+                    for k, h in self._histogramas.items()
+                },
+            }
+
+    def formato_prometheus(self) -> str:
+        def etiquetas_texto(etiquetas, extra=()):
+            pares = list(etiquetas) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pares) + "}" if pares else ""
+
+        lineas = []
+        with self._lock:
+            for (nombre, etiquetas), valor in self._contadores.items():
+                lineas.append(f"{nombre}_total{etiquetas_texto(etiquetas)} {valor}")
+            for (nombre, etiquetas), valor in self._indicadores.items():
+                lineas.append(f"{nombre}{etiquetas_texto(etiquetas)} {valor}")
+            for (nombre, etiquetas), h in self._histogramas.items():
+                acumulado = 0
+                for limite, conteo in zip(BUCKETS_MS, h.conteos):
+                    acumulado += conteo
+                    le = "+Inf" if limite == float("inf") else limite
+                    lineas.append(f"{nombre}_bucket{etiquetas_texto(etiquetas, [('le', le)])} {acumulado}")
+                lineas.append(f"{nombre}_sum{etiquetas_texto(etiquetas)} {h.suma}")
+                lineas.append(f"{nombre}_count{etiquetas_texto(etiquetas)} {h.total}")
+        return "\n".join(lineas) + "\n"
+
+
+metricas = RegistroMetricas()
@@ -0,0 +1,59 @@
+# app/models/archivo.py
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Enum, Index
+from sqlalchemy.orm import relationship
+from app.database import Base
+from app.models.servicio import EstadoServicio
+from app.models.solicitud import EstadoSolicitud
+
+# Archivo "frío" de solicitudes finalizadas (Cerrada/Cancelada) y sus servicios. El
+# archivado periódico (app/services/archivo.py) mueve aquí las filas, con su mismo id,
+# para que las consultas habituales recorran solo el conjunto "caliente". Las columnas
+# replican las de `solicitudes` y `servicios`; las filas archivadas son de solo lectura.
+class SolicitudArchivada(Base):
+    __tablename__ = "solicitudes_archivadas"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    cliente = Column(String(100), nullable=False)
+    email_cliente = Column(String(255), nullable=False)
+    fecha_solicitud = Column(DateTime)
+    estado = Column(Enum(EstadoSolicitud))
+    observaciones = Column(String(500))
+    fecha_ultima_modificacion = Column(DateTime)
+    servicios_pendientes = Column(Integer, nullable=False, default=0, server_default="0")
+    servicios_aprobados = Column(Integer, nullable=False, default=0, server_default="0")
+    servicios_rechazados = Column(Integer, nullable=False, default=0, server_default="0")
+    servicios_vencidos = Column(Integer, nullable=False, default=0, server_default="0")
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    fecha_archivado = Column(DateTime, nullable=False)
+
+    # Mismo nombre que Solicitud.servicios: SolicitudOut se construye igual desde ambas.
+    servicios = relationship("ServicioArchivado", back_populates="solicitud")
+
+    __table_args__ = (
+        # Listado con incluir_archivadas: orden por defecto y rangos de fecha.
+        Index("ix_solicitudes_archivadas_fecha_solicitud", "fecha_solicitud"),
+        # Filtro por cliente en PostgreSQL (en SQLite el archivo se busca con LIKE).
+        Index(
+            "ix_solicitudes_archivadas_cliente_trgm",
+            "cliente",
+            postgresql_using="gin",
+            postgresql_ops={"cliente": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+class ServicioArchivado(Base):
+    __tablename__ = "servicios_archivados"
+    id_servicio = Column(Integer, primary_key=True, autoincrement=False)
+    id_solicitud = Column(Integer, ForeignKey("solicitudes_archivadas.id"), nullable=False)
+    nombre_servicio = Column(String(255), nullable=False)
+    fecha_reunion = Column(DateTime, nullable=False)
+    estado_servicio = Column(Enum(EstadoServicio))
+    comentarios = Column(String(500))
+    costo_estimado = Column(Float)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    solicitud = relationship("SolicitudArchivada", back_populates="servicios")
+
+    __table_args__ = (
+        Index("ix_servicios_archivados_id_solicitud", "id_solicitud"),
+    )
@@ -0,0 +1,51 @@
+# app/models/estadistica.py
+from sqlalchemy import Column, Date, Float, Index, Integer, String
+from app.database import Base
+
+# Resumen por (día de fecha_solicitud, cliente) que sirve GET /api/estadisticas sin
+# recorrer las tablas base. Lo mantiene app/services/estadisticas.py: las escrituras
+# marcan sus buckets en `estadisticas_pendientes` y el refresco los recalcula.
+class EstadisticaDiaria(Base):
+    __tablename__ = "estadisticas_diarias"
+    dia = Column(Date, primary_key=True)
+    cliente = Column(String(100), primary_key=True)
+    solicitudes_abiertas = Column(Integer, nullable=False, default=0)
+    solicitudes_en_proceso = Column(Integer, nullable=False, default=0)
+    solicitudes_cerradas = Column(Integer, nullable=False, default=0)
+    solicitudes_canceladas = Column(Integer, nullable=False, default=0)
+    servicios_pendientes = Column(Integer, nullable=False, default=0)
+    servicios_aprobados = Column(Integer, nullable=False, default=0)
+    servicios_rechazados = Column(Integer, nullable=False, default=0)
+    servicios_vencidos = Column(Integer, nullable=False, default=0)
+    # Suma de costo_estimado de los servicios aprobados.
+    costo_aprobado = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        # Filtro por cliente; el rango de días sin cliente usa la clave primaria.
+        Index("ix_estadisticas_diarias_cliente_dia", "cliente", "dia"),
+    )
+
+
+# Totales por día (suma de los clientes de `estadisticas_diarias`): sirve los totales y el
+# ingreso por período sin filtro de cliente, con una fila por día del rango.
+class EstadisticaDia(Base):
+    __tablename__ = "estadisticas_por_dia"
+    dia = Column(Date, primary_key=True)
+    solicitudes_abiertas = Column(Integer, nullable=False, default=0)
+    solicitudes_en_proceso = Column(Integer, nullable=False, default=0)
+    solicitudes_cerradas = Column(Integer, nullable=False, default=0)
+    solicitudes_canceladas = Column(Integer, nullable=False, default=0)
+    servicios_pendientes = Column(Integer, nullable=False, default=0)
+    servicios_aprobados = Column(Integer, nullable=False, default=0)
+    servicios_rechazados = Column(Integer, nullable=False, default=0)
+    servicios_vencidos = Column(Integer, nullable=False, default=0)
+    costo_aprobado = Column(Float, nullable=False, default=0)
+
+
+# Cola de buckets a recalcular. Admite repetidos: el refresco los agrupa y borra solo
+# las filas que leyó, así una marca confirmada durante el refresco no se pierde.
+class EstadisticaPendiente(Base):
+    __tablename__ = "estadisticas_pendientes"
+    id = Column(Integer, primary_key=True)
+    dia = Column(Date, nullable=False)
+    cliente = Column(String(100), nullable=False)
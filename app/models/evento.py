@@ -0,0 +1,28 @@
+# app/models/evento.py
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String
+from app.database import Base
+
+# Registro de cambios que alimenta GET /api/eventos (SSE). Cada escritura inserta sus
+# eventos en la misma transacción; el publicador de cada worker (app/eventos.py) los lee
+# en orden de `id` y los reparte a las conexiones abiertas. `id` es el id SSE con el que
+# un cliente reanuda (Last-Event-ID); las filas se podan tras EVENTOS_RETENCION_SEGUNDOS.
+class Evento(Base):
+    __tablename__ = "eventos"
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    fecha = Column(DateTime, nullable=False)
+    # '<entidad>.<acción>', p. ej. 'servicio.vencido' (ver app/services/eventos.py).
+    tipo = Column(String(40), nullable=False)
+    id_solicitud = Column(Integer, nullable=False)
+    id_servicio = Column(Integer)
+    # Cliente de la solicitud al momento del evento, para filtrar por cliente.
+    cliente = Column(String(100))
+    # Nombre del estado (solicitud o servicio según el tipo) tras el cambio.
+    estado = Column(String(20))
+
+    __table_args__ = (
+        # Poda por antigüedad.
+        Index("ix_eventos_fecha", "fecha"),
+        # Sin AUTOINCREMENT, SQLite reutilizaría ids si la poda vacía la tabla y un
+        # cliente con un Last-Event-ID anterior no vería los eventos nuevos.
+        {"sqlite_autoincrement": True},
+    )
@@ -0,0 +1,22 @@
+# app/models/idempotencia.py
+from sqlalchemy import Column, DateTime, Index, LargeBinary, SmallInteger, String
+from app.database import Base
+
+# Respuestas de los POST de creación enviados con `Idempotency-Key` (ver
+# app/services/idempotencia.py). La fila se inserta en la misma transacción que la
+# escritura, así que existe si y solo si esa escritura se confirmó; un reintento con
+# la misma clave recibe `cuerpo` sin volver a escribir. Se podan al vencer `expira`.
+class ClaveIdempotencia(Base):
+    __tablename__ = "claves_idempotencia"
+    clave = Column(String(255), primary_key=True)
+    # Método y ruta (con el id real) del request original.
+    ruta = Column(String(255), nullable=False)
+    # SHA-256 del cuerpo: la misma clave con otro contenido es un error del cliente.
+    huella = Column(String(64), nullable=False)
+    estado_http = Column(SmallInteger, nullable=False)
+    cuerpo = Column(LargeBinary, nullable=False)
+    expira = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_claves_idempotencia_expira", "expira"),
+    )
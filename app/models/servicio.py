@@ -1,5 +1,5 @@
 # app/models/servicio.py
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Enum, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 from app.database import Base # Importa la Base de tu archivo database.py
@@ -22,8 +22,27 @@ class Servicio(Base):
     estado_servicio = Column(Enum(EstadoServicio), default=EstadoServicio.PENDIENTE) # Estado inicial del servicio
     comentarios = Column(String(500))
     costo_estimado = Column(Float)
+    # Versión para concurrencia optimista (ver Solicitud.version).
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Define la relación con el modelo Solicitud.
     # 'solicitud' es el nombre del atributo que contendrá el objeto Solicitud padre.
     # 'back_populates' apunta al atributo 'servicios' en el modelo Solicitud.
     solicitud = relationship("Solicitud", back_populates="servicios")
+
+    __table_args__ = (
+        # Clave foránea + estado: carga de servicios por solicitud y el NOT EXISTS
+        # sobre servicios no finales del procesamiento automático.
+        Index("ix_servicios_id_solicitud_estado", "id_solicitud", "estado_servicio"),
+        # Búsqueda de servicios vencidos: índice parcial limitado a los pendientes,
+        # que son los únicos que el procesamiento necesita recorrer.
+        Index(
+            "ix_servicios_pendientes_fecha_reunion",
+            "estado_servicio",
+            "fecha_reunion",
+            postgresql_where=text("estado_servicio = 'PENDIENTE'"),
+            sqlite_where=text("estado_servicio = 'PENDIENTE'"),
+        ),
+        # Como en `solicitudes`: los ids de servicios_archivados no deben reutilizarse.
+        {"sqlite_autoincrement": True},
+    )
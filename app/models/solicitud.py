@@ -1,5 +1,5 @@
 # app/models/solicitud.py
-from sqlalchemy import Column, Integer, String, DateTime, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Index, DDL, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base # Importa la Base de tu archivo database.py
@@ -29,6 +29,19 @@ class Solicitud(Base):
     observaciones = Column(String(500))
     fecha_ultima_modificacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow) # Actualiza en cada modificación
 
+    # Cantidad de servicios por estado, desnormalizada (ver app/services/contadores.py).
+    # Se mantienen en la misma transacción que cada alta, cambio de estado o baja de un
+    # servicio, y permiten responder "¿tiene pendientes/aprobados?" sin leer `servicios`.
+    servicios_pendientes = Column(Integer, nullable=False, default=0, server_default="0")
+    servicios_aprobados = Column(Integer, nullable=False, default=0, server_default="0")
+    servicios_rechazados = Column(Integer, nullable=False, default=0, server_default="0")
+    servicios_vencidos = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Versión para concurrencia optimista: cada escritura de la fila la incrementa en la
+    # misma sentencia (`version = version + 1`) y los clientes la envían en If-Match.
+    # Los contadores de arriba no la modifican.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
     # Define la relación con el modelo Servicio.
     # 'servicios' es el nombre del atributo que contendrá una lista de objetos Servicio.
     # 'back_populates' apunta al atributo 'solicitud' en el modelo Servicio.
@@ -36,3 +49,50 @@ class Solicitud(Base):
     # todos sus Servicios asociados también lo serán.
     servicios = relationship("Servicio", back_populates="solicitud", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Listado filtrado por estado y ordenado/filtrado por fecha, y cierre de solicitudes activas.
+        Index("ix_solicitudes_estado_fecha_solicitud", "estado", "fecha_solicitud"),
+        # Listado sin filtro de estado: orden por defecto y rangos fecha_desde/fecha_hasta.
+        Index("ix_solicitudes_fecha_solicitud", "fecha_solicitud"),
+        # Búsqueda por subcadena de cliente (ILIKE '%...%') en PostgreSQL: índice trigram.
+        # En SQLite el mismo filtro se resuelve con la tabla FTS5 definida más abajo.
+        Index(
+            "ix_solicitudes_cliente_trgm",
+            "cliente",
+            postgresql_using="gin",
+            postgresql_ops={"cliente": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        # Sin AUTOINCREMENT, SQLite reutilizaría el id de una solicitud archivada (o
+        # borrada) con el id más alto, que seguiría en solicitudes_archivadas.
+        {"sqlite_autoincrement": True},
+    )
+
+
+# Tabla FTS5 "sombra" con tokenizador trigram para buscar clientes por subcadena en SQLite.
+# Es de contenido externo (no duplica los datos) y se mantiene con triggers.
+TABLA_FTS_CLIENTE = "solicitudes_cliente_fts"
+
+DDL_FTS_CLIENTE_SQLITE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS_CLIENTE} USING fts5("
+    "cliente, content='solicitudes', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS_CLIENTE}_ai AFTER INSERT ON solicitudes BEGIN "
+    f"INSERT INTO {TABLA_FTS_CLIENTE}(rowid, cliente) VALUES (new.id, new.cliente); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS_CLIENTE}_ad AFTER DELETE ON solicitudes BEGIN "
+    f"INSERT INTO {TABLA_FTS_CLIENTE}({TABLA_FTS_CLIENTE}, rowid, cliente) VALUES ('delete', old.id, old.cliente); END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS_CLIENTE}_au AFTER UPDATE OF cliente ON solicitudes BEGIN "
+    f"INSERT INTO {TABLA_FTS_CLIENTE}({TABLA_FTS_CLIENTE}, rowid, cliente) VALUES ('delete', old.id, old.cliente); "
+    f"INSERT INTO {TABLA_FTS_CLIENTE}(rowid, cliente) VALUES (new.id, new.cliente); END",
+)
+
+event.listen(
+    Solicitud.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+for _sentencia in DDL_FTS_CLIENTE_SQLITE:
+    event.listen(Solicitud.__table__, "after_create", DDL(_sentencia).execute_if(dialect="sqlite"))
+event.listen(
+    Solicitud.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {TABLA_FTS_CLIENTE}").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,18 @@
+# app/models/tarea.py
+from sqlalchemy import Column, DateTime, String
+from app.database import Base
+
+# Estado compartido de las tareas en segundo plano (ver app/programador.py).
+# Una fila por tarea: quién la tiene tomada y hasta cuándo (lease), y la marca de agua
+# hasta la que ya se procesó.
+class TareaProgramada(Base):
+    __tablename__ = "tareas_programadas"
+    nombre = Column(String(100), primary_key=True)
+    # Worker que tiene el lease (host:pid:sufijo) y su vencimiento. En PostgreSQL se usa
+    # un advisory lock y estas columnas quedan solo como información.
+    propietario = Column(String(255))
+    lease_hasta = Column(DateTime)
+    # Límite superior (exclusivo) de fecha_reunion ya procesado: la siguiente ejecución
+    # solo revisa servicios con fecha_reunion >= marca_agua.
+    marca_agua = Column(DateTime)
+    ultima_ejecucion = Column(DateTime)
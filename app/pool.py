@@ -0,0 +1,127 @@
+# app/pool.py
+"""
+Pool de conexiones configurable e instrumentado.
+
+`opciones_motor` traduce la configuración de `Settings` (DB_POOL_*) en argumentos
+de `create_engine`/`create_async_engine`. Los pools instrumentados registran en
+`app.metricas` cuánto espera cada checkout y cuántos fallan por agotar
+`DB_POOL_TIMEOUT`. `estado_pool` da una foto del pool para `/internal/pool`.
+"""
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.config import settings
+from app.metricas import metricas
+
+# QueuePool._do_get se llama a sí mismo cuando pierde una carrera por el desbordamiento;
+# solo se mide la llamada externa. ContextVar porque en modo asíncrono varias
+# corrutinas (greenlets) comparten hilo.
+_midiendo: ContextVar[bool] = ContextVar("midiendo_checkout", default=False)
+
+
+class _CheckoutMedido:
+    """Mixin para QueuePool: mide la espera de cada checkout y cuenta los timeouts."""
+
+    def _do_get(self):
+        if _midiendo.get():
+            return super()._do_get()
+        motor = self.logging_name or "principal"
+        marca = _midiendo.set(True)
+        inicio = time.perf_counter()
+        try:
+            conexion = super()._do_get()
+        except exc.TimeoutError:
+            metricas.incrementar("db_pool_checkout_timeouts", motor=motor)
+            raise
+        finally:
+            _midiendo.reset(marca)
+            metricas.observar("db_pool_espera_checkout_ms", (time.perf_counter() - inicio) * 1000, motor=motor)
+        metricas.fijar("db_pool_conexiones_en_uso", self.checkedout(), motor=motor)
+        return conexion
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        metricas.fijar("db_pool_conexiones_en_uso", self.checkedout(), motor=self.logging_name or "principal")
+
+
+class QueuePoolMedido(_CheckoutMedido, QueuePool):
+    pass
+
+
+class AsyncQueuePoolMedido(_CheckoutMedido, AsyncAdaptedQueuePool):
+    pass
+
+
+def opciones_motor(
+    url: str,
+    nombre: str = "principal",
+    asincrono: bool = False,
+    tamano: Optional[int] = None,
+    desbordamiento: Optional[int] = None,
+) -> dict:
+    """
+    Argumentos del pool para `create_engine`/`create_async_engine` según `Settings`;
+    `tamano` y `desbordamiento` reemplazan DB_POOL_SIZE y DB_MAX_OVERFLOW.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # SQLite en memoria usa un pool de una conexión por hilo; no admite estas opciones.
+        return {}
+    return {
+        "poolclass": AsyncQueuePoolMedido if asincrono else QueuePoolMedido,
+        "pool_logging_name": nombre,
+        "pool_size": settings.DB_POOL_SIZE if tamano is None else tamano,
+        "max_overflow": settings.DB_MAX_OVERFLOW if desbordamiento is None else desbordamiento,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def estado_pool(motor) -> dict:
+    """Foto del pool de `motor` (Engine o AsyncEngine) más sus métricas acumuladas."""
+    pool = motor.pool
+    estado = {"clase": type(pool).__name__}
+    if not isinstance(pool, QueuePool):
+        return estado
+    nombre = pool.logging_name or "principal"
+    espera = metricas.instantanea()["histogramas"].get(f"db_pool_espera_checkout_ms{{motor={nombre}}}")
+    estado.update(
+        {
+            "motor": nombre,
+            "tamano": pool.size(),
+            "max_desbordamiento": pool._max_overflow,
+            "timeout_s": pool.timeout(),
+            "en_uso": pool.checkedout(),
+            "disponibles": pool.checkedin(),
+            # Negativo mientras el pool no ha abierto todas sus conexiones base.
+            "desbordamiento": pool.overflow(),
+            "espera_checkout": espera,
+            "checkout_timeouts": metricas.contador("db_pool_checkout_timeouts", motor=nombre),
+            "statement_timeouts": metricas.contador("db_statement_timeouts", motor=nombre),
+        }
+    )
+    metricas.fijar("db_pool_conexiones_en_uso", estado["en_uso"], motor=nombre)
+    metricas.fijar("db_pool_desbordamiento", max(estado["desbordamiento"], 0), motor=nombre)
+    return estado
+
+
+# SQLSTATE de PostgreSQL para una sentencia cancelada (p. ej. por statement_timeout).
+_QUERY_CANCELED = "57014"
+
+
+def registrar_errores(motor) -> None:
+    """Cuenta en métricas las sentencias canceladas por statement_timeout en `motor` (Engine síncrono)."""
+    nombre = getattr(motor.pool, "logging_name", None) or "principal"
+
+    @event.listens_for(motor, "handle_error")
+    def _contar_statement_timeout(contexto):
+        original = contexto.original_exception
+        codigo = getattr(original, "pgcode", None) or getattr(original, "sqlstate", None)
+        if codigo == _QUERY_CANCELED:
+            metricas.incrementar("db_statement_timeouts", motor=nombre)
@@ -0,0 +1,228 @@
+# app/programador.py
+"""
+Programador en proceso del procesamiento de servicios vencidos.
+
+Cada worker arranca un `Programador` desde el lifespan de FastAPI. En cada tick
+intenta tomar la tarea con `app.services.coordinacion.bloqueo_tarea`; solo el worker
+que la obtiene la ejecuta y los demás omiten ese tick.
+
+La ejecución es incremental: la fila de la tarea en `tareas_programadas` guarda la
+marca de agua de `fecha_reunion` ya procesada. Cada pasada vence solo los servicios
+con reunión entre la marca y el inicio del día actual, y revisa el cierre solo de
+sus solicitudes. La primera pasada, y las lanzadas con `completo=True` (el endpoint
+manual), recorren todo y dejan la marca en el inicio del día. Un servicio que vuelve
+a Pendiente con la reunión ya pasada baja la marca hasta su fecha
+(`procesamiento.reabrir_ventana`), para que la pasada siguiente lo venza.
+
+Un segundo programador aplica al resumen de estadísticas los buckets que marcaron
+las escrituras (`app/services/estadisticas.py`), con su propia tarea y bloqueo, y un
+tercero poda el registro de eventos de GET /api/eventos (`app/services/eventos.py`),
+otro archiva las solicitudes finalizadas antiguas (`app/services/archivo.py`) y el
+último poda las claves de idempotencia vencidas (`app/services/idempotencia.py`).
+Todas las tareas, y sus bloqueos (`app/services/coordinacion.py`), usan el pool de
+lotes (`SessionLotes`), no el de los requests.
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, update
+
+from app.cache import cache_respuestas
+from app.config import settings
+from app.database import SessionLotes
+from app.metricas import metricas
+from app.models.tarea import TareaProgramada
+from app.services import archivo, estadisticas, eventos, idempotencia, procesamiento
+from app.services.coordinacion import asegurar_tarea, bloqueo_tarea
+
+logger = logging.getLogger(__name__)
+
+TAREA_PROCESAMIENTO = procesamiento.TAREA
+TAREA_ESTADISTICAS = "refrescar_estadisticas"
+TAREA_EVENTOS = "podar_eventos"
+TAREA_ARCHIVO = "archivar_solicitudes"
+TAREA_IDEMPOTENCIA = "podar_claves_idempotencia"
+
+
+def ejecutar_procesamiento(
+    completo: bool = False,
+    tamano_lote: int = procesamiento.TAMANO_LOTE_POR_DEFECTO,
+    origen: str = "programador",
+) -> Optional[dict]:
+    """
+    Una pasada del procesamiento bajo el bloqueo de la tarea. Devuelve el resultado,
+    o None si otro worker la está ejecutando.
+    """
+    with bloqueo_tarea(TAREA_PROCESAMIENTO, settings.PROGRAMADOR_LEASE_SEGUNDOS) as bloqueo:
+        if bloqueo is None:
+            metricas.incrementar("procesamiento_ejecuciones", origen=origen, resultado="omitido")
+            return None
+
+        def al_confirmar_lote(ids):
+            cache_respuestas.invalidar_solicitudes(ids)
+            bloqueo.renovar()
+
+        asegurar_tarea(TAREA_PROCESAMIENTO)
+        hoy = datetime.utcnow().date()
+        inicio = time.perf_counter()
+        db = SessionLotes()
+        try:
+            marca = db.get(TareaProgramada, TAREA_PROCESAMIENTO).marca_agua
+            if completo or marca is None:
+                resultado = procesamiento.procesar_pendientes(
+                    db, hoy, tamano_lote=tamano_lote, al_confirmar_lote=al_confirmar_lote
+                )
+                modo = "completo"
+            else:
+                resultado = procesamiento.procesar_incremental(
+                    db, marca, hoy, tamano_lote=tamano_lote, al_confirmar_lote=al_confirmar_lote
+                )
+                modo = "incremental"
+
+            nueva_marca = max(procesamiento.inicio_del_dia(hoy), marca or datetime.min)
+            # La marca avanza solo si nadie la movió durante la pasada: `reabrir_ventana`
+            # pudo bajarla por un servicio anterior a `marca`, que esta pasada no revisó.
+            sin_cambios = TareaProgramada.marca_agua.is_(None) if marca is None else TareaProgramada.marca_agua == marca
+            db.execute(
+                update(TareaProgramada)
+                .where(TareaProgramada.nombre == TAREA_PROCESAMIENTO)
+                .values(
+                    marca_agua=case((sin_cambios, nueva_marca), else_=TareaProgramada.marca_agua),
+                    ultima_ejecucion=datetime.utcnow(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            metricas.incrementar("procesamiento_ejecuciones", origen=origen, resultado="error")
+            raise
+        finally:
+            db.close()
+
+    metricas.incrementar("procesamiento_ejecuciones", origen=origen, resultado="ok")
+    metricas.observar("procesamiento_duracion_ms", (time.perf_counter() - inicio) * 1000, origen=origen, modo=modo)
+    metricas.incrementar("procesamiento_servicios_vencidos", resultado["servicios_marcados_vencidos"], origen=origen)
+    metricas.incrementar("procesamiento_solicitudes_cerradas", resultado["solicitudes_cerradas_automaticamente"], origen=origen)
+    if "solicitudes_revisadas" in resultado:
+        metricas.incrementar("procesamiento_solicitudes_revisadas", resultado["solicitudes_revisadas"], origen=origen)
+    metricas.fijar("procesamiento_marca_agua", nueva_marca.timestamp())
+    return {"modo": modo, **resultado}
+
+
+def refrescar_estadisticas(origen: str = "programador") -> Optional[dict]:
+    """Aplica los buckets pendientes al resumen de estadísticas; None si otro worker lo está haciendo."""
+    with bloqueo_tarea(TAREA_ESTADISTICAS, settings.PROGRAMADOR_LEASE_SEGUNDOS) as bloqueo:
+        if bloqueo is None:
+            return None
+        inicio = time.perf_counter()
+        with SessionLotes() as db:
+            resultado = estadisticas.refrescar(db, al_confirmar_lote=bloqueo.renovar)
+    metricas.observar("estadisticas_refresco_ms", (time.perf_counter() - inicio) * 1000, origen=origen)
+    metricas.incrementar("estadisticas_buckets_recalculados", resultado["buckets"], origen=origen)
+    return resultado
+
+
+def podar_eventos(origen: str = "programador") -> Optional[int]:
+    """Borra los eventos fuera de la retención; None si otro worker lo está haciendo."""
+    with bloqueo_tarea(TAREA_EVENTOS, settings.PROGRAMADOR_LEASE_SEGUNDOS) as bloqueo:
+        if bloqueo is None:
+            return None
+        antes = datetime.utcnow() - timedelta(seconds=settings.EVENTOS_RETENCION_SEGUNDOS)
+        with SessionLotes() as db:
+            borrados = eventos.podar(db, antes)
+    metricas.incrementar("eventos_podados", borrados, origen=origen)
+    return borrados
+
+
+def podar_claves_idempotencia(origen: str = "programador") -> Optional[int]:
+    """Borra las claves de idempotencia vencidas; None si otro worker lo está haciendo."""
+    with bloqueo_tarea(TAREA_IDEMPOTENCIA, settings.PROGRAMADOR_LEASE_SEGUNDOS) as bloqueo:
+        if bloqueo is None:
+            return None
+        with SessionLotes() as db:
+            borradas = idempotencia.podar(db, datetime.utcnow())
+    metricas.incrementar("idempotencia_claves_podadas", borradas, origen=origen)
+    return borradas
+
+
+def ejecutar_archivado(
+    dias: Optional[int] = None,
+    tamano_lote: Optional[int] = None,
+    dry_run: bool = False,
+    origen: str = "programador",
+) -> Optional[dict]:
+    """
+    Archiva las solicitudes finalizadas hace más de `dias` (por defecto `ARCHIVO_DIAS`)
+    bajo el bloqueo de la tarea. Devuelve el resultado, o None si otro worker la está ejecutando.
+    """
+    dias = settings.ARCHIVO_DIAS if dias is None else dias
+    antes = datetime.utcnow() - timedelta(days=dias)
+    tamano_lote = tamano_lote or settings.ARCHIVO_TAMANO_LOTE
+    if dry_run:
+        with SessionLotes() as db:
+            return archivo.archivar(db, antes, tamano_lote, dry_run=True)
+
+    with bloqueo_tarea(TAREA_ARCHIVO, settings.PROGRAMADOR_LEASE_SEGUNDOS) as bloqueo:
+        if bloqueo is None:
+            return None
+
+        def al_confirmar_lote(ids):
+            cache_respuestas.invalidar_solicitudes(ids)
+            bloqueo.renovar()
+
+        inicio = time.perf_counter()
+        with SessionLotes() as db:
+            resultado = archivo.archivar(db, antes, tamano_lote, al_confirmar_lote=al_confirmar_lote)
+    metricas.observar("archivo_duracion_ms", (time.perf_counter() - inicio) * 1000, origen=origen)
+    metricas.incrementar("archivo_solicitudes_archivadas", resultado["solicitudes_archivadas"], origen=origen)
+    return resultado
+
+
+class Programador:
+    """Ejecuta `tarea` (síncrona) en el threadpool cada `intervalo` segundos."""
+
+    def __init__(self, tarea: Callable[[], object], intervalo: float):
+        self.tarea = tarea
+        self.intervalo = intervalo
+        self._tarea_asyncio: Optional[asyncio.Task] = None
+
+    @property
+    def activo(self) -> bool:
+        return self._tarea_asyncio is not None and not self._tarea_asyncio.done()
+
+    def iniciar(self) -> None:
+        if not self.activo:
+            self._tarea_asyncio = asyncio.create_task(self._bucle())
+
+    async def detener(self) -> None:
+        if self._tarea_asyncio is None:
+            return
+        self._tarea_asyncio.cancel()
+        try:
+            await self._tarea_asyncio
+        except asyncio.CancelledError:
+            pass
+        self._tarea_asyncio = None
+
+    async def _bucle(self) -> None:
+        while True:
+            # Variación aleatoria para que los workers no compitan siempre en el mismo instante.
+            await asyncio.sleep(self.intervalo * random.uniform(0.9, 1.1))
+            try:
+                await run_in_threadpool(self.tarea)
+            except Exception:
+                logger.exception("Falló la ejecución programada de %s", self.tarea.__name__)
+
+
+programador = Programador(ejecutar_procesamiento, settings.PROGRAMADOR_INTERVALO_SEGUNDOS)
+programador_estadisticas = Programador(refrescar_estadisticas, settings.ESTADISTICAS_INTERVALO_SEGUNDOS)
+# La poda no necesita ser frecuente: basta con que la tabla no crezca sin límite.
+programador_eventos = Programador(podar_eventos, max(settings.EVENTOS_RETENCION_SEGUNDOS / 10, 60))
+programador_archivo = Programador(ejecutar_archivado, settings.ARCHIVO_INTERVALO_SEGUNDOS)
+programador_idempotencia = Programador(podar_claves_idempotencia, max(settings.IDEMPOTENCIA_TTL_SEGUNDOS / 24, 60))
@@ -0,0 +1,192 @@
+# app/replicas.py
+"""
+Réplicas de lectura.
+
+Con `DB_REPLICA_URLS` las rutas de lectura pesadas reciben su sesión de
+`app.database.get_db_lectura`, que pide aquí una réplica: por turno rotativo o la de
+menos conexiones en uso (`DB_REPLICA_SELECCION`). La lectura va a la primaria cuando:
+
+- no hay réplicas configuradas, o todas están fuera de rotación: un error de conexión
+  en una réplica la saca durante `DB_REPLICA_REINTENTO_SEGUNDOS`, tras los cuales el
+  siguiente request la vuelve a probar;
+- el cliente envía en `X-Token-Lectura` el token de una escritura reciente (más nueva
+  que `DB_REPLICA_VENTANA_RYW_SEGUNDOS`, la cota del retraso de replicación), para
+  que lea lo que acaba de escribir.
+
+El token es el instante del último commit en la primaria durante el request (ms desde
+epoch); `ConsistenciaLecturas` lo devuelve en esa misma cabecera. Las sesiones de una
+réplica son de solo lectura: una escritura en ellas lanza `EscrituraEnReplica`.
+"""
+import itertools
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app.config import _url_async, settings
+from app.metricas import metricas
+from app.pool import opciones_motor, registrar_errores
+
+CABECERA_TOKEN = "X-Token-Lectura"
+
+
+class EscrituraEnReplica(RuntimeError):
+    pass
+
+
+class Replica:
+    """Motores y fábricas de sesión de una réplica, y su estado de salud."""
+
+    def __init__(self, nombre: str, url: str):
+        self.nombre = nombre
+        self.url = url
+        self.engine = create_engine(url, **opciones_motor(url, nombre))
+        self.sesiones = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, info={"replica": nombre})
+        self.async_engine = None
+        self.sesiones_async = None
+        if settings.DB_MODO_ASYNC:
+            url_async = _url_async(url)
+            self.async_engine = create_async_engine(url_async, **opciones_motor(url_async, f"{nombre}-async", asincrono=True))
+            self.sesiones_async = async_sessionmaker(
+                self.async_engine, autoflush=False, expire_on_commit=False, info={"replica": nombre}
+            )
+        self.caida_hasta = 0.0
+        self.errores = 0
+        for motor in (self.engine, self.async_engine.sync_engine if self.async_engine is not None else None):
+            if motor is not None:
+                registrar_errores(motor)
+                event.listen(motor, "handle_error", self._al_fallar)
+
+    def _al_fallar(self, contexto) -> None:
+        # Solo los errores de la conexión (no poder abrirla, o perderla) sacan la réplica
+        # de la rotación; los de una consulta concreta, como un statement_timeout, no.
+        if contexto.is_disconnect or contexto.connection is None:
+            self.marcar_caida()
+
+    def marcar_caida(self) -> None:
+        self.caida_hasta = time.monotonic() + settings.DB_REPLICA_REINTENTO_SEGUNDOS
+        self.errores += 1
+        metricas.incrementar("db_replica_caidas", replica=self.nombre)
+
+    @property
+    def sana(self) -> bool:
+        return time.monotonic() >= self.caida_hasta
+
+    def en_uso(self) -> int:
+        pool = (self.async_engine or self.engine).pool
+        return pool.checkedout() if isinstance(pool, QueuePool) else 0
+
+    def estado(self) -> dict:
+        return {
+            "sana": self.sana,
+            "reintento_en_s": max(round(self.caida_hasta - time.monotonic(), 1), 0),
+            "errores": self.errores,
+            "en_uso": self.en_uso(),
+        }
+
+
+def token_reciente(token: Optional[str]) -> bool:
+    """True si `token` es de una escritura dentro de la ventana de lectura-de-lo-escrito."""
+    if not token:
+        return False
+    try:
+        edad_ms = time.time() * 1000 - int(token)
+    except ValueError:
+        return False
+    ventana_ms = settings.DB_REPLICA_VENTANA_RYW_SEGUNDOS * 1000
+    # Un token del futuro (relojes desfasados entre workers) cuenta dentro de la misma ventana.
+    return -ventana_ms < edad_ms < ventana_ms
+
+
+class ConjuntoReplicas:
+    def __init__(self, urls: List[str], seleccion: str = "turno"):
+        self.replicas = [Replica(f"replica{indice}", url) for indice, url in enumerate(urls, 1)]
+        self.seleccion = seleccion
+        self._turno = itertools.count()
+
+    def elegir(self, token: Optional[str] = None) -> Optional[Replica]:
+        """Réplica para una lectura, o None si debe ir a la primaria."""
+        if not self.replicas:
+            return None
+        if token_reciente(token):
+            metricas.incrementar("db_lecturas", destino="principal", motivo="token")
+            return None
+        sanas = [replica for replica in self.replicas if replica.sana]
+        if not sanas:
+            metricas.incrementar("db_lecturas", destino="principal", motivo="sin_replicas_sanas")
+            return None
+        if self.seleccion == "menos_ocupada":
+            # A igual ocupación, el turno reparte entre las empatadas.
+            desfase = next(self._turno)
+            replica = min(
+                (sanas[(desfase + indice) % len(sanas)] for indice in range(len(sanas))),
+                key=Replica.en_uso,
+            )
+        else:
+            replica = sanas[next(self._turno) % len(sanas)]
+        metricas.incrementar("db_lecturas", destino=replica.nombre)
+        return replica
+
+    def estado(self) -> dict:
+        return {
+            "seleccion": self.seleccion,
+            "ventana_ryw_s": settings.DB_REPLICA_VENTANA_RYW_SEGUNDOS,
+            "replicas": {replica.nombre: replica.estado() for replica in self.replicas},
+        }
+
+
+replicas = ConjuntoReplicas(settings.DB_REPLICA_URLS, settings.DB_REPLICA_SELECCION)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _solo_lectura(estado) -> None:
+    if estado.session.info.get("replica") and (estado.is_insert or estado.is_update or estado.is_delete):
+        raise EscrituraEnReplica(f"Escritura en una sesión de solo lectura ({estado.session.info['replica']}).")
+
+
+@event.listens_for(Session, "before_flush")
+def _solo_lectura_flush(session, contexto, instancias) -> None:
+    if session.info.get("replica") and (session.new or session.dirty or session.deleted):
+        raise EscrituraEnReplica(f"Escritura en una sesión de solo lectura ({session.info['replica']}).")
+
+
+# Token del request en curso: la fijan `ConsistenciaLecturas` y los commits en la primaria.
+_escritura: ContextVar[Optional[dict]] = ContextVar("escritura_request", default=None)
+
+
+@event.listens_for(Session, "after_commit")
+def _registrar_escritura(session) -> None:
+    escritura = _escritura.get()
+    if escritura is not None and not session.info.get("replica"):
+        escritura["token"] = str(int(time.time() * 1000))
+
+
+class ConsistenciaLecturas:
+    """Middleware ASGI: añade `X-Token-Lectura` a las respuestas de requests que confirmaron escrituras."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replicas.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        escritura = {"token": None}
+        marca = _escritura.set(escritura)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start" and escritura["token"] is not None:
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (CABECERA_TOKEN.lower().encode("latin-1"), escritura["token"].encode("latin-1"))
+                ]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _escritura.reset(marca)
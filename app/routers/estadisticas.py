@@ -0,0 +1,28 @@
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Query
+from app.database import SesionBD, ejecutar, get_db_lectura
+from app.schemas.estadistica import EstadisticasOut
+from app.services import estadisticas
+
+router = APIRouter(prefix="/estadisticas", tags=["Estadísticas"])
+
+@router.get("", response_model=EstadisticasOut, summary="Estadísticas agregadas de solicitudes y servicios")
+async def obtener_estadisticas(
+    fecha_desde: Optional[date] = Query(None, description="Primer día (fecha_solicitud) incluido."),
+    fecha_hasta: Optional[date] = Query(None, description="Último día (fecha_solicitud) incluido."),
+    cliente: Optional[str] = Query(None, description="Restringe a un cliente (coincidencia exacta)."),
+    agrupar: Literal["dia", "semana", "mes"] = Query("dia", description="Tamaño del período de `ingreso`."),
+    limite_clientes: int = Query(20, ge=1, le=1000, description="Clientes en `costo_aprobado_por_cliente`."),
+    db: SesionBD = Depends(get_db_lectura),
+):
+    """
+    Conteos por estado, ingreso de solicitudes por período y costo aprobado por
+    cliente, leídos de la tabla resumen sin recorrer `solicitudes` ni `servicios`.
+    Las escrituras se reflejan tras el siguiente refresco periódico
+    (`ESTADISTICAS_INTERVALO_SEGUNDOS`); `buckets_pendientes` indica si hay cambios
+    sin aplicar.
+    """
+    return await ejecutar(
+        db, estadisticas.consultar, fecha_desde, fecha_hasta, cliente, agrupar, limite_clientes
+    )
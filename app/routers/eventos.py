@@ -0,0 +1,77 @@
+import asyncio
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.eventos import Suscripcion, publicador
+
+router = APIRouter(prefix="/eventos", tags=["Eventos"])
+
+# Espera sugerida al cliente antes de reconectar (campo `retry` de SSE).
+REINTENTO_MS = 2000
+
+
+def _formato(evento: dict) -> str:
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+
+@router.get(
+    "",
+    response_class=StreamingResponse,
+    summary="Flujo de cambios de solicitudes y servicios (Server-Sent Events)",
+    responses={200: {"content": {"text/event-stream": {"schema": {"type": "string"}}}}},
+)
+async def flujo_eventos(
+    cliente: Optional[str] = Query(None, description="Solo eventos de este cliente (coincidencia exacta)."),
+    id_solicitud: Optional[List[int]] = Query(None, description="Solo eventos de estas solicitudes."),
+    last_event_id: Optional[str] = Header(None, description="Último id recibido, para reanudar tras una desconexión."),
+):
+    """
+    Emite un evento por cada alta, modificación, cierre, vencimiento o baja de una
+    solicitud o servicio (`event:` es el tipo, p. ej. `servicio.vencido`; `data:` el
+    JSON del evento). Los ids son crecientes: al reconectar con `Last-Event-ID` se
+    reenvían los eventos posteriores que sigan en el registro
+    (`EVENTOS_RETENCION_SEGUNDOS`). Si ya no están, se emite `reinicio` y el cliente
+    debe recargar su estado con las rutas de lectura. Un comentario `: latido` cada
+    `EVENTOS_LATIDO_SEGUNDOS` mantiene viva la conexión a través de proxies.
+    """
+    try:
+        ultimo = int(last_event_id) if last_event_id else None
+    except ValueError:
+        ultimo = None
+    suscripcion = Suscripcion(cliente, id_solicitud)
+
+    async def flujo():
+        try:
+            yield f"retry: {REINTENTO_MS}\n\n"
+            cursor = await publicador.suscribir(suscripcion)
+            desde = ultimo
+            if desde is not None:
+                previos = await publicador.historial(desde, cursor)
+                if previos is None:
+                    yield _formato({"id": cursor, "tipo": "reinicio"})
+                    desde = None
+                else:
+                    for evento in previos:
+                        if suscripcion.acepta(evento):
+                            yield _formato(evento)
+            while not (suscripcion.cerrada and suscripcion.cola.empty()):
+                try:
+                    evento = await asyncio.wait_for(suscripcion.cola.get(), settings.EVENTOS_LATIDO_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ": latido\n\n"
+                    continue
+                if evento is None:
+                    break
+                # Un cliente que viene de otro worker puede ir por delante de este publicador.
+                if desde is None or evento["id"] > desde:
+                    yield _formato(evento)
+        finally:
+            publicador.desuscribir(suscripcion)
+
+    return StreamingResponse(
+        flujo(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
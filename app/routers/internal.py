@@ -0,0 +1,104 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.admision import admision
+from app.arranque import arranque
+from app.cache import cache_respuestas
+from app.config import settings
+from app.database import SessionLocal, async_engine, engine, engine_lotes
+from app.instrumentacion import SOSPECHAS_N_MAS_1
+from app.metricas import metricas
+from app.pool import estado_pool
+from app.replicas import replicas
+from app.eventos import publicador
+from app.programador import (
+    TAREA_PROCESAMIENTO, programador, programador_archivo, programador_estadisticas, programador_eventos,
+    programador_idempotencia,
+)
+from app.models.tarea import TareaProgramada
+
+# Endpoints de diagnóstico para operación; se montan fuera de /api.
+router = APIRouter(prefix="/internal", tags=["Interno"])
+
+@router.get("/cache", summary="Estado y contadores de la caché de respuestas")
+def estado_cache():
+    return cache_respuestas.estadisticas()
+
+@router.get("/pool", summary="Estado del pool de conexiones a la base de datos")
+def estado_pools():
+    pools = {"principal": estado_pool(engine)}
+    if async_engine is not None:
+        pools["async"] = estado_pool(async_engine)
+    if engine_lotes is not engine:
+        pools["lotes"] = estado_pool(engine_lotes)
+    for replica in replicas.replicas:
+        pools[replica.nombre] = estado_pool(replica.async_engine or replica.engine)
+    return {
+        "pools": pools,
+        "replicas": replicas.estado(),
+        "statement_timeout_ms": settings.DB_STATEMENT_TIMEOUT_MS,
+        "pool_recycle_s": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+@router.get("/arranque", summary="Duración de cada fase del arranque de este worker")
+def informe_arranque():
+    return arranque.informe()
+
+@router.get("/admision", summary="Requests en curso, en cola y rechazados por clase y ruta")
+def estado_admision():
+    return admision.estado()
+
+@router.get("/consultas", summary="Últimos requests con consultas repetidas (posible N+1)")
+def sospechas_n_mas_1():
+    return list(SOSPECHAS_N_MAS_1)
+
+@router.get("/programador", summary="Estado del programador de procesamiento")
+def estado_programador():
+    with SessionLocal() as db:
+        tarea = db.get(TareaProgramada, TAREA_PROCESAMIENTO)
+        fila = {
+            "propietario": tarea.propietario,
+            "lease_hasta": tarea.lease_hasta,
+            "marca_agua": tarea.marca_agua,
+            "ultima_ejecucion": tarea.ultima_ejecucion,
+        } if tarea else None
+    return {
+        "activo_en_este_worker": programador.activo,
+        "intervalo_segundos": programador.intervalo,
+        "tarea": fila,
+        "estadisticas": {
+            "activo_en_este_worker": programador_estadisticas.activo,
+            "intervalo_segundos": programador_estadisticas.intervalo,
+        },
+        "poda_eventos": {
+            "activo_en_este_worker": programador_eventos.activo,
+            "intervalo_segundos": programador_eventos.intervalo,
+        },
+        "archivo": {
+            "activo_en_este_worker": programador_archivo.activo,
+            "intervalo_segundos": programador_archivo.intervalo,
+            "dias": settings.ARCHIVO_DIAS,
+        },
+        "poda_idempotencia": {
+            "activo_en_este_worker": programador_idempotencia.activo,
+            "intervalo_segundos": programador_idempotencia.intervalo,
+            "ttl_segundos": settings.IDEMPOTENCIA_TTL_SEGUNDOS,
+        },
+    }
+
+@router.get("/eventos", summary="Estado del publicador de eventos de este worker")
+def estado_eventos():
+    return {
+        "activo": publicador.activo,
+        "suscripciones": len(publicador.suscripciones),
+        "cursor": publicador.cursor,
+        "intervalo_segundos": publicador.intervalo,
+    }
+
+@router.get("/metricas", summary="Métricas del proceso en JSON")
+def ver_metricas():
+    return metricas.instantanea()
+
+@router.get("/metricas/prometheus", response_class=PlainTextResponse, summary="Métricas del proceso en formato Prometheus")
+def ver_metricas_prometheus():
+    return metricas.formato_prometheus()
@@ -1,73 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from datetime import datetime, date
-from app.database import get_db
-from app.models.solicitud import SolicitudEstado, EstadoSolicitud # Usamos el Enum correcto
-from app.models.servicio import EstadoServicio
-from app.models import solicitud as solicitud_model
-from app.models import servicio as servicio_model
-from sqlalchemy import func # Importar func para la fecha
+from app.config import settings
+from app.database import SesionBD, ejecutar, get_db_lotes
+from app.programador import ejecutar_archivado, ejecutar_procesamiento
+from app.services import procesamiento as servicio_procesamiento
 
 router = APIRouter(tags=["Procesamiento Automático"])
 
 @router.post("/procesar_solicitudes", summary="Procesa servicios vencidos y cierra solicitudes completadas")
-def procesar_solicitudes_pendientes(db: Session = Depends(get_db)):
+async def procesar_solicitudes_pendientes(
+    dry_run: bool = Query(False, description="Solo informa cuántas filas cambiarían, sin modificar nada."),
+    tamano_lote: int = Query(servicio_procesamiento.TAMANO_LOTE_POR_DEFECTO, ge=1, le=100000, description="Cantidad de claves por lote."),
+    db: SesionBD = Depends(get_db_lotes),
+):
     """
     Este endpoint simula una tarea programada que realiza las siguientes acciones:
     1. Marca como 'Vencidos' los servicios en estado 'Pendiente' cuya fecha de reunión ya pasó.
     2. Cambia el estado de las solicitudes a 'Cerrada' si todos sus servicios
         han finalizado (Aprobado, Rechazado o Vencido).
-    """
-    hoy = datetime.utcnow().date() # Usamos UTC para consistencia y solo la fecha
 
-    total_servicios_vencidos = 0
-    total_solicitudes_cerradas = 0
+    Ambas fases se ejecutan con UPDATE sobre conjuntos, por rangos de clave y con un
+    commit por lote (ver `app/services/procesamiento.py`). Además de los contadores
+    devuelve el tiempo de cada fase.
 
+    Es el disparo manual de la tarea que `app/programador.py` ejecuta periódicamente:
+    recorre todo (no solo desde la marca de agua) y responde 409 si otro worker la
+    está ejecutando.
+    """
     try:
-        # 1. Marcar servicios vencidos
-        servicios_a_vencer = db.query(servicio_model.Servicio).filter(
-            servicio_model.Servicio.estado_servicio == EstadoServicio.PENDIENTE,
-            # SOLUCIÓN AL ERROR ANTERIOR: Usar func.DATE()
-            func.DATE(servicio_model.Servicio.fecha_reunion) < hoy
-        ).all()
-
-        for servicio in servicios_a_vencer:
-            servicio.estado_servicio = EstadoServicio.VENCIDO
-            # No necesitas db.add() aquí si el objeto ya está gestionado por la sesión
-            total_servicios_vencidos += 1
-        
-        # 2. Cerrar solicitudes si todos sus servicios están en estado final
-        solicitudes_activas = db.query(solicitud_model.Solicitud).filter(
-            solicitud_model.Solicitud.estado.in_([EstadoSolicitud.ABIERTA, EstadoSolicitud.EN_PROCESO])
-        ).all()
-
-        for solicitud in solicitudes_activas:
-            servicios = solicitud.servicios
-            # Si la solicitud tiene servicios y TODOS están en un estado final
-            if servicios and all(s.estado_servicio in [EstadoServicio.APROBADO, EstadoServicio.RECHAZADO, EstadoServicio.VENCIDO] for s in servicios):
-                if solicitud.estado != EstadoSolicitud.CERRADA:
-                    solicitud.estado = EstadoSolicitud.CERRADA
-                    solicitud.fecha_ultima_modificacion = datetime.utcnow()
-                    # No necesitas db.add() aquí si el objeto ya está gestionado por la sesión
-                    total_solicitudes_cerradas += 1
-
-        # Si todo lo anterior se ejecutó sin errores, entonces confirmamos los cambios.
-        db.commit()
-
-        return {
-            "mensaje": "Procesamiento completado correctamente.",
-            "servicios_marcados_vencidos": total_servicios_vencidos,
-            "solicitudes_cerradas_automaticamente": total_solicitudes_cerradas
-        }
-
+        if dry_run:
+            resultado = await ejecutar(db, servicio_procesamiento.procesar_pendientes, tamano_lote=tamano_lote, dry_run=True)
+        else:
+            # Misma exclusión que el programador: con varios workers solo uno procesa a la vez.
+            resultado = await run_in_threadpool(
+                ejecutar_procesamiento, completo=True, tamano_lote=tamano_lote, origen="manual"
+            )
     except Exception as e:
-        # Si ocurre CUALQUIER error en el bloque try, deshacemos todos los cambios
-        # que se hayan acumulado en la sesión desde el inicio de la función.
-        db.rollback()
+        # Los lotes ya confirmados permanecen aplicados; se deshace solo el lote en curso
+        # (la pasada real usa su propia sesión y la revierte ella misma).
+        await ejecutar(db, Session.rollback)
         print(f"Error durante el procesamiento de solicitudes: {e}") # Para depuración
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error interno del servidor durante el procesamiento: {e}"
         )
-    # No es necesario un 'finally' aquí a menos que tengas recursos que necesites cerrar explícitamente,
-    # pero FastAPI y Depends se encargan de cerrar la sesión de DB por ti.
\ No newline at end of file
+    if resultado is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Hay un procesamiento en curso en otro worker; intente de nuevo en unos segundos."
+        )
+
+    mensaje = "Simulación completada: no se modificó ningún registro." if dry_run else "Procesamiento completado correctamente."
+    return {"mensaje": mensaje, **resultado}
+
+@router.post("/archivar_solicitudes", summary="Archiva las solicitudes finalizadas hace más de N días")
+async def archivar_solicitudes(
+    dias: int = Query(settings.ARCHIVO_DIAS, ge=0, description="Días desde la última modificación de la solicitud Cerrada o Cancelada."),
+    dry_run: bool = Query(False, description="Solo informa cuántas solicitudes se archivarían."),
+    tamano_lote: int = Query(settings.ARCHIVO_TAMANO_LOTE, ge=1, le=10000, description="Solicitudes por lote."),
+):
+    """
+    Mueve las solicitudes finalizadas antiguas y sus servicios a las tablas de archivo,
+    por lotes y con un commit por lote (ver `app/services/archivo.py`). Siguen
+    disponibles en `GET /solicitudes/{id}` y en el listado con `incluir_archivadas=true`.
+
+    Es el disparo manual de la tarea periódica; responde 409 si otro worker la está ejecutando.
+    """
+    resultado = await run_in_threadpool(
+        ejecutar_archivado, dias=dias, tamano_lote=tamano_lote, dry_run=dry_run, origen="manual"
+    )
+    if resultado is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Hay un archivado en curso en otro worker; intente de nuevo en unos segundos."
+        )
+    return resultado
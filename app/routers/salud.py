@@ -0,0 +1,41 @@
+import asyncio
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from app.arranque import arranque
+from app.config import settings
+from app.database import engine
+
+# Sondas para el orquestador; se montan fuera de /api y sin control de admisión.
+router = APIRouter(prefix="/health", tags=["Salud"])
+
+
+def _comprobar_base() -> None:
+    with engine.connect() as conexion:
+        conexion.exec_driver_sql("SELECT 1")
+    arranque.reverificar_esquema()
+
+
+@router.get("/live", summary="El proceso responde (no consulta la base de datos)")
+async def vivo():
+    return {"vivo": True}
+
+
+@router.get("/ready", summary="El worker puede atender tráfico: arranque completo, base accesible y esquema al día")
+async def listo():
+    """
+    200 si el worker terminó de arrancar, la base responde en menos de
+    `SALUD_TIMEOUT_SEGUNDOS` y el esquema es el esperado; si no, 503 con los motivos.
+    Durante el apagado responde 503 para que el balanceador deje de enviarle tráfico.
+    """
+    problemas = arranque.problemas()
+    if not arranque.apagando and arranque.completo:
+        try:
+            await asyncio.wait_for(run_in_threadpool(_comprobar_base), settings.SALUD_TIMEOUT_SEGUNDOS)
+        except asyncio.TimeoutError:
+            problemas = [f"la base de datos no respondió en {settings.SALUD_TIMEOUT_SEGUNDOS:g} s"]
+        except Exception as e:
+            problemas = [f"base de datos: {e}"]
+        else:
+            problemas = arranque.problemas()
+    return JSONResponse(status_code=503 if problemas else 200, content={"listo": not problemas, "problemas": problemas})
@@ -1,65 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
 from datetime import datetime, date # Import date for date comparisons
-from app.database import get_db
-from app.models import servicio as models_servicio
-from app.models.servicio import EstadoServicio
-from app.schemas.servicio import ServicioOut, ServicioCreate, ServicioUpdate # Import ServicioUpdate
+from app import cache
+from app.cache import cache_respuestas
+from app.database import SesionBD, ejecutar, get_db, get_db_lotes
+from app.models.servicio import EstadoServicio, Servicio
+from app.schemas.servicio import ServicioOut, ServicioCreate, ServicioUpdate, ServiciosBulkOut, ServiciosBulkUpdate # Import ServicioUpdate
+from app.models.solicitud import Solicitud
+from app.services import contadores, escrituras, estadisticas, eventos, procesamiento
+from app.services import servicios as servicio_servicios
 
 router = APIRouter(prefix="/servicios", tags=["Servicios"])
 
-@router.put("/{id}", response_model=ServicioOut, summary="Actualizar un servicio por ID")
-def update_servicio(id: int, servicio_update: ServicioUpdate, db: Session = Depends(get_db)):
+@router.patch("/bulk", response_model=ServiciosBulkOut, summary="Cambiar estado y/o costo de muchos servicios en una transacción")
+async def update_servicios_bulk(lote: ServiciosBulkUpdate, db: SesionBD = Depends(get_db_lotes)):
     """
-    Actualiza los campos de un servicio existente.
-    Incluye validaciones para la fecha de reunión y el costo estimado.
+    Aplica cada cambio `{id_servicio, estado_servicio?, costo_estimado?}` con las mismas
+    reglas que `PUT /servicios/{id}`, en una sola transacción y con sentencias sobre
+    conjuntos (ver `app/services/servicios.py`). Un cambio inválido no impide aplicar
+    los demás: la respuesta trae el resultado de cada uno, en el orden recibido.
     """
-    servicio = db.query(models_servicio.Servicio).filter(models_servicio.Servicio.id_servicio == id).first()
-    if not servicio:
-        raise HTTPException(status_code=404, detail="Servicio no encontrado")
+    resultados, solicitudes = await ejecutar(db, servicio_servicios.actualizar_en_lote, lote.cambios)
+    cache_respuestas.invalidar_solicitudes(solicitudes)
+    actualizados = sum(r["resultado"] == "actualizado" for r in resultados)
+    return {
+        "resultados": resultados,
+        "actualizados": actualizados,
+        "rechazados": sum(r["resultado"] in ("rechazado", "no_encontrado", "conflicto") for r in resultados),
+    }
 
-    # La validación de fecha futura ahora se maneja en el validador de Pydantic de ServicioUpdate
-    # No es necesario un chequeo manual aquí a menos que quieras una lógica de error muy específica.
+SERVICIO_MODIFICADO = "El servicio fue modificado por otra operación; vuelva a leerlo y reintente."
 
+@router.put("/{id}", response_model=ServicioOut, summary="Actualizar un servicio por ID")
+async def update_servicio(id: int, servicio_update: ServicioUpdate, request: Request, response: Response, db: SesionBD = Depends(get_db)):
+    """
+    Actualiza los campos de un servicio existente con un único UPDATE condicional.
+    La regla del costo estimado y, si se envía `If-Match`, la versión del servicio van en
+    el WHERE; responde 412 si la versión ya no es la enviada.
+    """
+    versiones = cache.versiones_if_match(request)
+    valores = servicio_update.model_dump(exclude_unset=True)
+    # Excluir 'id_servicio' de ser actualizado si se envía (no debería ser editable)
+    valores.pop("id_servicio", None)
+    if valores.get("estado_servicio", EstadoServicio.PENDIENTE) is None:
+        valores.pop("estado_servicio")
+
+    condiciones = [Servicio.id_servicio == id, *escrituras.condiciones_version(Servicio.version, versiones)]
+    regla = SERVICIO_MODIFICADO
     # Validación de regla de negocio: costo_estimado solo si el servicio está APROBADO
-    if servicio_update.estado_servicio is not None:
-        if servicio_update.estado_servicio != EstadoServicio.APROBADO and servicio_update.costo_estimado is not None:
-            raise HTTPException(status_code=400, detail="No se puede establecer un costo estimado si el servicio no está en estado 'Aprobado'.")
-        elif servicio_update.estado_servicio != EstadoServicio.APROBADO and servicio.costo_estimado is not None:
+    if "estado_servicio" in valores:
+        if valores["estado_servicio"] != EstadoServicio.APROBADO:
+            if valores.get("costo_estimado") is not None:
+                raise HTTPException(status_code=400, detail="No se puede establecer un costo estimado si el servicio no está en estado 'Aprobado'.")
             # Si el estado cambia de APROBADO a no APROBADO y hay un costo existente, lo limpiamos
-            servicio.costo_estimado = None
-    elif servicio_update.costo_estimado is not None and servicio.estado_servicio != EstadoServicio.APROBADO:
-        raise HTTPException(status_code=400, detail="El costo estimado solo puede establecerse para servicios en estado 'Aprobado'.")
+            valores["costo_estimado"] = None
+    elif valores.get("costo_estimado") is not None:
+        # El estado actual solo se conoce en la base: la regla va en el WHERE.
+        regla = "El costo estimado solo puede establecerse para servicios en estado 'Aprobado'."
+        condiciones.append(Servicio.estado_servicio == EstadoServicio.APROBADO)
 
-    # Actualizar los campos del servicio
-    # Usar .model_dump(exclude_unset=True) para obtener solo los campos que se enviaron en la solicitud
-    for key, value in servicio_update.model_dump(exclude_unset=True).items():
-        # Excluir 'id_servicio' de ser actualizado si se envía (no debería ser editable)
-        if key == "id_servicio":
-            continue
-        setattr(servicio, key, value)
+    def actualizar(db: Session):
+        tabla = Servicio.__table__
+        sentencia = update(tabla).where(*condiciones).values(**valores, version=tabla.c.version + 1)
+        columnas = list(tabla.c)
+        previa = None
+        if "estado_servicio" in valores and db.get_bind().dialect.name == "postgresql":
+            # Los contadores necesitan el estado anterior y RETURNING solo ve los valores
+            # nuevos: se lee en la misma sentencia con una subconsulta FOR UPDATE de la fila,
+            # que devuelve su versión vigente aunque otra transacción la haya cambiado.
+            previa = (
+                select(tabla.c.id_servicio, tabla.c.estado_servicio)
+                .where(tabla.c.id_servicio == id)
+                .with_for_update()
+                .subquery("previa")
+            )
+            sentencia = sentencia.where(tabla.c.id_servicio == previa.c.id_servicio)
+            columnas.append(previa.c.estado_servicio.label("estado_anterior"))
+        fila = escrituras.actualizar_columnas(db, sentencia, tabla.c.id_servicio == id, *columnas)
+        if fila is None:
+            db.rollback()
+            codigo, detalle = escrituras.diagnosticar(
+                db, Servicio.id_servicio, id, Servicio.version, versiones,
+                "Servicio no encontrado", SERVICIO_MODIFICADO, regla,
+            )
+            raise HTTPException(status_code=codigo, detail=detalle)
 
-    # REMOVED: servicio.fecha_ultima_modificacion = datetime.utcnow()
-    # Tu modelo 'Servicio' no tiene la columna 'fecha_ultima_modificacion'.
-    # Si la necesitas, agrégala explícitamente a app/models/servicio.py.
+        id_solicitud = fila.id_solicitud
+        if previa is not None:
+            contadores.cambiar_estado(db, id_solicitud, fila.estado_anterior, fila.estado_servicio)
+        elif "estado_servicio" in valores:
+            # SQLite serializa las escrituras: recalcular desde `servicios` es exacto.
+            contadores.recalcular(db, Solicitud.id == id_solicitud)
+        if "estado_servicio" in valores or "costo_estimado" in valores:
+            estadisticas.marcar(db, Solicitud.id == id_solicitud)
+        if valores.get("estado_servicio") == EstadoServicio.PENDIENTE:
+            procesamiento.reabrir_ventana(db, Servicio.id_servicio == id)
+        eventos.registrar(db, "servicio.actualizado", id_solicitud, id, fila.estado_servicio)
+        db.commit()
+        return id_solicitud, ServicioOut.model_validate(dict(fila._mapping))
 
-    db.commit()
-    db.refresh(servicio)
+    id_solicitud, servicio = await ejecutar(db, actualizar)
+    cache_respuestas.invalidar_solicitudes([id_solicitud])
+    response.headers["ETag"] = f'"{servicio.version}"'
     return servicio
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT, summary="Eliminar un servicio por ID")
-def delete_servicio(id: int, db: Session = Depends(get_db)):
+async def delete_servicio(id: int, request: Request, db: SesionBD = Depends(get_db)):
     """
     Elimina un servicio existente.
-    No se puede eliminar un servicio que está en estado "Aprobado".
+    No se puede eliminar un servicio que está en estado "Aprobado"; la regla y la versión
+    de `If-Match` se comprueban en el WHERE del DELETE.
     """
-    servicio = db.query(models_servicio.Servicio).filter(models_servicio.Servicio.id_servicio == id).first() # Corrected: use id_servicio
-    if not servicio:
-        raise HTTPException(status_code=404, detail="Servicio no encontrado")
-    
-    if servicio.estado_servicio == EstadoServicio.APROBADO:
-        raise HTTPException(status_code=400, detail="No se puede eliminar un servicio que está en estado 'Aprobado'.")
+    versiones = cache.versiones_if_match(request)
+
+    def eliminar(db: Session):
+        sentencia = delete(Servicio).where(
+            Servicio.id_servicio == id,
+            Servicio.estado_servicio != EstadoServicio.APROBADO,
+            *escrituras.condiciones_version(Servicio.version, versiones),
+        )
+        fila = escrituras.eliminar(db, sentencia, Servicio.id_solicitud, Servicio.estado_servicio)
+        if fila is None:
+            db.rollback()
+            codigo, detalle = escrituras.diagnosticar(
+                db, Servicio.id_servicio, id, Servicio.version, versiones,
+                "Servicio no encontrado", SERVICIO_MODIFICADO,
+                "No se puede eliminar un servicio que está en estado 'Aprobado'.",
+            )
+            raise HTTPException(status_code=codigo, detail=detalle)
+
+        id_solicitud = fila.id_solicitud
+        contadores.ajustar(db, id_solicitud, {fila.estado_servicio: -1})
+        estadisticas.marcar(db, Solicitud.id == id_solicitud)
+        eventos.registrar(db, "servicio.eliminado", id_solicitud, id, fila.estado_servicio)
+        db.commit()
+        return id_solicitud
 
-    db.delete(servicio)
-    db.commit()
-    
+    id_solicitud = await ejecutar(db, eliminar)
+    cache_respuestas.invalidar_solicitudes([id_solicitud])
@@ -1,200 +1,574 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session, joinedload
+import asyncio
+import json
+import tempfile
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from starlette.requests import ClientDisconnect
+from sqlalchemy import and_, delete, exists, update
+from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, date, timedelta # Importamos date
-from app.database import get_db
+from app import cache, serializacion
+from app.cache import cache_respuestas
+from app.database import SesionBD, SessionLotes, ejecutar, fabrica_lotes, get_db, get_db_lectura
 from app.models import solicitud as models_solicitud
 from app.models import servicio as models_servicio
 from app.models.solicitud import EstadoSolicitud, Solicitud # Importar el Enum correcto
 from app.models.servicio import EstadoServicio # Importar el Enum correcto
 from app.schemas import solicitud as schemas_solicitud
 from app.schemas.servicio import ServicioCreate, ServicioOut
+from app.services import busqueda, contadores, escrituras, estadisticas, eventos, exportacion, idempotencia, importacion
+from app.services import solicitudes as servicio_solicitudes
 
 router = APIRouter(prefix="/solicitudes", tags=["Solicitudes"])
 
+CLAVE_IDEMPOTENCIA = Header(
+    None,
+    alias=idempotencia.CABECERA,
+    max_length=idempotencia.LONGITUD_MAXIMA,
+    description="Clave única del cliente: un reintento con la misma clave recibe la respuesta original sin volver a crear nada.",
+)
+
+def _reservar_clave(db: Session, clave: Optional[str], ruta: str, cuerpo: bytes):
+    """
+    Reserva `clave` (si vino) en la transacción de `db`. Si ya tiene una respuesta
+    guardada revierte y la devuelve como (estado_http, cuerpo); si no, None.
+    """
+    if not clave:
+        return None
+    try:
+        previa = idempotencia.reservar(db, clave, ruta, idempotencia.huella(cuerpo))
+    except idempotencia.ClaveReutilizada as e:
+        db.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
+    if previa is None:
+        return None
+    respuesta = previa.estado_http, previa.cuerpo
+    db.rollback()
+    return respuesta
+
+def _respuesta_creacion(estado_http: int, contenido: bytes, repetida: bool) -> Response:
+    headers = {idempotencia.CABECERA_REPETIDA: "true"} if repetida else None
+    return Response(content=contenido, status_code=estado_http, media_type="application/json", headers=headers)
+
 @router.post("/", response_model=schemas_solicitud.SolicitudOut, status_code=status.HTTP_201_CREATED, summary="Crear una nueva solicitud")
-def create_solicitud(solicitud_in: schemas_solicitud.SolicitudCreate, db: Session = Depends(get_db)):
+async def create_solicitud(
+    solicitud_in: schemas_solicitud.SolicitudCreate,
+    db: SesionBD = Depends(get_db),
+    clave_idempotencia: Optional[str] = CLAVE_IDEMPOTENCIA,
+):
     """
     Crea una nueva solicitud de ingeniería y sus servicios asociados.
     Requiere al menos un servicio y valida que la fecha de reunión sea futura.
     La operación es atómica: si falla la creación de la solicitud o de alguno de sus servicios,
     toda la transacción se revierte.
+
+    Con `Idempotency-Key`, un reintento con la misma clave recibe la respuesta original
+    (con `Idempotent-Replayed: true`) sin crear otra solicitud; ver
+    `app/services/idempotencia.py`.
     """
-    # Pydantic ya validará si `servicios_solicitados` está vacío debido a `min_items=1`
-    # en el esquema SolicitudCreate. Si no se envía al menos un servicio, FastAPI
-    # devolverá automáticamente un 422 Unprocessable Entity.
+    def crear(db: Session):
+        previa = _reservar_clave(db, clave_idempotencia, "POST /solicitudes/", solicitud_in.model_dump_json().encode())
+        if previa is not None:
+            return (*previa, True)
 
-    db_solicitud = models_solicitud.Solicitud(
-        cliente=solicitud_in.cliente,
-        email_cliente=solicitud_in.email_cliente,
-        observaciones=solicitud_in.observaciones,
-        # fecha_solicitud y fecha_ultima_modificacion se establecen automáticamente por el modelo ORM
-        # estado se establece automáticamente a ABIERTA por el modelo ORM
-    )
+        # Pydantic ya validará si `servicios_solicitados` está vacío debido a `min_length=1`
+        # en el esquema SolicitudCreate. Si no se envía al menos un servicio, FastAPI
+        # devolverá automáticamente un 422 Unprocessable Entity.
 
-    try:
-        db.add(db_solicitud)
-        # db.flush() es crucial aquí para que db_solicitud.id esté disponible
-        # antes de intentar añadir los servicios, pero sin hacer commit aún.
-        db.flush()
+        db_solicitud = models_solicitud.Solicitud(
+            cliente=solicitud_in.cliente,
+            email_cliente=solicitud_in.email_cliente,
+            observaciones=solicitud_in.observaciones,
+            # Todos los servicios nacen pendientes
+            **contadores.iniciales([EstadoServicio.PENDIENTE] * len(solicitud_in.servicios)),
+            # fecha_solicitud y fecha_ultima_modificacion se establecen automáticamente por el modelo ORM
+            # estado se establece automáticamente a ABIERTA por el modelo ORM
+        )
+
+        try:
+            db.add(db_solicitud)
+            # db.flush() es crucial aquí para que db_solicitud.id esté disponible
+            # antes de intentar añadir los servicios, pero sin hacer commit aún.
+            db.flush()
+
+            # Iterar sobre los servicios proporcionados y crearlos
+            # ¡IMPORTANTE! Aquí se usa `solicitud_in.servicios_solicitados`
+            # si tu esquema SolicitudCreate tiene ese nombre de campo.
+            # En el código que pegaste, usaste `solicitud_in.servicios`, lo cual
+            # podría ser el origen de otra confusión si el esquema no coincide.
+            # Asegúrate de que el nombre del campo en SolicitudCreate sea `servicios_solicitados`.
+            for servicio_data in solicitud_in.servicios: # <-- Asegúrate de usar el nombre correcto del campo
+                # Las validaciones de ServicioCreate (como fecha_reunion futura)
+                # ya fueron manejadas por Pydantic antes de llegar a esta función.
+                db_servicio = models_servicio.Servicio(
+                    id_solicitud=db_solicitud.id, # Asocia el servicio con la solicitud recién creada
+                    nombre_servicio=servicio_data.nombre_servicio,
+                    # Convertir date a datetime si tu columna es DateTime en el modelo Servicio
+                    fecha_reunion=datetime.combine(servicio_data.fecha_reunion, datetime.min.time()),
+                    comentarios=servicio_data.comentarios,
+                    estado_servicio=EstadoServicio.PENDIENTE # Estado inicial para un nuevo servicio
+                )
+                db.add(db_servicio)
 
-        # Iterar sobre los servicios proporcionados y crearlos
-        # ¡IMPORTANTE! Aquí se usa `solicitud_in.servicios_solicitados`
-        # si tu esquema SolicitudCreate tiene ese nombre de campo.
-        # En el código que pegaste, usaste `solicitud_in.servicios`, lo cual
-        # podría ser el origen de otra confusión si el esquema no coincide.
-        # Asegúrate de que el nombre del campo en SolicitudCreate sea `servicios_solicitados`.
-        for servicio_data in solicitud_in.servicios: # <-- Asegúrate de usar el nombre correcto del campo
-            # Las validaciones de ServicioCreate (como fecha_reunion futura)
-            # ya fueron manejadas por Pydantic antes de llegar a esta función.
-            db_servicio = models_servicio.Servicio(
-                id_solicitud=db_solicitud.id, # Asocia el servicio con la solicitud recién creada
-                nombre_servicio=servicio_data.nombre_servicio,
-                # Convertir date a datetime si tu columna es DateTime en el modelo Servicio
-                fecha_reunion=datetime.combine(servicio_data.fecha_reunion, datetime.min.time()),
-                comentarios=servicio_data.comentarios,
-                estado_servicio=EstadoServicio.PENDIENTE # Estado inicial para un nuevo servicio
+            estadisticas.marcar(db, models_solicitud.Solicitud.id == db_solicitud.id)
+            eventos.solicitudes(db, "solicitud.creada", models_solicitud.Solicitud.id == db_solicitud.id)
+            db.flush()
+
+            # La respuesta se arma antes del commit (los valores por defecto ya se
+            # aplicaron en el flush) para guardarla con la clave en la misma transacción.
+            contenido = serializacion.a_json(servicio_solicitudes.detalle(db, db_solicitud.id))
+            if clave_idempotencia:
+                idempotencia.guardar(db, clave_idempotencia, status.HTTP_201_CREATED, contenido)
+            db.commit() # Si todo va bien, se hace commit de la solicitud y todos sus servicios.
+            return status.HTTP_201_CREATED, contenido, False
+
+        except Exception as e:
+            db.rollback()
+            print(f"Error durante la creación de solicitud y servicios: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error al crear la solicitud o sus servicios. Detalle: {e}"
             )
-            db.add(db_servicio)
 
-        db.commit() # Si todo va bien, se hace commit de la solicitud y todos sus servicios.
-        db.refresh(db_solicitud) # Refresca la solicitud para cargar los datos generados por la DB (ej. IDs)
+    async with idempotencia.turno(clave_idempotencia):
+        return _respuesta_creacion(*await ejecutar(db, crear))
 
-        # Cargar explícitamente los servicios para que estén disponibles en la respuesta
-        # Esto es necesario si no tienes una relación cargada automáticamente o si necesitas
-        # asegurar que los servicios estén en el objeto devuelto.
-        # `joinedload` es la forma eficiente de cargar relaciones en SQLAlchemy.
-        # Usa el nombre de la relación definida en tu modelo Solicitud, que es 'servicios'.
-        db_solicitud_with_services = db.query(models_solicitud.Solicitud).options(
-            joinedload(models_solicitud.Solicitud.servicios) # Usar 'servicios' aquí
-        ).filter(models_solicitud.Solicitud.id == db_solicitud.id).first()
+# Importación masiva de solicitudes
+@router.post(
+    "/bulk",
+    summary="Importar solicitudes con sus servicios de forma masiva",
+    response_class=StreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string", "description": "Un SolicitudCreate por línea."}},
+                "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/SolicitudCreate"}}},
+            },
+        }
+    },
+)
+async def importar_solicitudes(
+    request: Request,
+    tamano_lote: int = Query(importacion.TAMANO_LOTE_POR_DEFECTO, ge=1, le=5000, description="Solicitudes por INSERT/commit."),
+):
+    """
+    Recibe un flujo NDJSON (una solicitud por línea) o un arreglo JSON de solicitudes,
+    valida cada registro con `SolicitudCreate` y los inserta por lotes.
 
-        # Asegúrate de que el objeto retornado tenga los servicios cargados correctamente
-        # Si SolicitudOut espera 'servicios' y el modelo tiene 'servicios', esto debería funcionar.
-        return db_solicitud_with_services
+    La respuesta es NDJSON con un resultado por registro, en el orden recibido:
+    `{"indice": n, "id": ...}` si se creó o `{"indice": n, "errores": [...]}` si no,
+    y una última línea `{"resumen": {...}}`. Cada lote se confirma por separado y sus
+    resultados se envían en cuanto se confirma, mientras el cuerpo se sigue leyendo.
+    Un cliente que solo lee la respuesta al terminar de enviar (la mayoría) la recibe
+    completa al final: lo que no pudo enviarse espera en un archivo temporal, sin
+    frenar la lectura del cuerpo.
+    """
+    # Los resultados se acumulan en un archivo temporal (en disco si crecen) para no
+    # mantener en memoria ni el cuerpo ni la respuesta completos.
+    salida = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    contadores = {"creadas": 0, "con_error": 0}
+    hay_resultados = asyncio.Event()
+    estado = {"escritos": 0, "terminado": False}
 
-    except Exception as e:
-        db.rollback()
-        print(f"Error durante la creación de solicitud y servicios: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error al crear la solicitud o sus servicios. Detalle: {e}"
-        )
+    def escribir(resultado: dict):
+        if "id" in resultado:
+            contadores["creadas"] += 1
+        elif "errores" in resultado:
+            contadores["con_error"] += 1
+        salida.seek(estado["escritos"])
+        estado["escritos"] += salida.write(json.dumps(resultado, ensure_ascii=False).encode() + b"\n")
+
+    async def importar():
+        # Sesión propia: vive lo que dura la respuesta, no lo que dura el endpoint.
+        db = SessionLotes()
+        # Registros leídos desde el último lote: esquema validado o resultado de error,
+        # para que la respuesta conserve el orden de entrada.
+        pendientes = []
+        validos_en_lote = 0
+
+        async def vaciar_lote():
+            validos = [(indice, dato) for indice, dato in pendientes if not isinstance(dato, dict)]
+            insertados = {}
+            if validos:
+                for resultado in await ejecutar(db, importacion.insertar_lote, validos):
+                    insertados[resultado["indice"]] = resultado
+            for indice, dato in pendientes:
+                escribir(dato if isinstance(dato, dict) else insertados[indice])
+            pendientes.clear()
+            hay_resultados.set()
+
+        try:
+            async for indice, registro in importacion.leer_registros(request.stream()):
+                try:
+                    pendientes.append((indice, importacion.validar(registro)))
+                    validos_en_lote += 1
+                except ValueError as e:  # incluye ValidationError y líneas NDJSON inválidas
+                    pendientes.append((indice, {"indice": indice, "errores": importacion.errores_validacion(e)}))
+                if validos_en_lote >= tamano_lote or len(pendientes) >= 4 * tamano_lote:
+                    await vaciar_lote()
+                    validos_en_lote = 0
+            await vaciar_lote()
+        except importacion.ErrorFormato as e:
+            await vaciar_lote()
+            escribir({"error": str(e)})
+        except ClientDisconnect:
+            pass  # los lotes confirmados quedan; ya no hay a quién responder
+        except Exception as e:
+            # La respuesta ya empezó con 200: el error va como una línea más, y el resumen
+            # indica qué se creó antes de él.
+            await ejecutar(db, Session.rollback)
+            escribir({"error": f"Error interno del servidor durante la importación: {e}"})
+        finally:
+            escribir({"resumen": dict(contadores)})
+            await run_in_threadpool(db.close)
+            estado["terminado"] = True
+            hay_resultados.set()
+
+    async def enviar():
+        tarea = asyncio.create_task(importar())
+        enviados = 0
+        while True:
+            await hay_resultados.wait()
+            hay_resultados.clear()
+            while enviados < estado["escritos"]:
+                salida.seek(enviados)
+                bloque = salida.read(min(64 * 1024, estado["escritos"] - enviados))
+                enviados += len(bloque)
+                yield bloque
+            if estado["terminado"] and enviados == estado["escritos"]:
+                break
+        await tarea
+
+    return _RespuestaImportacion(enviar(), media_type="application/x-ndjson", background=BackgroundTask(salida.close))
+
+
+class _RespuestaImportacion(StreamingResponse):
+    """
+    StreamingResponse que no vigila la desconexión del cliente. Con ASGI < 2.4 Starlette
+    la vigila leyendo `receive`, y descartaría partes del cuerpo que la importación
+    todavía está leyendo; aquí la desconexión la detecta `request.stream()`.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+# Lectura por lote
+@router.post("/batch-get", summary="Obtener varias solicitudes por ID en una sola petición")
+async def batch_get_solicitudes(consulta: schemas_solicitud.SolicitudesBatchGet, db: SesionBD = Depends(get_db_lectura)):
+    """
+    Devuelve `{"solicitudes": [...], "faltantes": [...]}`: las solicitudes existentes en
+    el orden de `ids` (con la forma de `SolicitudOut`, o solo los campos de `fields`) y
+    los ids que no existen. Todas se leen con una consulta IN y sus servicios con una
+    más (`selectinload`), en lugar de una petición por solicitud.
+    """
+    contenido, faltantes = await ejecutar(db, servicio_solicitudes.cargar_por_ids, consulta.ids, consulta.fields)
+    cuerpo = b'{"solicitudes":' + contenido + b',"faltantes":' + json.dumps(faltantes).encode() + b"}"
+    return Response(content=cuerpo, media_type="application/json")
+
+# Autocompletar nombres de cliente
+@router.get("/clientes/sugerencias", response_model=List[str], summary="Sugerir nombres de cliente por prefijo")
+async def sugerir_clientes(
+    prefijo: str = Query(..., min_length=1, max_length=100),
+    limite: int = Query(10, ge=1, le=busqueda.MAX_SUGERENCIAS),
+    db: SesionBD = Depends(get_db_lectura)
+):
+    """Devuelve hasta `limite` nombres de cliente distintos que empiezan por `prefijo`."""
+    return await ejecutar(db, busqueda.sugerir_clientes, prefijo, limite)
+
+# Exportación completa en flujo (debe declararse antes de "/{id}")
+def _respuesta_exportacion(bloques, formato: str, comprimir: bool, nombre: str):
+    headers = {"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'}
+    if comprimir:
+        bloques = exportacion.comprimir_gzip(bloques)
+        headers["Content-Encoding"] = "gzip"
+    media_type = "application/x-ndjson" if formato == "ndjson" else "text/csv; charset=utf-8"
+    return StreamingResponse(bloques, media_type=media_type, headers=headers)
+
+@router.get("/export", summary="Exportar todas las solicitudes filtradas (NDJSON o CSV)", response_class=StreamingResponse)
+def exportar_solicitudes(
+    request: Request,
+    estado: Optional[EstadoSolicitud] = Query(None),
+    cliente: Optional[str] = Query(None),
+    fecha_desde: Optional[date] = Query(None),
+    fecha_hasta: Optional[date] = Query(None),
+    ordenar_por: str = Query("id"),
+    orden: str = Query("asc"),
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    servicios: str = Query("ninguno", pattern="^(inline|ninguno)$", description="'inline' anida los servicios en cada solicitud (solo NDJSON). Para CSV use /solicitudes/export/servicios."),
+    comprimir: bool = Query(False, description="Comprime la respuesta con gzip (Content-Encoding: gzip)."),
+    tamano_lote: int = Query(exportacion.TAMANO_LOTE_POR_DEFECTO, ge=10, le=10000),
+):
+    """
+    Devuelve en flujo todas las solicitudes que cumplen los mismos filtros que el listado,
+    leyendo con un cursor del lado del servidor. La memoria usada es constante.
+    """
+    if formato == "csv" and servicios == "inline":
+        raise HTTPException(status_code=400, detail="El formato CSV no admite servicios anidados; use /solicitudes/export/servicios.")
+    filtros = {"estado": estado, "cliente": cliente, "fecha_desde": fecha_desde, "fecha_hasta": fecha_hasta}
+    lotes = exportacion.lotes_solicitudes(filtros, ordenar_por, orden, servicios == "inline", tamano_lote, fabrica_lotes(request))
+    bloques = exportacion.como_ndjson(lotes) if formato == "ndjson" else exportacion.como_csv(lotes, exportacion.CAMPOS_SOLICITUD)
+    return _respuesta_exportacion(bloques, formato, comprimir, "solicitudes")
+
+@router.get("/export/servicios", summary="Exportar los servicios de las solicitudes filtradas (NDJSON o CSV)", response_class=StreamingResponse)
+def exportar_servicios(
+    request: Request,
+    estado: Optional[EstadoSolicitud] = Query(None),
+    cliente: Optional[str] = Query(None),
+    fecha_desde: Optional[date] = Query(None),
+    fecha_hasta: Optional[date] = Query(None),
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    comprimir: bool = Query(False),
+    tamano_lote: int = Query(exportacion.TAMANO_LOTE_POR_DEFECTO, ge=10, le=10000),
+):
+    """Segundo flujo de la exportación: los servicios, ordenados por solicitud."""
+    filtros = {"estado": estado, "cliente": cliente, "fecha_desde": fecha_desde, "fecha_hasta": fecha_hasta}
+    lotes = exportacion.lotes_servicios(filtros, tamano_lote, fabrica_lotes(request))
+    bloques = exportacion.como_ndjson(lotes) if formato == "ndjson" else exportacion.como_csv(lotes, exportacion.CAMPOS_SERVICIO)
+    return _respuesta_exportacion(bloques, formato, comprimir, "servicios")
 
 # Obtener una solicitud por ID
 @router.get("/{id}", response_model=schemas_solicitud.SolicitudOut, summary="Obtener una solicitud por ID")
-def get_solicitud(id: int, db: Session = Depends(get_db)):
-    # Usamos joinedload para cargar los servicios junto con la solicitud en una sola consulta
-    solicitud = db.query(models_solicitud.Solicitud).options(joinedload(models_solicitud.Solicitud.servicios)).filter(models_solicitud.Solicitud.id == id).first()
-    if not solicitud:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-    return solicitud
+async def get_solicitud(id: int, request: Request, db: SesionBD = Depends(get_db)):
+    """
+    Devuelve la solicitud con sus servicios. La respuesta serializada se guarda en caché
+    (ver `app/cache.py`) y lleva ETag: con `If-None-Match` responde 304 sin consultar la base.
+
+    Lee de la primaria: lo que se carga aquí se guarda en la caché compartida, y una
+    réplica retrasada dejaría en ella una versión anterior a la última escritura.
+    Si el id no está entre las solicitudes vivas se busca en el archivo
+    (`app/services/archivo.py`).
+    """
+    clave = cache.clave_solicitud(id)
+    entrada = cache_respuestas.obtener(clave)
+    if entrada is None:
+        generacion = cache_respuestas.generacion(clave)
+
+        def cargar(db: Session):
+            # Solicitud y servicios en una sola consulta, proyectada y serializada sin el ORM.
+            solicitud = servicio_solicitudes.detalle(db, id) or servicio_solicitudes.detalle(db, id, archivada=True)
+            if not solicitud:
+                raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+            return serializacion.a_json(solicitud), solicitud["version"]
+
+        contenido, version = await ejecutar(db, cargar)
+        # El ETag lleva la versión de la fila: sirve tal cual como If-Match de PUT/DELETE.
+        entrada = cache_respuestas.guardar(clave, contenido, generacion, version=version)
+    return cache.respuesta_json(request, entrada)
 
 # Listar solicitudes con filtros y paginación
 @router.get("/", summary="Listar solicitudes con filtros y paginación")
-def list_solicitudes(
+async def list_solicitudes(
     estado: Optional[EstadoSolicitud] = Query(None),
     cliente: Optional[str] = Query(None),
     fecha_desde: Optional[date] = Query(None),
     fecha_hasta: Optional[date] = Query(None),
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
-    ordenar_por: str = Query("fecha_solicitud"),
+    ordenar_por: str = Query("fecha_solicitud", description="Columna de ordenamiento, o 'relevancia' junto con 'cliente' para ver primero las mejores coincidencias."),
     orden: str = Query("asc"),
-    db: Session = Depends(get_db)
+    paginacion: str = Query("pagina", pattern="^(pagina|cursor)$", description="'pagina' (page/size) o 'cursor' (keyset)."),
+    cursor: Optional[str] = Query(None, description="Valor de 'nextCursor' de la página anterior. Implica paginacion=cursor."),
+    total: Optional[str] = Query(None, pattern="^(exacto|estimado|ninguno)$", description="Cómo calcular 'totalElements'. Por defecto 'exacto' en modo página y 'ninguno' en modo cursor."),
+    incluir_archivadas: bool = Query(False, description="Incluye las solicitudes finalizadas ya archivadas (consulta más costosa)."),
+    db: SesionBD = Depends(get_db_lectura)
 ):
-    skip = (page - 1) * size
-    query = db.query(Solicitud)
-    
-    if estado:
-        query = query.filter(Solicitud.estado == estado)
-    if cliente:
-        query = query.filter(Solicitud.cliente.ilike(f"%{cliente}%"))
-    if fecha_desde:
-        query = query.filter(Solicitud.fecha_solicitud >= fecha_desde)
-    if fecha_hasta:
-        query = query.filter(Solicitud.fecha_solicitud < (fecha_hasta + timedelta(days=1)))
+    def listar(db: Session):
+        query, entidad = servicio_solicitudes.consulta_listado(db, incluir_archivadas, estado, cliente, fecha_desde, fecha_hasta)
+
+        # Modo cursor: el costo de cada página no depende de su profundidad.
+        if paginacion == "cursor" or cursor:
+            try:
+                solicitudes, next_cursor = servicio_solicitudes.paginar_por_cursor(query, ordenar_por, orden, cursor, size, entidad)
+            except servicio_solicitudes.CursorInvalido as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            total_elementos, exacto = servicio_solicitudes.contar(db, query, total or "ninguno")
+            return serializacion.a_json({
+                "content": serializacion.filas_a_dicts(solicitudes),
+                "size": size,
+                "nextCursor": next_cursor,
+                "totalElements": total_elementos,
+                "totalExacto": exacto,
+            })
+
+        skip = (page - 1) * size
     
-    # Ordenamiento
-    if hasattr(Solicitud, ordenar_por):
-        order_func = getattr(Solicitud, ordenar_por).desc() if orden == "desc" else getattr(Solicitud, ordenar_por).asc()
-        query = query.order_by(order_func)
+        # Ordenamiento
+        query = servicio_solicitudes.ordenar(db, query, ordenar_por, orden, cliente, entidad)
     
-    total = query.count()
-    solicitudes = query.offset(skip).limit(size).all()
+        total_elementos, _ = servicio_solicitudes.contar(db, query, total or "exacto")
+        solicitudes = query.offset(skip).limit(size).all()
     
-    return {
-        "content": solicitudes,
-        "totalElements": total,
-        "totalPages": (total + size - 1) // size,
-        "currentPage": page
-    }
+        return serializacion.a_json({
+            "content": serializacion.filas_a_dicts(solicitudes),
+            "totalElements": total_elementos,
+            "totalPages": (total_elementos + size - 1) // size if total_elementos is not None else None,
+            "currentPage": page
+        })
+
+    return Response(content=await ejecutar(db, listar), media_type="application/json")
 
 # Actualizar solicitud
+SIN_PENDIENTES = "La solicitud no puede modificarse si no tiene al menos un servicio en estado 'Pendiente'."
+SOLICITUD_MODIFICADA = "La solicitud fue modificada por otra operación; vuelva a leerla y reintente."
+
 @router.put("/{id}", response_model=schemas_solicitud.SolicitudOut, summary="Actualizar una solicitud por ID")
-def update_solicitud(id: int, solicitud_update: schemas_solicitud.SolicitudUpdate, db: Session = Depends(get_db)):
-    solicitud = db.query(models_solicitud.Solicitud).options(joinedload(models_solicitud.Solicitud.servicios)).filter(models_solicitud.Solicitud.id == id).first()
-    if not solicitud:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-
-    # Regla de negocio: Una solicitud solo puede modificarse si tiene al menos un servicio en estado "Pendiente"
-    if not any(s.estado_servicio == EstadoServicio.PENDIENTE for s in solicitud.servicios):
-        raise HTTPException(status_code=400, detail="La solicitud no puede modificarse si no tiene al menos un servicio en estado 'Pendiente'.")
-
-    # Actualizar los campos de la solicitud
-    update_data = solicitud_update.model_dump(exclude_unset=True) # Usar .model_dump()
-    for key, value in update_data.items():
-        # Evitar que se actualice el ID o la fecha de solicitud manualmente
-        if key not in ["id", "fecha_solicitud"]:
-            setattr(solicitud, key, value)
-    
-    solicitud.fecha_ultima_modificacion = datetime.utcnow() # Asegurar que se actualice el timestamp
+async def update_solicitud(id: int, solicitud_update: schemas_solicitud.SolicitudUpdate, request: Request, db: SesionBD = Depends(get_db)):
+    """
+    Actualiza la solicitud con un único UPDATE condicional: la regla de negocio (al menos
+    un servicio pendiente) y, si se envía `If-Match`, la versión de la fila van en el
+    WHERE. Responde 412 si la versión ya no es la enviada, y devuelve el ETag de la
+    nueva versión.
+    """
+    versiones = cache.versiones_if_match(request)
+    # Evitar que se actualice el ID o la fecha de solicitud manualmente
+    update_data = {
+        key: value for key, value in solicitud_update.model_dump(exclude_unset=True).items()
+        if key not in ["id", "fecha_solicitud"]
+    }
+
+    def actualizar(db: Session):
+        condiciones = [
+            Solicitud.id == id,
+            # Regla de negocio: Una solicitud solo puede modificarse si tiene al menos un servicio en estado "Pendiente"
+            Solicitud.servicios_pendientes > 0,
+            *escrituras.condiciones_version(Solicitud.version, versiones),
+        ]
+        if "cliente" in update_data:
+            # El cambio de cliente saca la solicitud de su bucket actual: se marca antes de escribir.
+            estadisticas.marcar(db, and_(*condiciones))
+        sentencia = (
+            update(Solicitud)
+            .where(*condiciones)
+            .values(**update_data, fecha_ultima_modificacion=datetime.utcnow(), version=Solicitud.version + 1)
+        )
+        solicitud = escrituras.actualizar(db, sentencia, Solicitud, id)
+        if solicitud is None:
+            db.rollback()
+            codigo, detalle = escrituras.diagnosticar(
+                db, Solicitud.id, id, Solicitud.version, versiones,
+                "Solicitud no encontrada", SOLICITUD_MODIFICADA, SIN_PENDIENTES,
+            )
+            raise HTTPException(status_code=codigo, detail=detalle)
+
+        estadisticas.marcar_bucket(db, solicitud.fecha_solicitud, solicitud.cliente)
+        eventos.registrar(db, "solicitud.actualizada", id, estado=solicitud.estado, cliente=solicitud.cliente)
+        contenido = schemas_solicitud.SolicitudOut.model_validate(solicitud, from_attributes=True).model_dump_json().encode()
+        db.commit()
+        return contenido, solicitud.version
 
-    db.commit()
-    db.refresh(solicitud)
-    return solicitud
+    contenido, version = await ejecutar(db, actualizar)
+    cache_respuestas.invalidar_solicitudes([id])
+    return Response(content=contenido, media_type="application/json", headers={"ETag": cache.calcular_etag(contenido, version)})
 
 # Eliminar solicitud
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT, summary="Eliminar una solicitud por ID")
-def delete_solicitud(id: int, db: Session = Depends(get_db)):
-    solicitud = db.query(models_solicitud.Solicitud).options(joinedload(models_solicitud.Solicitud.servicios)).filter(models_solicitud.Solicitud.id == id).first()
-    if not solicitud:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-    
-    # Regla de negocio: Una solicitud solo puede eliminarse si NINGÚN servicio está en estado "Aprobado"
-    if any(s.estado_servicio == EstadoServicio.APROBADO for s in solicitud.servicios):
-        raise HTTPException(status_code=400, detail="No se puede eliminar la solicitud porque contiene servicios en estado 'Aprobado'.")
+async def delete_solicitud(id: int, request: Request, db: SesionBD = Depends(get_db)):
+    """
+    Elimina la solicitud y sus servicios. La regla (ningún servicio aprobado) y la
+    versión de `If-Match` se comprueban en el WHERE de los DELETE, sin lectura previa.
+    """
+    versiones = cache.versiones_if_match(request)
+
+    def eliminar(db: Session):
+        condiciones = [
+            Solicitud.id == id,
+            # Regla de negocio: Una solicitud solo puede eliminarse si NINGÚN servicio está en estado "Aprobado"
+            Solicitud.servicios_aprobados == 0,
+            *escrituras.condiciones_version(Solicitud.version, versiones),
+        ]
+        # Los servicios se borran con una sola sentencia en lugar de cargarlos para la cascada del ORM,
+        # y solo si la solicitud cumple las condiciones.
+        db.execute(
+            delete(models_servicio.Servicio)
+            .where(models_servicio.Servicio.id_solicitud == id, exists().where(*condiciones))
+            .execution_options(synchronize_session=False)
+        )
+        fila = escrituras.eliminar(db, delete(Solicitud).where(*condiciones), Solicitud.fecha_solicitud, Solicitud.cliente)
+        if fila is None:
+            db.rollback()
+            codigo, detalle = escrituras.diagnosticar(
+                db, Solicitud.id, id, Solicitud.version, versiones,
+                "Solicitud no encontrada", SOLICITUD_MODIFICADA,
+                "No se puede eliminar la solicitud porque contiene servicios en estado 'Aprobado'.",
+            )
+            raise HTTPException(status_code=codigo, detail=detalle)
+        estadisticas.marcar_bucket(db, fila.fecha_solicitud, fila.cliente)
+        eventos.registrar(db, "solicitud.eliminada", id, cliente=fila.cliente)
+        db.commit()
 
-    db.delete(solicitud)
-    db.commit()
+    await ejecutar(db, eliminar)
+    cache_respuestas.invalidar_solicitudes([id])
 
 # Obtener servicios de una solicitud
 @router.get("/{id}/servicios", response_model=List[ServicioOut], summary="Listar todos los servicios de una solicitud")
-def get_servicios_by_solicitud(id: int, db: Session = Depends(get_db)):
-    solicitud = db.query(models_solicitud.Solicitud).options(joinedload(models_solicitud.Solicitud.servicios)).filter(models_solicitud.Solicitud.id == id).first()
-    if not solicitud:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
-    return solicitud.servicios
+async def get_servicios_by_solicitud(id: int, request: Request, db: SesionBD = Depends(get_db)):
+    """Servicios de la solicitud, con la misma caché y ETag que `get_solicitud`."""
+    clave = cache.clave_servicios(id)
+    entrada = cache_respuestas.obtener(clave)
+    if entrada is None:
+        generacion = cache_respuestas.generacion(clave)
+
+        def cargar(db: Session):
+            solicitud = servicio_solicitudes.detalle(db, id) or servicio_solicitudes.detalle(db, id, archivada=True)
+            if not solicitud:
+                raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+            return serializacion.a_json(solicitud["servicios"])
+
+        contenido = await ejecutar(db, cargar)
+        entrada = cache_respuestas.guardar(clave, contenido, generacion)
+    return cache.respuesta_json(request, entrada)
 
 # Agregar un servicio a una solicitud
 @router.post("/{id}/servicios", response_model=ServicioOut, status_code=status.HTTP_201_CREATED, summary="Agregar un nuevo servicio a una solicitud existente")
-def add_servicio_to_solicitud(id: int, servicio_in: ServicioCreate, db: Session = Depends(get_db)):
-    solicitud = db.query(models_solicitud.Solicitud).filter(models_solicitud.Solicitud.id == id).first()
-    if not solicitud:
-        raise HTTPException(status_code=404, detail="Solicitud no encontrada")
+async def add_servicio_to_solicitud(
+    id: int,
+    servicio_in: ServicioCreate,
+    db: SesionBD = Depends(get_db),
+    clave_idempotencia: Optional[str] = CLAVE_IDEMPOTENCIA,
+):
+    """Con `Idempotency-Key`, un reintento con la misma clave recibe la respuesta original sin agregar otro servicio."""
+    def agregar(db: Session):
+        previa = _reservar_clave(db, clave_idempotencia, f"POST /solicitudes/{id}/servicios", servicio_in.model_dump_json().encode())
+        if previa is not None:
+            return (*previa, True)
+
+        solicitud = db.query(models_solicitud.Solicitud).filter(models_solicitud.Solicitud.id == id).first()
+        if not solicitud:
+            raise HTTPException(status_code=404, detail="Solicitud no encontrada")
     
-    # La validación de fecha futura ahora se maneja en el validador de Pydantic de ServicioCreate
-    # if servicio_in.fecha_reunion.date() < datetime.utcnow().date():
-    #     raise HTTPException(status_code=400, detail="La fecha de reunión debe ser futura.")
+        # La validación de fecha futura ahora se maneja en el validador de Pydantic de ServicioCreate
+        # if servicio_in.fecha_reunion.date() < datetime.utcnow().date():
+        #     raise HTTPException(status_code=400, detail="La fecha de reunión debe ser futura.")
     
-    if solicitud.estado in [EstadoSolicitud.CERRADA, EstadoSolicitud.CANCELADA]:
-        raise HTTPException(status_code=400, detail=f"No se pueden agregar servicios a solicitudes en estado '{solicitud.estado.value}'.")
-
-    db_servicio = models_servicio.Servicio(
-        **servicio_in.model_dump(),
-        id_solicitud=id
-    )
-    db.add(db_servicio)
-    db.commit()
-    db.refresh(db_servicio)
-    return db_servicio
\ No newline at end of file
+        if solicitud.estado in [EstadoSolicitud.CERRADA, EstadoSolicitud.CANCELADA]:
+            raise HTTPException(status_code=400, detail=f"No se pueden agregar servicios a solicitudes en estado '{solicitud.estado.value}'.")
+
+        db_servicio = models_servicio.Servicio(
+            **servicio_in.model_dump(),
+            id_solicitud=id
+        )
+        db.add(db_servicio)
+        db.flush()
+        contadores.ajustar(db, id, {db_servicio.estado_servicio: 1})
+        estadisticas.marcar(db, models_solicitud.Solicitud.id == id)
+        eventos.registrar(
+            db, "servicio.creado", id, db_servicio.id_servicio, db_servicio.estado_servicio, cliente=solicitud.cliente
+        )
+        contenido = ServicioOut.model_validate(db_servicio, from_attributes=True).model_dump_json().encode()
+        if clave_idempotencia:
+            idempotencia.guardar(db, clave_idempotencia, status.HTTP_201_CREATED, contenido)
+        db.commit()
+        return status.HTTP_201_CREATED, contenido, False
+
+    async with idempotencia.turno(clave_idempotencia):
+        estado_http, contenido, repetida = await ejecutar(db, agregar)
+    if not repetida:
+        cache_respuestas.invalidar_solicitudes([id])
+    return _respuesta_creacion(estado_http, contenido, repetida)
+
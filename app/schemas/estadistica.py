@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List
+from datetime import date
+
+
+class IngresoPeriodo(BaseModel):
+    periodo: date = Field(..., description="Primer día del período (día, semana ISO o mes).")
+    solicitudes: int = Field(..., description="Solicitudes creadas en el período.")
+
+
+class CostoCliente(BaseModel):
+    cliente: str
+    costo_aprobado: float = Field(..., description="Suma de costo_estimado de los servicios aprobados.")
+    servicios_aprobados: int
+
+
+class EstadisticasOut(BaseModel):
+    """Estadísticas agregadas servidas desde la tabla resumen `estadisticas_diarias`."""
+    solicitudes_por_estado: Dict[str, int]
+    servicios_por_estado: Dict[str, int]
+    costo_aprobado_total: float
+    ingreso: List[IngresoPeriodo]
+    costo_aprobado_por_cliente: List[CostoCliente]
+    buckets_pendientes: int = Field(..., description="Marcas de escritura aún no aplicadas al resumen; 0 indica que está al día.")
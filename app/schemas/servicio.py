@@ -1,10 +1,7 @@
-from pydantic import BaseModel, Field, EmailStr, ValidationError, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional, List
-from datetime import datetime, date # Importa 'date' para comparaciones de fecha
+from datetime import datetime
 from app.models.servicio import EstadoServicio # Importa el Enum real del modelo
-from datetime import datetime, date
-from pydantic import field_validator
-from dateutil.parser import parse  # necesitas instalar python-dateutil si no está
 
 class ServicioBase(BaseModel):
     nombre_servicio: str = Field(..., min_length=1, max_length=255, description="Descripción del servicio solicitado.")
@@ -12,7 +9,8 @@ class ServicioBase(BaseModel):
     comentarios: Optional[str] = Field(None, max_length=500, description="Observaciones adicionales sobre la reunión.")
     costo_estimado: Optional[float] = Field(None, ge=0, description="Costo estimado del servicio (solo si está aprobado).")
 
-    @validator("fecha_reunion")
+    @field_validator("fecha_reunion")
+    @classmethod
     def fecha_reunion_debe_ser_futura(cls, v):
         """Valida que la fecha de reunión sea futura."""
         # Se compara solo la parte de la fecha para evitar problemas con la hora exacta de la validación
@@ -20,10 +18,8 @@ class ServicioBase(BaseModel):
             raise ValueError("La fecha de reunión debe ser futura.")
         return v
 
-    class Config:
-        # Permite que el ORM (SQLAlchemy) sepa cómo mapear los campos
-        # En Pydantic v2+, from_attributes = True reemplaza orm_mode = True
-        from_attributes = True
+    # Permite que el ORM (SQLAlchemy) sepa cómo mapear los campos
+    model_config = ConfigDict(from_attributes=True)
 
 class ServicioCreate(BaseModel):
     """
@@ -36,6 +32,7 @@ class ServicioCreate(BaseModel):
     # costo_estimado: Optional[float] = Field(None, ge=0, description="Valor monetario (opcional, solo si está aprobado).")
 
     @field_validator('fecha_reunion')
+    @classmethod
     def validate_fecha_reunion_futura(cls, v):
         """
         Validador para asegurar que la fecha de reunión sea futura.
@@ -49,7 +46,8 @@ class ServicioCreate(BaseModel):
 class ServicioOut(BaseModel):
     """
     Esquema Pydantic para la salida de un servicio.
-    'fecha_reunion' ahora es datetime.
+    'fecha_reunion' ahora es datetime. Como SolicitudOut, las rutas de lectura no lo
+    usan para validar: documenta la forma de las filas que serializan.
     """
     id_servicio: int
     id_solicitud: int
@@ -58,12 +56,10 @@ class ServicioOut(BaseModel):
     estado_servicio: EstadoServicio
     comentarios: Optional[str]
     costo_estimado: Optional[float]
+    version: int
 
-    class Config:
-        orm_mode = True # Habilita la compatibilidad con ORM (SQLAlchemy)
-        use_enum_values = True # Permite que los Enums se serialicen a sus valores directos
-        # No se necesita json_encoders si el frontend envía ISO 8601 datetime strings
-        # y Pydantic maneja objetos datetime directamente.
+    # Mapea desde atributos del ORM y serializa los Enums por su valor.
+    model_config = ConfigDict(from_attributes=True, use_enum_values=True)
 
 class ServicioUpdate(BaseModel):
     """
@@ -76,25 +72,15 @@ class ServicioUpdate(BaseModel):
     costo_estimado: Optional[float] = Field(None, ge=0)
     estado_servicio: Optional[EstadoServicio] = Field(None) # Permite actualizar el estado
 
-    @validator('fecha_reunion')
+    @field_validator('fecha_reunion')
+    @classmethod
     def validate_fecha_reunion_futura_update(cls, v):
         """
-        Valida que la fecha de reunión (datetime, date o string ISO) sea futura.
+        Valida que la fecha de reunión sea futura. Pydantic ya convirtió el valor
+        recibido (string ISO 8601) a datetime.
         """
-        if v is not None:
-            # Intenta convertir a datetime si es string
-            if isinstance(v, str):
-                try:
-                    v = parse(v)
-                except Exception:
-                    raise ValueError('Formato de fecha inválido.')
-            
-            # Convertir a date si es datetime
-            fecha = v if isinstance(v, date) and not isinstance(v, datetime) else v.date()
-
-            if fecha < datetime.utcnow().date():
-                raise ValueError('La fecha de reunión debe ser futura.')
-        
+        if v is not None and v.date() < datetime.utcnow().date():
+            raise ValueError('La fecha de reunión debe ser futura.')
         return v
 
     # """
@@ -115,4 +101,26 @@ class ServicioUpdate(BaseModel):
     #     json_encoders = {
     #         datetime: lambda v: v.date().isoformat() if isinstance(v, datetime) else v.isoformat(),
     #         date: lambda v: v.isoformat()
-    #     }
\ No newline at end of file
+    #     }
+
+MAX_CAMBIOS_LOTE = 1000
+
+class ServicioCambio(BaseModel):
+    """Cambio de estado y/o costo de un servicio dentro de PATCH /servicios/bulk."""
+    id_servicio: int
+    estado_servicio: Optional[EstadoServicio] = Field(None, description="Nuevo estado del servicio.")
+    costo_estimado: Optional[float] = Field(None, ge=0, description="Costo estimado (solo para servicios aprobados); null lo borra.")
+    version: Optional[int] = Field(None, description="Si se indica, el cambio solo se aplica si el servicio sigue en esa versión.")
+
+class ServiciosBulkUpdate(BaseModel):
+    cambios: List[ServicioCambio] = Field(..., min_length=1, max_length=MAX_CAMBIOS_LOTE)
+
+class ResultadoCambio(BaseModel):
+    id_servicio: int
+    resultado: str = Field(..., description="'actualizado', 'no_encontrado', 'conflicto', 'rechazado' u 'omitido'.")
+    detalle: Optional[str] = None
+
+class ServiciosBulkOut(BaseModel):
+    resultados: List[ResultadoCambio] = Field(..., description="Un resultado por cambio, en el orden recibido.")
+    actualizados: int
+    rechazados: int
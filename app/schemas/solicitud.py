@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, field_validator
 from typing import List, Optional
 from datetime import datetime
 from app.models.solicitud import EstadoSolicitud # Importa el Enum real del modelo
@@ -9,15 +9,14 @@ class SolicitudBase(BaseModel):
     email_cliente: EmailStr = Field(..., description="Dirección de correo electrónico del cliente para notificaciones.")
     observaciones: Optional[str] = Field(None, max_length=500, description="Campo de texto libre para observaciones adicionales.")
 
-    class Config:
-        from_attributes = True # Permite mapear desde atributos de ORM
+    model_config = ConfigDict(from_attributes=True) # Permite mapear desde atributos de ORM
 
 class SolicitudCreate(SolicitudBase):
     """
     Esquema para la creación de una nueva solicitud.
     AHORA INCLUYE UNA LISTA DE SERVICIOS OBLIGATORIA.
     """
-    servicios: List[ServicioCreate] = Field(..., min_items=1, description="Debe incluir al menos un servicio solicitado.")
+    servicios: List[ServicioCreate] = Field(..., min_length=1, description="Debe incluir al menos un servicio solicitado.")
 
 class SolicitudUpdate(BaseModel):
     """Esquema para la actualización de una solicitud existente, con todos los campos opcionales."""
@@ -26,18 +25,41 @@ class SolicitudUpdate(BaseModel):
     observaciones: Optional[str] = Field(None, max_length=500, description="Nuevas observaciones para la solicitud.")
     estado: Optional[EstadoSolicitud] = Field(None, description="Nuevo estado de la solicitud.") # Usar el Enum aquí
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class SolicitudOut(SolicitudBase):
-    """Esquema para la salida de una solicitud, incluyendo su ID y la lista de servicios asociados."""
+    """
+    Esquema para la salida de una solicitud, incluyendo su ID y la lista de servicios asociados.
+    Las rutas de lectura no lo usan para validar sus respuestas (los datos salen de la
+    base): serializan filas directamente (ver `app/serializacion.py`). Sigue definiendo
+    la forma de la respuesta y la documentación OpenAPI.
+    """
     id: int = Field(..., description="Identificador único de la solicitud.")
     fecha_solicitud: datetime = Field(..., description="Fecha de creación de la solicitud.")
     estado: EstadoSolicitud = Field(..., description="Estado actual de la solicitud.") # Usar el Enum
     fecha_ultima_modificacion: datetime = Field(..., description="Última fecha de modificación de la solicitud.")
+    version: int = Field(..., description="Versión de la fila; se envía en If-Match para actualizar o eliminar.")
     servicios: List[ServicioOut] = Field(default_factory=list, description="Lista de servicios asociados a esta solicitud.") # Usa default_factory para list
 
-    class Config:
-        orm_mode = True # Habilita la compatibilidad con ORM (SQLAlchemy)
-        use_enum_values = True # Permite que los Enums se serialicen a sus valores directos
+    # Mapea desde atributos del ORM y serializa los Enums por su valor.
+    model_config = ConfigDict(from_attributes=True, use_enum_values=True)
+
+
+# Campos de SolicitudOut que admite la proyección `fields` de la lectura por lote.
+CAMPOS_SOLICITUD_OUT = tuple(SolicitudOut.model_fields)
+MAX_IDS_LOTE = 500
+
+class SolicitudesBatchGet(BaseModel):
+    """Lectura de varias solicitudes por id en una sola petición."""
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_IDS_LOTE, description="Ids en el orden en que se quieren recibir; los repetidos se devuelven una vez.")
+    fields: Optional[List[str]] = Field(None, description=f"Proyección: subconjunto de {', '.join(CAMPOS_SOLICITUD_OUT)}. 'id' se incluye siempre; sin 'servicios' no se cargan los servicios.")
+
+    @field_validator("fields")
+    @classmethod
+    def campos_validos(cls, v):
+        if v is not None:
+            desconocidos = [campo for campo in v if campo not in CAMPOS_SOLICITUD_OUT]
+            if desconocidos:
+                raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}.")
+        return v
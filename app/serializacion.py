@@ -0,0 +1,26 @@
+# app/serializacion.py
+"""
+Serialización de respuestas de lectura directamente a bytes.
+
+Las rutas de lectura (detalle, servicios de una solicitud y listado) proyectan solo
+las columnas que responden con un SELECT Core y codifican las filas con orjson, sin
+pasar por `jsonable_encoder` (que recorre cada objeto por reflexión) ni volver a
+validar con Pydantic datos que salen de la propia base. Los esquemas de app/schemas
+siguen validando la entrada y describiendo las respuestas en OpenAPI.
+
+orjson escribe los datetime en ISO 8601 y los Enum por su valor, igual que la salida
+de los esquemas, así que el JSON no cambia.
+"""
+from typing import Iterable, List
+
+import orjson
+
+
+def a_json(contenido) -> bytes:
+    return orjson.dumps(contenido)
+
+
+def filas_a_dicts(filas: Iterable) -> List[dict]:
+    """Filas de SQLAlchemy (Row) como dicts columna -> valor."""
+    return [fila._asdict() for fila in filas]
+
@@ -0,0 +1,100 @@
+# app/services/archivo.py
+"""
+Archivado de solicitudes finalizadas (conjunto "caliente" / "frío").
+
+Las solicitudes en estado Cerrada o Cancelada cuya última modificación tiene más de
+`ARCHIVO_DIAS` días se mueven, con sus servicios, a `solicitudes_archivadas` y
+`servicios_archivados` (app/models/archivo.py). Así el listado, la búsqueda y el
+procesamiento automático recorren solo las filas vivas, y su costo no crece mes a mes.
+
+Cada lote toma hasta `tamano_lote` solicitudes (bloqueándolas con FOR UPDATE, para no
+archivar una que otra transacción está borrando), las copia con INSERT ... SELECT,
+borra las originales y confirma. Las filas conservan su id, de modo que
+`GET /solicitudes/{id}` las sigue encontrando (ver `solicitudes.detalle`); el resumen de estadísticas
+también cuenta el archivo, por lo que no hace falta recalcularlo.
+"""
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import and_, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.models.archivo import ServicioArchivado, SolicitudArchivada
+from app.models.servicio import Servicio
+from app.models.solicitud import EstadoSolicitud, Solicitud
+from app.services import eventos
+
+TAMANO_LOTE_POR_DEFECTO = 500
+
+ESTADOS_ARCHIVABLES = (EstadoSolicitud.CERRADA, EstadoSolicitud.CANCELADA)
+
+COLUMNAS_SOLICITUD = [columna.name for columna in Solicitud.__table__.columns]
+COLUMNAS_SERVICIO = [columna.name for columna in Servicio.__table__.columns]
+
+
+def filtro_archivables(antes: datetime):
+    """
+    Solicitudes finalizadas cuya última modificación es anterior a `antes`. En SQLite
+    `solicitudes` y `servicios` son AUTOINCREMENT, así que un id archivado no vuelve a
+    asignarse.
+    """
+    return and_(Solicitud.estado.in_(ESTADOS_ARCHIVABLES), Solicitud.fecha_ultima_modificacion < antes)
+
+
+def _mover(db: Session, ids) -> None:
+    ahora = literal(datetime.utcnow())
+    db.execute(
+        insert(SolicitudArchivada).from_select(
+            [*COLUMNAS_SOLICITUD, "fecha_archivado"],
+            select(*(getattr(Solicitud, columna) for columna in COLUMNAS_SOLICITUD), ahora).where(Solicitud.id.in_(ids)),
+        )
+    )
+    db.execute(
+        insert(ServicioArchivado).from_select(
+            COLUMNAS_SERVICIO,
+            select(*(getattr(Servicio, columna) for columna in COLUMNAS_SERVICIO)).where(Servicio.id_solicitud.in_(ids)),
+        )
+    )
+    eventos.solicitudes(db, "solicitud.archivada", Solicitud.id.in_(ids))
+    db.execute(delete(Servicio).where(Servicio.id_solicitud.in_(ids)).execution_options(synchronize_session=False))
+    db.execute(delete(Solicitud).where(Solicitud.id.in_(ids)).execution_options(synchronize_session=False))
+
+
+def archivar(
+    db: Session,
+    antes: datetime,
+    tamano_lote: int = TAMANO_LOTE_POR_DEFECTO,
+    dry_run: bool = False,
+    al_confirmar_lote: Optional[Callable[[Iterable[int]], None]] = None,
+) -> dict:
+    """
+    Archiva las solicitudes de `filtro_archivables(antes)` por lotes, con un commit por
+    lote: un error deja aplicados los lotes ya confirmados y volver a ejecutar es seguro.
+    En modo `dry_run` solo cuenta las solicitudes que se archivarían.
+    """
+    filtro = filtro_archivables(antes)
+    if dry_run:
+        return {"solicitudes_archivadas": db.execute(select(func.count()).where(filtro)).scalar_one(), "lotes": 0, "dry_run": True}
+
+    total = 0
+    lotes = 0
+    ultimo = 0
+    while True:
+        ids = db.execute(
+            select(Solicitud.id)
+            .where(filtro, Solicitud.id > ultimo)
+            .order_by(Solicitud.id)
+            .limit(tamano_lote)
+            .with_for_update()
+        ).scalars().all()
+        if not ids:
+            break
+        _mover(db, ids)
+        db.commit()
+        total += len(ids)
+        lotes += 1
+        ultimo = ids[-1]
+        if al_confirmar_lote is not None:
+            al_confirmar_lote(ids)
+    return {"solicitudes_archivadas": total, "lotes": lotes, "dry_run": False}
+
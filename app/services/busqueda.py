@@ -0,0 +1,83 @@
+# app/services/busqueda.py
+"""
+Búsqueda de solicitudes por nombre de cliente.
+
+- PostgreSQL: `ILIKE '%texto%'` resuelto por el índice GIN trigram `ix_solicitudes_cliente_trgm`,
+  y relevancia con `similarity()` de pg_trgm.
+- SQLite: la tabla FTS5 con tokenizador trigram `solicitudes_cliente_fts` (ver models/solicitud.py);
+  relevancia con bm25 (`rank`). Los términos de menos de 3 caracteres no forman un trigrama
+  y se resuelven con LIKE.
+- Otros motores: ILIKE sin índice.
+"""
+from sqlalchemy import case, column, func, select, table
+from sqlalchemy.orm import Session
+
+from app.models.solicitud import TABLA_FTS_CLIENTE, Solicitud
+
+LONGITUD_MINIMA_TRIGRAMA = 3
+MAX_SUGERENCIAS = 50
+
+fts_cliente = table(TABLA_FTS_CLIENTE, column("rowid"), column("cliente"), column("rank"))
+
+
+def _dialecto(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def escapar_like(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _frase_fts(texto: str) -> str:
+    # Entre comillas dobles el texto se trata como frase literal (sin operadores FTS).
+    return '"' + texto.replace('"', '""') + '"'
+
+
+def _usa_fts(dialecto: str, texto: str) -> bool:
+    return dialecto == "sqlite" and len(texto) >= LONGITUD_MINIMA_TRIGRAMA
+
+
+def _coincidencias_fts(texto: str):
+    return select(fts_cliente.c.rowid, fts_cliente.c.rank).where(fts_cliente.c.cliente.match(_frase_fts(texto)))
+
+
+def filtro_cliente(db: Session, texto: str, modelo=Solicitud):
+    """
+    Condición 'el cliente contiene `texto`' (sin distinguir mayúsculas) servida por índice.
+    `modelo` puede ser otra entidad con las columnas de Solicitud (el archivo, o el listado
+    que lo incluye); la tabla FTS de SQLite solo indexa `solicitudes`, así que las demás
+    se filtran con LIKE.
+    """
+    if modelo is Solicitud and _usa_fts(_dialecto(db), texto):
+        return Solicitud.id.in_(_coincidencias_fts(texto).with_only_columns(fts_cliente.c.rowid))
+    return modelo.cliente.ilike(f"%{escapar_like(texto)}%", escape="\\")
+
+
+def ordenar_por_relevancia(db: Session, query, texto: str, modelo=Solicitud):
+    """Ordena `query` (ya filtrada por `texto`) de mejor a peor coincidencia."""
+    dialecto = _dialecto(db)
+    if dialecto == "postgresql":
+        return query.order_by(func.similarity(modelo.cliente, texto).desc(), modelo.id)
+    if modelo is Solicitud and _usa_fts(dialecto, texto):
+        coincidencias = _coincidencias_fts(texto).subquery()
+        return query.join(coincidencias, coincidencias.c.rowid == Solicitud.id).order_by(
+            coincidencias.c.rank, Solicitud.id
+        )
+    # Sin índice de texto: primero los que empiezan por el término, luego los más cortos.
+    empieza = case((modelo.cliente.ilike(f"{escapar_like(texto)}%", escape="\\"), 0), else_=1)
+    return query.order_by(empieza, func.length(modelo.cliente), modelo.id)
+
+
+def sugerir_clientes(db: Session, prefijo: str, limite: int = 10) -> list:
+    """Nombres de cliente distintos que empiezan por `prefijo`, en orden alfabético."""
+    limite = min(limite, MAX_SUGERENCIAS)
+    patron = f"{escapar_like(prefijo)}%"
+    # FTS5 solo usa el índice trigram para LIKE sin cláusula ESCAPE (LIKE ya ignora
+    # mayúsculas en SQLite), así que los prefijos con comodines van por el camino general.
+    if _usa_fts(_dialecto(db), prefijo) and patron == f"{prefijo}%":
+        consulta = select(fts_cliente.c.cliente).distinct().where(fts_cliente.c.cliente.like(patron))
+        consulta = consulta.order_by(fts_cliente.c.cliente)
+    else:
+        consulta = select(Solicitud.cliente).distinct().where(Solicitud.cliente.ilike(patron, escape="\\"))
+        consulta = consulta.order_by(Solicitud.cliente)
+    return list(db.execute(consulta.limit(limite)).scalars())
@@ -0,0 +1,175 @@
+# app/services/contadores.py
+"""
+Contadores de servicios por estado en `solicitudes`.
+
+Cada camino que crea, cambia de estado, elimina o vence servicios ajusta los
+contadores en la misma transacción, con `UPDATE ... SET c = c + delta`. Esa forma es
+segura con escrituras concurrentes, porque cada delta se aplica sobre la versión
+vigente de la fila.
+
+`recalcular` y `verificar` los reconstruyen desde `servicios`, para migraciones,
+reparaciones y `scripts/contadores.py`.
+"""
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.servicio import EstadoServicio, Servicio
+from app.models.solicitud import Solicitud
+
+TAMANO_LOTE_POR_DEFECTO = 5000
+
+COLUMNA_POR_ESTADO = {
+    EstadoServicio.PENDIENTE: "servicios_pendientes",
+    EstadoServicio.APROBADO: "servicios_aprobados",
+    EstadoServicio.RECHAZADO: "servicios_rechazados",
+    EstadoServicio.VENCIDO: "servicios_vencidos",
+}
+
+
+def columna(estado: EstadoServicio):
+    return getattr(Solicitud, COLUMNA_POR_ESTADO[estado])
+
+
+def iniciales(estados: Iterable[EstadoServicio]) -> Dict[str, int]:
+    """Valores de los contadores para una solicitud nueva con servicios en `estados`."""
+    conteo = Counter(estados)
+    return {nombre: conteo.get(estado, 0) for estado, nombre in COLUMNA_POR_ESTADO.items()}
+
+
+def ajustar(db: Session, id_solicitud: int, deltas: Mapping[EstadoServicio, int]) -> None:
+    """Suma `deltas` (estado -> cambio) a los contadores de una solicitud."""
+    valores = {
+        COLUMNA_POR_ESTADO[estado]: columna(estado) + delta
+        for estado, delta in deltas.items()
+        if delta and estado in COLUMNA_POR_ESTADO
+    }
+    if valores:
+        db.execute(
+            update(Solicitud).where(Solicitud.id == id_solicitud).values(**valores)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def cambiar_estado(db: Session, id_solicitud: int, anterior: Optional[EstadoServicio], nuevo: Optional[EstadoServicio]) -> None:
+    if anterior == nuevo:
+        return
+    deltas = Counter()
+    if anterior is not None:
+        deltas[anterior] -= 1
+    if nuevo is not None:
+        deltas[nuevo] += 1
+    ajustar(db, id_solicitud, deltas)
+
+
+def mover(db: Session, ids_solicitud: List[int], anterior: EstadoServicio, nuevo: EstadoServicio) -> None:
+    """
+    Para un UPDATE masivo de servicios de `anterior` a `nuevo`: `ids_solicitud` trae una
+    entrada por servicio modificado (p. ej. de UPDATE ... RETURNING id_solicitud).
+    Un único executemany, un registro por solicitud.
+    """
+    conteo = Counter(ids_solicitud)
+    if not conteo:
+        return
+    sentencia = (
+        update(Solicitud.__table__)
+        .where(Solicitud.__table__.c.id == bindparam("b_id"))
+        .values(
+            {
+                COLUMNA_POR_ESTADO[anterior]: columna(anterior) - bindparam("b_n"),
+                COLUMNA_POR_ESTADO[nuevo]: columna(nuevo) + bindparam("b_n"),
+            }
+        )
+    )
+    db.execute(sentencia, [{"b_id": id_solicitud, "b_n": n} for id_solicitud, n in conteo.items()])
+
+
+def ajustar_varias(db: Session, deltas_por_solicitud: Mapping[int, Mapping[EstadoServicio, int]]) -> None:
+    """`ajustar` para varias solicitudes con un único executemany."""
+    tabla = Solicitud.__table__
+    parametros = [
+        {"b_id": id_solicitud, **{f"b_{nombre}": deltas.get(estado, 0) for estado, nombre in COLUMNA_POR_ESTADO.items()}}
+        for id_solicitud, deltas in deltas_por_solicitud.items()
+        if any(deltas.values())
+    ]
+    if not parametros:
+        return
+    sentencia = (
+        update(tabla)
+        .where(tabla.c.id == bindparam("b_id"))
+        .values({nombre: tabla.c[nombre] + bindparam(f"b_{nombre}") for nombre in COLUMNA_POR_ESTADO.values()})
+    )
+    db.execute(sentencia, parametros)
+
+
+def _conteo(estado: EstadoServicio):
+    return (
+        select(func.count())
+        .where(Servicio.id_solicitud == Solicitud.id, Servicio.estado_servicio == estado)
+        .correlate(Solicitud)
+        .scalar_subquery()
+    )
+
+
+def valores_recalculados() -> Dict[str, object]:
+    return {nombre: _conteo(estado) for estado, nombre in COLUMNA_POR_ESTADO.items()}
+
+
+def condicion_desvio():
+    """Solicitudes cuyos contadores no coinciden con sus servicios."""
+    return or_(*(columna(estado) != _conteo(estado) for estado in COLUMNA_POR_ESTADO))
+
+
+def recalcular(db: Session, filtro=None) -> int:
+    """
+    Recalcula los contadores de las solicitudes que cumplen `filtro` (todas si es None)
+    y que estaban desviadas. No hace commit. Devuelve las filas corregidas.
+    """
+    condicion = condicion_desvio() if filtro is None else and_(filtro, condicion_desvio())
+    sentencia = update(Solicitud).where(condicion).values(**valores_recalculados())
+    return db.execute(sentencia.execution_options(synchronize_session=False)).rowcount
+
+
+def recalcular_por_lotes(
+    db: Session,
+    tamano_lote: int = TAMANO_LOTE_POR_DEFECTO,
+    solo_verificar: bool = False,
+    al_reparar: Optional[Callable[[Session, object], None]] = None,
+) -> dict:
+    """
+    Recorre `solicitudes` por rangos de id. En cada rango repara los contadores
+    desviados y hace commit, o solo los cuenta con `solo_verificar`. Devuelve el
+    total revisado, las solicitudes con desvío y hasta 20 ejemplos.
+
+    `al_reparar(db, filtro)` recibe, antes de cada corrección y en su misma
+    transacción, el filtro de las solicitudes desviadas del rango (p. ej.
+    `estadisticas.marcar`, cuyo resumen se calcula con estos contadores).
+    """
+    minimo, maximo = db.execute(select(func.min(Solicitud.id), func.max(Solicitud.id))).one()
+    resultado = {"solicitudes": 0, "con_desvio": 0, "ejemplos": []}
+    if minimo is None:
+        return resultado
+    nombres = list(COLUMNA_POR_ESTADO.values())
+    for inicio in range(minimo, maximo + 1, tamano_lote):
+        rango = and_(Solicitud.id >= inicio, Solicitud.id < inicio + tamano_lote)
+        resultado["solicitudes"] += db.execute(select(func.count()).where(rango)).scalar_one()
+        if len(resultado["ejemplos"]) < 20:
+            consulta = (
+                select(Solicitud.id, *(getattr(Solicitud, n) for n in nombres), *valores_recalculados().values())
+                .where(rango, condicion_desvio())
+                .limit(20 - len(resultado["ejemplos"]))
+            )
+            for fila in db.execute(consulta):
+                guardado = dict(zip(nombres, fila[1:1 + len(nombres)]))
+                real = dict(zip(nombres, fila[1 + len(nombres):]))
+                resultado["ejemplos"].append({"id": fila[0], "guardado": guardado, "real": real})
+        if solo_verificar:
+            resultado["con_desvio"] += db.execute(select(func.count()).where(rango, condicion_desvio())).scalar_one()
+        else:
+            if al_reparar is not None:
+                al_reparar(db, and_(rango, condicion_desvio()))
+            resultado["con_desvio"] += recalcular(db, rango)
+            db.commit()
+    return resultado
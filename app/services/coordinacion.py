@@ -0,0 +1,150 @@
+# app/services/coordinacion.py
+"""
+Exclusión mutua entre workers (y entre hilos de un mismo worker) para tareas en
+segundo plano.
+
+- PostgreSQL: advisory lock de sesión (`pg_try_advisory_lock`) sobre una conexión
+  dedicada del pool de lotes. Si el proceso muere, la conexión se cierra y el lock se
+  libera solo.
+- Otros motores: lease en la fila de la tarea en `tareas_programadas`. Se toma con un
+  UPDATE condicional (libre o vencido) y vence solo si el worker muere; las tareas
+  largas deben llamar a `renovar()`.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLotes, engine_lotes
+from app.models.tarea import TareaProgramada
+
+# Identifica al worker en la columna `propietario`.
+PROPIETARIO = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_locales = {}
+_locales_lock = threading.Lock()
+
+
+def _lock_local(nombre: str) -> threading.Lock:
+    with _locales_lock:
+        return _locales.setdefault(nombre, threading.Lock())
+
+
+def asegurar_tarea(nombre: str) -> None:
+    """Crea la fila de la tarea si no existe (idempotente entre workers)."""
+    with SessionLotes() as db:
+        if db.get(TareaProgramada, nombre) is not None:
+            return
+        db.add(TareaProgramada(nombre=nombre))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # otro worker la creó primero
+
+
+class BloqueoTarea:
+    """
+    Bloqueo de una tarea. Usa el pool de lotes, igual que la sesión de la tarea: el
+    trabajo en segundo plano no ocupa conexiones del pool de los requests.
+    """
+
+    def __init__(self, nombre: str, duracion_lease: float):
+        self.nombre = nombre
+        self.duracion_lease = duracion_lease
+        self._conexion = None
+        self._renovado = 0.0
+
+    @property
+    def usa_advisory_lock(self) -> bool:
+        return engine_lotes.dialect.name == "postgresql"
+
+    def adquirir(self) -> bool:
+        if self.usa_advisory_lock:
+            conexion = engine_lotes.connect()
+            clave = zlib.crc32(self.nombre.encode())
+            tomado = conexion.execute(select(func.pg_try_advisory_lock(clave))).scalar()
+            conexion.commit()
+            if not tomado:
+                conexion.close()
+                return False
+            self._conexion = conexion
+            return True
+
+        asegurar_tarea(self.nombre)
+        ahora = datetime.utcnow()
+        with SessionLotes() as db:
+            filas = db.execute(
+                update(TareaProgramada)
+                .where(
+                    TareaProgramada.nombre == self.nombre,
+                    or_(TareaProgramada.lease_hasta.is_(None), TareaProgramada.lease_hasta < ahora),
+                )
+                .values(propietario=PROPIETARIO, lease_hasta=ahora + timedelta(seconds=self.duracion_lease))
+            ).rowcount
+            db.commit()
+        self._renovado = time.monotonic()
+        return filas == 1
+
+    def renovar(self) -> None:
+        """Extiende el lease si ya pasó la mitad de su duración (no-op con advisory lock)."""
+        if self.usa_advisory_lock or time.monotonic() - self._renovado < self.duracion_lease / 2:
+            return
+        with SessionLotes() as db:
+            db.execute(
+                update(TareaProgramada)
+                .where(TareaProgramada.nombre == self.nombre, TareaProgramada.propietario == PROPIETARIO)
+                .values(lease_hasta=datetime.utcnow() + timedelta(seconds=self.duracion_lease))
+            )
+            db.commit()
+        self._renovado = time.monotonic()
+
+    def liberar(self) -> None:
+        if self._conexion is not None:
+            try:
+                self._conexion.execute(select(func.pg_advisory_unlock(zlib.crc32(self.nombre.encode()))))
+                self._conexion.commit()
+            except Exception:
+                # Si no se pudo liberar, la conexión no debe volver al pool con el lock tomado.
+                self._conexion.invalidate()
+            finally:
+                self._conexion.close()
+                self._conexion = None
+            return
+        with SessionLotes() as db:
+            db.execute(
+                update(TareaProgramada)
+                .where(TareaProgramada.nombre == self.nombre, TareaProgramada.propietario == PROPIETARIO)
+                .values(lease_hasta=None)
+            )
+            db.commit()
+
+
+@contextmanager
+def bloqueo_tarea(nombre: str, duracion_lease: float) -> Iterator[Optional[BloqueoTarea]]:
+    """
+    Intenta tomar la tarea `nombre` sin esperar. Entrega el `BloqueoTarea` si se obtuvo
+    o None si otro worker (u otro hilo de este) la está ejecutando.
+    """
+    local = _lock_local(nombre)
+    if not local.acquire(blocking=False):
+        yield None
+        return
+    try:
+        bloqueo = BloqueoTarea(nombre, duracion_lease)
+        if not bloqueo.adquirir():
+            yield None
+            return
+        try:
+            yield bloqueo
+        finally:
+            bloqueo.liberar()
+    finally:
+        local.release()
@@ -0,0 +1,85 @@
+# app/services/escrituras.py
+"""
+Escrituras condicionales de una sola fila.
+
+Las rutas que modifican o eliminan una solicitud o un servicio ponen en el WHERE de
+una única sentencia la regla de negocio y, si el cliente envió If-Match, la versión
+de la fila; la fila escrita vuelve con RETURNING. Así el camino feliz es una sola
+sentencia, sin SELECT previo ni `refresh`, y dos operadores que editan el mismo
+registro no pueden pisarse: el segundo no encuentra la versión que leyó.
+
+Cuando la sentencia no afecta ninguna fila, `diagnosticar` lee la fila (un camino
+de error, no el habitual) para responder 404, 412 o 400 según el motivo.
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+
+def condiciones_version(columna_version, versiones: Optional[List[int]]) -> list:
+    """Predicado de If-Match (ver `app.cache.versiones_if_match`); vacío si no se exige versión."""
+    return [] if versiones is None else [columna_version.in_(versiones)]
+
+
+def actualizar(db: Session, sentencia, modelo, clave):
+    """
+    Ejecuta el UPDATE ORM `sentencia` (sobre la fila `clave` de `modelo`) y devuelve la
+    entidad con los valores escritos, o None si el WHERE no coincidió. No hace commit.
+    """
+    if db.get_bind().dialect.update_returning:
+        return db.execute(
+            sentencia.returning(modelo).execution_options(populate_existing=True)
+        ).scalars().one_or_none()
+    # Sin RETURNING: UPDATE y lectura por clave primaria.
+    if db.execute(sentencia.execution_options(synchronize_session=False)).rowcount == 0:
+        return None
+    return db.get(modelo, clave, populate_existing=True)
+
+
+def actualizar_columnas(db: Session, sentencia, clave, *columnas):
+    """
+    Como `actualizar` para un UPDATE Core: devuelve `columnas` de la fila escrita
+    (la que cumple el predicado `clave`), o None si el WHERE no coincidió.
+    """
+    if db.get_bind().dialect.update_returning:
+        return db.execute(sentencia.returning(*columnas)).first()
+    if db.execute(sentencia).rowcount == 0:
+        return None
+    return db.execute(select(*columnas).where(clave)).first()
+
+
+def eliminar(db: Session, sentencia, *columnas):
+    """
+    Ejecuta el DELETE `sentencia` (de una fila) y devuelve `columnas` de la fila
+    eliminada, o None si el WHERE no coincidió. No hace commit.
+    """
+    sentencia = sentencia.execution_options(synchronize_session=False)
+    if db.get_bind().dialect.delete_returning:
+        return db.execute(sentencia.returning(*columnas)).first()
+    fila = db.execute(select(*columnas).where(sentencia.whereclause)).first()
+    if fila is None or db.execute(sentencia).rowcount == 0:
+        return None
+    return fila
+
+
+def diagnosticar(
+    db: Session,
+    columna_id,
+    clave,
+    columna_version,
+    versiones: Optional[List[int]],
+    no_encontrada: str,
+    conflicto: str,
+    regla: str,
+) -> Tuple[int, str]:
+    """
+    (código HTTP, detalle) de una escritura condicional que no afectó filas: 404 si la
+    fila no existe, 412 si su versión no es la de If-Match y 400 si incumple la regla.
+    """
+    version = db.execute(select(columna_version).where(columna_id == clave)).scalar_one_or_none()
+    if version is None:
+        return 404, no_encontrada
+    if versiones is not None and version not in versiones:
+        return 412, conflicto
+    return 400, regla
@@ -0,0 +1,233 @@
+# app/services/estadisticas.py
+"""
+Estadísticas agregadas servidas desde `estadisticas_diarias`.
+
+Cada escritura que puede cambiar un bucket (día de fecha_solicitud, cliente) lo
+registra con `marcar` en `estadisticas_pendientes`, dentro de su propia transacción.
+`refrescar` (tarea periódica de app/programador.py) recalcula solo esos buckets a
+partir de `solicitudes` y de sus contadores por estado (el costo aprobado es lo único
+que se lee de `servicios`), más las mismas tablas del archivo (app/models/archivo.py),
+y luego los totales de sus días en `estadisticas_por_dia`.
+`consultar` nunca toca las tablas base: sin filtro de cliente lee una fila por día del
+rango, y con cliente las filas de ese cliente, sin importar el tamaño de las tablas.
+"""
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import Date, and_, case, delete, func, insert, or_, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from app.models.archivo import ServicioArchivado, SolicitudArchivada
+from app.models.estadistica import EstadisticaDia, EstadisticaDiaria, EstadisticaPendiente
+from app.models.servicio import EstadoServicio, Servicio
+from app.models.solicitud import EstadoSolicitud, Solicitud
+from app.services import contadores
+
+# Filas de la cola leídas por vuelta de `refrescar`, y buckets por sentencia de recálculo.
+TAMANO_LOTE_POR_DEFECTO = 5000
+BUCKETS_POR_SENTENCIA = 200
+
+COLUMNA_POR_ESTADO_SOLICITUD = {
+    EstadoSolicitud.ABIERTA: "solicitudes_abiertas",
+    EstadoSolicitud.EN_PROCESO: "solicitudes_en_proceso",
+    EstadoSolicitud.CERRADA: "solicitudes_cerradas",
+    EstadoSolicitud.CANCELADA: "solicitudes_canceladas",
+}
+COLUMNAS_SERVICIOS = list(contadores.COLUMNA_POR_ESTADO.values())
+COLUMNAS = [*COLUMNA_POR_ESTADO_SOLICITUD.values(), *COLUMNAS_SERVICIOS, "costo_aprobado"]
+
+
+def _dia(columna):
+    return func.date(columna, type_=Date)
+
+
+def marcar(db: Session, filtro) -> None:
+    """Encola los buckets de las solicitudes que cumplen `filtro`. No hace commit."""
+    buckets = select(_dia(Solicitud.fecha_solicitud), Solicitud.cliente).where(filtro).distinct()
+    db.execute(insert(EstadisticaPendiente).from_select(["dia", "cliente"], buckets))
+
+
+def marcar_bucket(db: Session, fecha_solicitud: datetime, cliente: str) -> None:
+    """Encola el bucket de una solicitud ya leída (p. ej. devuelta por RETURNING). No hace commit."""
+    db.execute(insert(EstadisticaPendiente).values(dia=fecha_solicitud.date(), cliente=cliente))
+
+
+def _por_solicitud(modelo, modelo_servicio, filtro):
+    """Columnas de bucket de cada solicitud de `modelo` (tabla caliente o archivo) que cumple `filtro`."""
+    costo = (
+        select(func.coalesce(func.sum(modelo_servicio.costo_estimado), 0))
+        .where(modelo_servicio.id_solicitud == modelo.id, modelo_servicio.estado_servicio == EstadoServicio.APROBADO)
+        .correlate(modelo)
+        .scalar_subquery()
+    )
+    por_solicitud = select(
+        _dia(modelo.fecha_solicitud).label("dia"),
+        modelo.cliente,
+        *(case((modelo.estado == estado, 1), else_=0).label(nombre) for estado, nombre in COLUMNA_POR_ESTADO_SOLICITUD.items()),
+        *(getattr(modelo, nombre).label(nombre) for nombre in COLUMNAS_SERVICIOS),
+        costo.label("costo_aprobado"),
+    )
+    return por_solicitud if filtro is None else por_solicitud.where(filtro(modelo))
+
+
+def _agregado(filtro=None):
+    """
+    SELECT (dia, cliente, columnas...) agrupado por bucket. `filtro(modelo)` da la
+    condición sobre `Solicitud` o `SolicitudArchivada`: el resumen cuenta también las
+    solicitudes archivadas, así archivar no cambia las estadísticas.
+    """
+    fila = union_all(
+        _por_solicitud(Solicitud, Servicio, filtro),
+        _por_solicitud(SolicitudArchivada, ServicioArchivado, filtro),
+    ).subquery()
+    return select(
+        fila.c.dia, fila.c.cliente, *(func.sum(fila.c[nombre]) for nombre in COLUMNAS)
+    ).group_by(fila.c.dia, fila.c.cliente)
+
+
+def _recalcular(db: Session, buckets: Sequence[Tuple[date, str]]) -> None:
+    for posicion in range(0, len(buckets), BUCKETS_POR_SENTENCIA):
+        lote = buckets[posicion:posicion + BUCKETS_POR_SENTENCIA]
+
+        def filtro(modelo, lote=lote):
+            # Rango de fecha_solicitud sin envolver la columna, para usar los índices.
+            return or_(*(
+                and_(
+                    modelo.cliente == cliente,
+                    modelo.fecha_solicitud >= datetime.combine(dia, datetime.min.time()),
+                    modelo.fecha_solicitud < datetime.combine(dia + timedelta(days=1), datetime.min.time()),
+                )
+                for dia, cliente in lote
+            ))
+
+        db.execute(delete(EstadisticaDiaria).where(tuple_(EstadisticaDiaria.dia, EstadisticaDiaria.cliente).in_(lote)))
+        db.execute(insert(EstadisticaDiaria).from_select(["dia", "cliente", *COLUMNAS], _agregado(filtro)))
+    dias = sorted({dia for dia, _ in buckets})
+    for posicion in range(0, len(dias), BUCKETS_POR_SENTENCIA):
+        lote = dias[posicion:posicion + BUCKETS_POR_SENTENCIA]
+        db.execute(delete(EstadisticaDia).where(EstadisticaDia.dia.in_(lote)))
+        db.execute(insert(EstadisticaDia).from_select(["dia", *COLUMNAS], _por_dia(EstadisticaDiaria.dia.in_(lote))))
+
+
+def _por_dia(filtro=None):
+    """Suma de los buckets de `estadisticas_diarias` por día."""
+    sentencia = select(
+        EstadisticaDiaria.dia, *(func.sum(getattr(EstadisticaDiaria, nombre)) for nombre in COLUMNAS)
+    ).group_by(EstadisticaDiaria.dia)
+    return sentencia if filtro is None else sentencia.where(filtro)
+
+
+def refrescar(db: Session, tamano_lote: int = TAMANO_LOTE_POR_DEFECTO, al_confirmar_lote=None) -> dict:
+    """
+    Recalcula los buckets encolados, `tamano_lote` filas de la cola por vez y con un
+    commit por vuelta. Debe ejecutarse bajo el bloqueo de la tarea (un solo refresco a
+    la vez). Devuelve las marcas consumidas y los buckets recalculados.
+    """
+    marcas = 0
+    buckets = 0
+    while True:
+        filas = db.execute(
+            select(EstadisticaPendiente.id, EstadisticaPendiente.dia, EstadisticaPendiente.cliente)
+            .order_by(EstadisticaPendiente.id)
+            .limit(tamano_lote)
+        ).all()
+        if not filas:
+            break
+        unicos = sorted({(fila.dia, fila.cliente) for fila in filas})
+        _recalcular(db, unicos)
+        db.execute(delete(EstadisticaPendiente).where(EstadisticaPendiente.id.in_([fila.id for fila in filas])))
+        db.commit()
+        marcas += len(filas)
+        buckets += len(unicos)
+        if al_confirmar_lote is not None:
+            al_confirmar_lote()
+    return {"marcas": marcas, "buckets": buckets}
+
+
+def reconstruir(db: Session) -> int:
+    """Regenera el resumen completo desde las tablas base y vacía la cola. Devuelve los buckets."""
+    db.execute(delete(EstadisticaPendiente))
+    db.execute(delete(EstadisticaDiaria))
+    db.execute(delete(EstadisticaDia))
+    db.execute(insert(EstadisticaDiaria).from_select(["dia", "cliente", *COLUMNAS], _agregado()))
+    db.execute(insert(EstadisticaDia).from_select(["dia", *COLUMNAS], _por_dia()))
+    db.commit()
+    return db.execute(select(func.count()).select_from(EstadisticaDiaria)).scalar_one()
+
+
+def _periodo(dia: date, agrupar: str) -> date:
+    if agrupar == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if agrupar == "mes":
+        return dia.replace(day=1)
+    return dia
+
+
+def consultar(
+    db: Session,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    cliente: Optional[str] = None,
+    agrupar: str = "dia",
+    limite_clientes: int = 20,
+) -> dict:
+    """Totales por estado, ingreso por período y costo aprobado por cliente en el rango."""
+    def rango(tabla):
+        condiciones = []
+        if fecha_desde is not None:
+            condiciones.append(tabla.dia >= fecha_desde)
+        if fecha_hasta is not None:
+            condiciones.append(tabla.dia <= fecha_hasta)
+        return condiciones
+
+    # Sin cliente, totales e ingreso salen de los totales por día.
+    tabla = EstadisticaDia if cliente is None else EstadisticaDiaria
+    condiciones = rango(tabla)
+    if cliente is not None:
+        condiciones.append(EstadisticaDiaria.cliente == cliente)
+
+    def columna(nombre):
+        return getattr(tabla, nombre)
+
+    totales = db.execute(
+        select(*(func.coalesce(func.sum(columna(nombre)), 0) for nombre in COLUMNAS)).where(*condiciones)
+    ).one()
+    totales = dict(zip(COLUMNAS, totales))
+
+    solicitudes_dia = sum(columna(nombre) for nombre in COLUMNA_POR_ESTADO_SOLICITUD.values())
+    ingreso = OrderedDict()
+    for dia, cantidad in db.execute(
+        select(tabla.dia, func.sum(solicitudes_dia)).where(*condiciones)
+        .group_by(tabla.dia).order_by(tabla.dia)
+    ):
+        periodo = _periodo(dia, agrupar)
+        ingreso[periodo] = ingreso.get(periodo, 0) + cantidad
+
+    condiciones = rango(EstadisticaDiaria)
+    if cliente is not None:
+        condiciones.append(EstadisticaDiaria.cliente == cliente)
+    costo = func.sum(EstadisticaDiaria.costo_aprobado)
+    por_cliente = db.execute(
+        select(EstadisticaDiaria.cliente, costo, func.sum(EstadisticaDiaria.servicios_aprobados))
+        .where(*condiciones, EstadisticaDiaria.servicios_aprobados > 0)
+        .group_by(EstadisticaDiaria.cliente)
+        .order_by(costo.desc(), EstadisticaDiaria.cliente)
+        .limit(limite_clientes)
+    ).all()
+
+    return {
+        "solicitudes_por_estado": {
+            estado.value: totales[nombre] for estado, nombre in COLUMNA_POR_ESTADO_SOLICITUD.items()
+        },
+        "servicios_por_estado": {
+            estado.value: totales[nombre] for estado, nombre in contadores.COLUMNA_POR_ESTADO.items()
+        },
+        "costo_aprobado_total": totales["costo_aprobado"],
+        "ingreso": [{"periodo": periodo, "solicitudes": cantidad} for periodo, cantidad in ingreso.items()],
+        "costo_aprobado_por_cliente": [
+            {"cliente": nombre, "costo_aprobado": total, "servicios_aprobados": aprobados}
+            for nombre, total, aprobados in por_cliente
+        ],
+        "buckets_pendientes": db.execute(select(func.count()).select_from(EstadisticaPendiente)).scalar_one(),
+    }
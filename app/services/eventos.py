@@ -0,0 +1,126 @@
+# app/services/eventos.py
+"""
+Registro de eventos de cambios (tabla `eventos`) para GET /api/eventos.
+
+Las escrituras registran sus eventos dentro de su propia transacción, igual que
+`estadisticas.marcar`: un evento existe si y solo si su cambio se confirmó. Cada
+función es una sola sentencia (INSERT ... SELECT, o INSERT con el cliente leído por
+subconsulta), sin lecturas previas. El publicador de app/eventos.py los lee en
+orden de id y los reparte a las conexiones SSE.
+
+Tipos: solicitud.creada, solicitud.actualizada, solicitud.cerrada,
+solicitud.eliminada, solicitud.archivada, servicio.creado, servicio.actualizado,
+servicio.vencido y servicio.eliminado.
+"""
+from datetime import datetime
+from typing import List, Optional, Union
+
+from sqlalchemy import DateTime, Integer, String, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.models.evento import Evento
+from app.models.servicio import EstadoServicio, Servicio
+from app.models.solicitud import EstadoSolicitud, Solicitud
+
+COLUMNAS = ["fecha", "tipo", "id_solicitud", "id_servicio", "cliente", "estado"]
+
+
+def _constantes(tipo: str):
+    return literal(datetime.utcnow(), DateTime), literal(tipo, String)
+
+
+def _estado(estado: Optional[Union[EstadoSolicitud, EstadoServicio]], columna):
+    # Los Enum se guardan por nombre, como en sus tablas de origen.
+    return columna if estado is None else literal(estado.name, String)
+
+
+def solicitudes(db: Session, tipo: str, filtro, estado: Optional[EstadoSolicitud] = None) -> None:
+    """
+    Un evento `tipo` por solicitud que cumple `filtro`. `estado` sustituye al de la fila,
+    para registrar antes del UPDATE que lo cambia. No hace commit.
+    """
+    fecha, tipo = _constantes(tipo)
+    seleccion = (
+        select(fecha, tipo, Solicitud.id, literal(None, Integer), Solicitud.cliente, _estado(estado, Solicitud.estado))
+        .where(filtro)
+        .order_by(Solicitud.id)
+    )
+    db.execute(insert(Evento).from_select(COLUMNAS, seleccion))
+
+
+def servicios(db: Session, tipo: str, filtro, estado: Optional[EstadoServicio] = None) -> None:
+    """Un evento `tipo` por servicio que cumple `filtro` (ver `solicitudes`). No hace commit."""
+    fecha, tipo = _constantes(tipo)
+    seleccion = (
+        select(
+            fecha, tipo, Servicio.id_solicitud, Servicio.id_servicio, Solicitud.cliente,
+            _estado(estado, Servicio.estado_servicio),
+        )
+        .join(Solicitud, Solicitud.id == Servicio.id_solicitud)
+        .where(filtro)
+        .order_by(Servicio.id_servicio)
+    )
+    db.execute(insert(Evento).from_select(COLUMNAS, seleccion))
+
+
+def registrar(
+    db: Session,
+    tipo: str,
+    id_solicitud: int,
+    id_servicio: Optional[int] = None,
+    estado: Optional[Union[EstadoSolicitud, EstadoServicio]] = None,
+    cliente: Optional[str] = None,
+) -> None:
+    """
+    Un evento con valores ya conocidos (p. ej. devueltos por RETURNING). Sin `cliente`
+    se toma de la solicitud con una subconsulta. No hace commit.
+    """
+    if cliente is None:
+        cliente = select(Solicitud.cliente).where(Solicitud.id == id_solicitud).scalar_subquery()
+    db.execute(
+        insert(Evento).values(
+            fecha=datetime.utcnow(),
+            tipo=tipo,
+            id_solicitud=id_solicitud,
+            id_servicio=id_servicio,
+            cliente=cliente,
+            estado=estado.name if estado is not None else None,
+        )
+    )
+
+
+def leer(db: Session, desde_id: int, limite: int, hasta_id: Optional[int] = None) -> List[dict]:
+    """Eventos con id en (desde_id, hasta_id], en orden, como dicts listos para enviar."""
+    consulta = select(Evento).where(Evento.id > desde_id).order_by(Evento.id).limit(limite)
+    if hasta_id is not None:
+        consulta = consulta.where(Evento.id <= hasta_id)
+    return [a_dict(evento) for evento in db.execute(consulta).scalars()]
+
+
+def extremos(db: Session):
+    """(id mínimo, id máximo) del registro; (None, None) si está vacío."""
+    return db.execute(select(func.min(Evento.id), func.max(Evento.id))).one()
+
+
+def podar(db: Session, antes: datetime) -> int:
+    """Borra los eventos anteriores a `antes` y hace commit. Devuelve las filas borradas."""
+    filas = db.execute(delete(Evento).where(Evento.fecha < antes)).rowcount
+    db.commit()
+    return filas
+
+
+def a_dict(evento: Evento) -> dict:
+    estado = evento.estado
+    if estado is not None:
+        # Se publica el valor del Enum (p. ej. 'Vencido'), como en el resto de la API.
+        enum = EstadoServicio if evento.tipo.startswith("servicio.") else EstadoSolicitud
+        estado = enum[estado].value if estado in enum.__members__ else estado
+    return {
+        "id": evento.id,
+        "tipo": evento.tipo,
+        "fecha": evento.fecha.isoformat(),
+        "id_solicitud": evento.id_solicitud,
+        "id_servicio": evento.id_servicio,
+        "cliente": evento.cliente,
+        "estado": estado,
+    }
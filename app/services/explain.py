@@ -0,0 +1,28 @@
+# app/services/explain.py
+"""Construcción EXPLAIN que respeta el procesamiento normal de parámetros de SQLAlchemy."""
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    """
+    EXPLAIN sobre una sentencia. En SQLite se emite `EXPLAIN QUERY PLAN`; con
+    `formato_json=True` PostgreSQL devuelve el plan como JSON (incluye filas estimadas).
+    """
+
+    inherit_cache = False
+
+    def __init__(self, sentencia, formato_json: bool = False):
+        self.sentencia = sentencia
+        self.formato_json = formato_json
+
+
+@compiles(Explain)
+def _compilar_explain(elemento, compiler, **kw):
+    if compiler.dialect.name == "sqlite":
+        prefijo = "EXPLAIN QUERY PLAN "
+    elif elemento.formato_json:
+        prefijo = "EXPLAIN (FORMAT JSON) "
+    else:
+        prefijo = "EXPLAIN "
+    return prefijo + compiler.process(elemento.sentencia, **kw)
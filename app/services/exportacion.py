@@ -0,0 +1,146 @@
+# app/services/exportacion.py
+"""
+Exportación completa de solicitudes (y sus servicios) como NDJSON o CSV.
+
+Las filas se leen con un cursor del lado del servidor (`yield_per`, que en PostgreSQL
+activa `stream_results`) y se serializan lote a lote, por lo que la memoria usada no
+depende del número de filas. Los servicios de cada lote se cargan con una sola
+consulta `IN` sobre los ids del lote.
+"""
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models.servicio import Servicio
+from app.models.solicitud import Solicitud
+from app.services import solicitudes as servicio_solicitudes
+
+TAMANO_LOTE_POR_DEFECTO = 1000
+
+# Mismos campos que SolicitudOut / ServicioOut.
+COLUMNAS_SOLICITUD = (
+    Solicitud.id,
+    Solicitud.cliente,
+    Solicitud.email_cliente,
+    Solicitud.observaciones,
+    Solicitud.fecha_solicitud,
+    Solicitud.estado,
+    Solicitud.fecha_ultima_modificacion,
+)
+COLUMNAS_SERVICIO = (
+    Servicio.id_servicio,
+    Servicio.id_solicitud,
+    Servicio.nombre_servicio,
+    Servicio.fecha_reunion,
+    Servicio.estado_servicio,
+    Servicio.comentarios,
+    Servicio.costo_estimado,
+)
+CAMPOS_SOLICITUD = [c.key for c in COLUMNAS_SOLICITUD]
+CAMPOS_SERVICIO = [c.key for c in COLUMNAS_SERVICIO]
+
+
+def _valor(valor):
+    if isinstance(valor, enum.Enum):
+        return valor.value
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def _a_dict(fila) -> dict:
+    return {clave: _valor(valor) for clave, valor in fila._mapping.items()}
+
+
+def _consulta_solicitudes(db, filtros: dict, ordenar_por: str, orden: str):
+    consulta = servicio_solicitudes.aplicar_filtros(db, select(*COLUMNAS_SOLICITUD), **filtros)
+    consulta = servicio_solicitudes.ordenar(db, consulta, ordenar_por, orden, filtros.get("cliente"))
+    # Desempate estable para que dos exportaciones iguales produzcan el mismo orden.
+    return consulta.order_by(Solicitud.id)
+
+
+def _servicios_por_solicitud(db, ids) -> dict:
+    agrupados = {id_solicitud: [] for id_solicitud in ids}
+    consulta = (
+        select(*COLUMNAS_SERVICIO)
+        .where(Servicio.id_solicitud.in_(ids))
+        .order_by(Servicio.id_solicitud, Servicio.id_servicio)
+    )
+    for fila in db.execute(consulta):
+        agrupados[fila.id_solicitud].append(_a_dict(fila))
+    return agrupados
+
+
+def lotes_solicitudes(
+    filtros: dict, ordenar_por: str, orden: str, incluir_servicios: bool, tamano_lote: int, sesiones=SessionLocal
+) -> Iterator[list]:
+    """
+    Produce listas de hasta `tamano_lote` solicitudes (dicts). Usa su propia sesión de
+    `sesiones` (p. ej. de una réplica), ya que el flujo se consume después de que el
+    endpoint retorna.
+    """
+    db = sesiones()
+    try:
+        resultado = db.execute(
+            _consulta_solicitudes(db, filtros, ordenar_por, orden).execution_options(yield_per=tamano_lote)
+        )
+        for particion in resultado.partitions():
+            filas = [_a_dict(fila) for fila in particion]
+            if incluir_servicios:
+                servicios = _servicios_por_solicitud(db, [f["id"] for f in filas])
+                for fila in filas:
+                    fila["servicios"] = servicios[fila["id"]]
+            yield filas
+    finally:
+        db.close()
+
+
+def lotes_servicios(filtros: dict, tamano_lote: int, sesiones=SessionLocal) -> Iterator[list]:
+    """Servicios de las solicitudes que cumplen `filtros`, como segundo flujo independiente."""
+    db = sesiones()
+    try:
+        solicitudes_filtradas = servicio_solicitudes.aplicar_filtros(db, select(Solicitud.id), **filtros).subquery()
+        consulta = (
+            select(*COLUMNAS_SERVICIO)
+            .join(solicitudes_filtradas, solicitudes_filtradas.c.id == Servicio.id_solicitud)
+            .order_by(Servicio.id_solicitud, Servicio.id_servicio)
+            .execution_options(yield_per=tamano_lote)
+        )
+        for particion in db.execute(consulta).partitions():
+            yield [_a_dict(fila) for fila in particion]
+    finally:
+        db.close()
+
+
+def como_ndjson(lotes: Iterable[list]) -> Iterator[bytes]:
+    for lote in lotes:
+        yield "".join(json.dumps(fila, ensure_ascii=False) + "\n" for fila in lote).encode()
+
+
+def como_csv(lotes: Iterable[list], campos: list) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=campos)
+    escritor.writeheader()
+    for lote in lotes:
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def comprimir_gzip(bloques: Iterable[bytes]) -> Iterator[bytes]:
+    compresor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)  # cabecera gzip
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
@@ -0,0 +1,118 @@
+# app/services/idempotencia.py
+"""
+`Idempotency-Key` para los POST de creación (`POST /solicitudes/` y
+`POST /solicitudes/{id}/servicios`), que el gateway reintenta ante un timeout.
+
+La primera ejecución inserta la clave en su propia transacción antes de escribir nada
+(`reservar`) y guarda ahí la respuesta (`guardar`): el commit confirma las dos cosas
+o ninguna. Un reintento que llega mientras la original sigue en curso espera a que
+termine: en este worker con `turno`; en otro, bloqueado por la base en el INSERT de
+la clave hasta que la original confirme o revierta. Luego encuentra la respuesta
+guardada y la devuelve tal cual, sin tocar `solicitudes` ni `servicios`. Si la
+original falló no quedó clave y el reintento se ejecuta de nuevo.
+
+La misma clave con otro cuerpo o en otra ruta es un error del cliente
+(`ClaveReutilizada`). Las claves vencen a los IDEMPOTENCIA_TTL_SEGUNDOS y el
+programador las poda.
+"""
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.idempotencia import ClaveIdempotencia
+
+CABECERA = "Idempotency-Key"
+# Presente en las respuestas repetidas desde una clave guardada.
+CABECERA_REPETIDA = "Idempotent-Replayed"
+LONGITUD_MAXIMA = 255
+
+
+class ClaveReutilizada(ValueError):
+    pass
+
+
+def huella(cuerpo: bytes) -> str:
+    return hashlib.sha256(cuerpo).hexdigest()
+
+
+# Claves con un request en curso en este worker.
+_en_curso: Dict[str, asyncio.Event] = {}
+
+
+@asynccontextmanager
+async def turno(clave: Optional[str]):
+    """Espera a que termine el request en curso con la misma `clave` en este worker (nada si no hay clave)."""
+    if not clave:
+        yield
+        return
+    while (previo := _en_curso.get(clave)) is not None:
+        await previo.wait()
+    evento = _en_curso[clave] = asyncio.Event()
+    try:
+        yield
+    finally:
+        del _en_curso[clave]
+        evento.set()
+
+
+def _insertar_si_no_existe(db: Session, valores: dict) -> bool:
+    dialecto = db.get_bind().dialect.name
+    if dialecto in ("postgresql", "sqlite"):
+        modulo = postgresql if dialecto == "postgresql" else sqlite
+        sentencia = modulo.insert(ClaveIdempotencia).values(**valores).on_conflict_do_nothing(index_elements=["clave"])
+        return db.execute(sentencia).rowcount == 1
+    try:
+        with db.begin_nested():
+            db.execute(insert(ClaveIdempotencia).values(**valores))
+    except IntegrityError:
+        return False
+    return True
+
+
+def reservar(db: Session, clave: str, ruta: str, huella: str) -> Optional[ClaveIdempotencia]:
+    """
+    Reserva `clave` en la transacción en curso. Devuelve None si la reservó (quien
+    llama ejecuta la escritura y llama a `guardar` antes del commit), o la fila con la
+    respuesta ya guardada, en cuyo caso quien llama debe revertir. No hace commit.
+    """
+    ahora = datetime.utcnow()
+    db.execute(delete(ClaveIdempotencia).where(ClaveIdempotencia.clave == clave, ClaveIdempotencia.expira < ahora))
+    reservada = _insertar_si_no_existe(db, {
+        "clave": clave,
+        "ruta": ruta,
+        "huella": huella,
+        # Se completan en `guardar`, antes del commit: nunca se ven así desde fuera.
+        "estado_http": 0,
+        "cuerpo": b"",
+        "expira": ahora + timedelta(seconds=settings.IDEMPOTENCIA_TTL_SEGUNDOS),
+    })
+    if reservada:
+        return None
+    previa = db.execute(select(ClaveIdempotencia).where(ClaveIdempotencia.clave == clave)).scalar_one()
+    if previa.ruta != ruta or previa.huella != huella:
+        raise ClaveReutilizada(f"La clave {CABECERA} ya se usó con otro request ({previa.ruta}).")
+    return previa
+
+
+def guardar(db: Session, clave: str, estado_http: int, cuerpo: bytes) -> None:
+    """Guarda la respuesta de la clave reservada. No hace commit."""
+    db.execute(
+        update(ClaveIdempotencia)
+        .where(ClaveIdempotencia.clave == clave)
+        .values(estado_http=estado_http, cuerpo=cuerpo)
+    )
+
+
+def podar(db: Session, ahora: datetime) -> int:
+    """Borra las claves vencidas y hace commit. Devuelve las filas borradas."""
+    filas = db.execute(delete(ClaveIdempotencia).where(ClaveIdempotencia.expira < ahora)).rowcount
+    db.commit()
+    return filas
@@ -0,0 +1,176 @@
+# app/services/importacion.py
+"""
+Importación masiva de solicitudes con sus servicios.
+
+El cuerpo se lee como flujo (NDJSON o un arreglo JSON) y se decodifica registro a
+registro; cada registro se valida con `SolicitudCreate` y los válidos se insertan por
+lotes con un INSERT multi-fila ... RETURNING para las solicitudes y un INSERT
+multi-fila para sus servicios, con un commit por lote. En memoria solo vive el lote
+en curso.
+"""
+import codecs
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.servicio import EstadoServicio, Servicio
+from app.models.solicitud import Solicitud
+from app.schemas.solicitud import SolicitudCreate
+from app.services import contadores, estadisticas, eventos
+
+TAMANO_LOTE_POR_DEFECTO = 500
+# Un registro que no termina de decodificarse tras este tamaño se considera inválido.
+MAX_BYTES_REGISTRO = 1024 * 1024
+
+
+class ErrorFormato(ValueError):
+    """El cuerpo no es NDJSON ni un arreglo JSON bien formado."""
+
+
+async def leer_registros(flujo: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Produce (índice, registro) a partir de un cuerpo NDJSON o de un arreglo JSON,
+    sin cargar el cuerpo completo. Una línea NDJSON inválida se entrega como
+    `ErrorFormato` en lugar del registro; en un arreglo JSON mal formado no es posible
+    continuar y se lanza `ErrorFormato`.
+    """
+    decodificador = codecs.getincrementaldecoder("utf-8")()
+    parser = json.JSONDecoder()
+    buffer = ""
+    modo = None  # "ndjson" o "arreglo", según el primer carácter significativo
+    posicion = 0
+    indice = 0
+    fin = False
+
+    async for fragmento in _con_fin(flujo):
+        if fragmento is None:
+            buffer += decodificador.decode(b"", final=True)
+            fin = True
+        else:
+            buffer += decodificador.decode(fragmento)
+
+        if modo is None:
+            contenido = buffer.lstrip()
+            if not contenido:
+                continue
+            modo = "arreglo" if contenido[0] == "[" else "ndjson"
+            posicion = buffer.index("[") + 1 if modo == "arreglo" else 0
+
+        if modo == "ndjson":
+            lineas = buffer.split("\n")
+            buffer = "" if fin else lineas.pop()
+            for linea in lineas:
+                if not linea.strip():
+                    continue
+                try:
+                    yield indice, json.loads(linea)
+                except json.JSONDecodeError as e:
+                    yield indice, ErrorFormato(f"JSON inválido: {e.msg}")
+                indice += 1
+            if len(buffer) > MAX_BYTES_REGISTRO:
+                raise ErrorFormato(f"El registro {indice} supera el tamaño máximo permitido.")
+            continue
+
+        # Arreglo JSON: se decodifica cada elemento con raw_decode a medida que se completa.
+        while True:
+            while posicion < len(buffer) and buffer[posicion] in " \t\r\n,":
+                posicion += 1
+            if posicion >= len(buffer):
+                break
+            if buffer[posicion] == "]":
+                return
+            try:
+                registro, posicion = parser.raw_decode(buffer, posicion)
+            except json.JSONDecodeError as e:
+                if fin:
+                    raise ErrorFormato(f"JSON inválido en el registro {indice}: {e.msg}")
+                if len(buffer) - posicion > MAX_BYTES_REGISTRO:
+                    raise ErrorFormato(f"El registro {indice} supera el tamaño máximo permitido.")
+                break  # registro incompleto: esperar más datos
+            yield indice, registro
+            indice += 1
+        buffer = buffer[posicion:]
+        posicion = 0
+
+    if modo == "arreglo":
+        raise ErrorFormato("El arreglo JSON no está cerrado.")
+
+
+async def _con_fin(flujo: AsyncIterator[bytes]):
+    async for fragmento in flujo:
+        if fragmento:
+            yield fragmento
+    yield None
+
+
+def validar(registro) -> SolicitudCreate:
+    if isinstance(registro, ErrorFormato):
+        raise registro
+    return SolicitudCreate.model_validate(registro)
+
+
+def errores_validacion(error: Exception) -> list:
+    if isinstance(error, ValidationError):
+        return json.loads(error.json(include_url=False))
+    return [{"msg": str(error)}]
+
+
+def _filas_servicios(id_solicitud: int, solicitud_in: SolicitudCreate) -> Iterator[dict]:
+    for servicio_data in solicitud_in.servicios:
+        yield {
+            "id_solicitud": id_solicitud,
+            "nombre_servicio": servicio_data.nombre_servicio,
+            # Mismo tratamiento de la fecha que create_solicitud.
+            "fecha_reunion": datetime.combine(servicio_data.fecha_reunion, datetime.min.time()),
+            "comentarios": servicio_data.comentarios,
+            "estado_servicio": EstadoServicio.PENDIENTE,
+        }
+
+
+def insertar_lote(db: Session, lote: List[Tuple[int, SolicitudCreate]]) -> List[dict]:
+    """
+    Inserta un lote de solicitudes válidas con sus servicios en una transacción.
+    Devuelve un resultado por registro: {"indice", "id"} o {"indice", "errores"}
+    si el lote completo falla en la base de datos.
+    """
+    filas = [
+        {
+            "cliente": s.cliente,
+            "email_cliente": s.email_cliente,
+            "observaciones": s.observaciones,
+            # Todos los servicios importados nacen pendientes.
+            **contadores.iniciales([EstadoServicio.PENDIENTE] * len(s.servicios)),
+        }
+        for _, s in lote
+    ]
+    try:
+        dialecto = db.get_bind().dialect
+        if dialecto.name == "sqlite" and dialecto.insert_executemany_returning:
+            # SQLite no ofrece a SQLAlchemy un "sentinel" implícito, así que pedir el orden
+            # de parámetros degrada a un INSERT por fila. Dentro de una misma sentencia
+            # SQLite asigna los rowid de forma creciente en el orden de VALUES (un solo
+            # escritor), por lo que basta ordenar los ids devueltos.
+            ids = sorted(db.execute(insert(Solicitud).returning(Solicitud.id), filas).scalars().all())
+        elif dialecto.insert_executemany_returning_sort_by_parameter_order:
+            # Un único INSERT multi-fila; RETURNING devuelve los ids en el orden de `filas`.
+            ids = db.execute(
+                insert(Solicitud).returning(Solicitud.id, sort_by_parameter_order=True), filas
+            ).scalars().all()
+        else:
+            ids = [db.execute(insert(Solicitud).values(**fila)).inserted_primary_key[0] for fila in filas]
+
+        servicios = [fila for id_solicitud, (_, s) in zip(ids, lote) for fila in _filas_servicios(id_solicitud, s)]
+        db.execute(insert(Servicio), servicios)
+        estadisticas.marcar(db, Solicitud.id.in_(ids))
+        eventos.solicitudes(db, "solicitud.creada", Solicitud.id.in_(ids))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        error = [{"msg": f"Error de base de datos al insertar el lote: {e.__class__.__name__}"}]
+        return [{"indice": indice, "errores": error} for indice, _ in lote]
+
+    return [{"indice": indice, "id": id_solicitud} for (indice, _), id_solicitud in zip(lote, ids)]
@@ -0,0 +1,326 @@
+# app/services/procesamiento.py
+"""
+Motor del procesamiento automático de servicios vencidos y cierre de solicitudes.
+
+En lugar de cargar cada fila en la sesión y modificarla objeto por objeto, cada fase
+se ejecuta como sentencias UPDATE sobre conjuntos, recorriendo las filas que cumplen
+el filtro en tramos de hasta `tamano_lote` claves consecutivas y confirmando (commit)
+al final de cada lote. Así los
+bloqueos de fila duran lo que dura un lote y la memoria del worker no crece con
+el tamaño de las tablas.
+"""
+import time
+from datetime import datetime, time as dt_time
+from typing import Callable, Iterable, Optional, Set
+
+from sqlalchemy import and_, exists, func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.servicio import EstadoServicio, Servicio
+from app.models.solicitud import EstadoSolicitud, Solicitud
+from app.models.tarea import TareaProgramada
+from app.services import contadores, estadisticas, eventos
+
+TAMANO_LOTE_POR_DEFECTO = 1000
+
+# Fila de `tareas_programadas` con la marca de agua de la pasada incremental (app/programador.py).
+TAREA = "procesar_pendientes"
+
+ESTADOS_FINALES_SERVICIO = (EstadoServicio.APROBADO, EstadoServicio.RECHAZADO, EstadoServicio.VENCIDO)
+ESTADOS_ACTIVOS_SOLICITUD = (EstadoSolicitud.ABIERTA, EstadoSolicitud.EN_PROCESO)
+
+
+def inicio_del_dia(dia) -> datetime:
+    return datetime.combine(dia, dt_time.min)
+
+
+def filtro_servicios_vencidos(hoy):
+    """
+    Servicios pendientes cuya fecha de reunión es anterior a `hoy`.
+
+    La condición se expresa sobre la columna sin envolver (`fecha_reunion < hoy 00:00`)
+    para que pueda resolverse con `ix_servicios_pendientes_fecha_reunion`; usar
+    `DATE(fecha_reunion) < hoy` obliga a recorrer toda la tabla.
+    """
+    return and_(
+        Servicio.estado_servicio == EstadoServicio.PENDIENTE,
+        Servicio.fecha_reunion < inicio_del_dia(hoy),
+    )
+
+
+def filtro_servicios_vencidos_entre(desde: datetime, hasta: datetime):
+    """Servicios pendientes con fecha de reunión en [desde, hasta): la ventana de una pasada incremental."""
+    return and_(
+        Servicio.estado_servicio == EstadoServicio.PENDIENTE,
+        Servicio.fecha_reunion >= desde,
+        Servicio.fecha_reunion < hasta,
+    )
+
+
+def reabrir_ventana(db: Session, filtro) -> None:
+    """
+    Para las escrituras que devuelven servicios a PENDIENTE: si alguno de `filtro` tiene
+    la reunión antes de la marca de agua, la pasada incremental ya no lo vería, así que
+    la marca baja hasta esa fecha y la próxima pasada lo vence. No hace commit: va en la
+    transacción de la escritura.
+    """
+    minima = (
+        select(func.min(Servicio.fecha_reunion))
+        .where(filtro, Servicio.estado_servicio == EstadoServicio.PENDIENTE)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(TareaProgramada)
+        .where(TareaProgramada.nombre == TAREA, TareaProgramada.marca_agua > minima)
+        .values(marca_agua=minima)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def filtro_solicitudes_a_cerrar(hoy, incluir_vencibles: bool = False):
+    """
+    Solicitudes activas con al menos un servicio y sin ningún servicio en estado no final.
+
+    Se resuelve con los contadores desnormalizados de `solicitudes`, sin leer
+    `servicios`. Con `incluir_vencibles=True` los servicios pendientes ya vencidos se
+    consideran finales; se usa en modo simulación, donde la fase de vencimiento no
+    escribe nada y los contadores todavía no los reflejan, así que se consulta
+    `servicios` con EXISTS.
+    """
+    if not incluir_vencibles:
+        finales = Solicitud.servicios_aprobados + Solicitud.servicios_rechazados + Solicitud.servicios_vencidos
+        return and_(
+            Solicitud.estado.in_(ESTADOS_ACTIVOS_SOLICITUD),
+            Solicitud.servicios_pendientes == 0,
+            finales > 0,
+        )
+    tiene_servicios = exists().where(Servicio.id_solicitud == Solicitud.id)
+    no_final = and_(Servicio.estado_servicio.notin_(ESTADOS_FINALES_SERVICIO), ~filtro_servicios_vencidos(hoy))
+    tiene_no_finales = exists().where(Servicio.id_solicitud == Solicitud.id, no_final)
+    return and_(
+        Solicitud.estado.in_(ESTADOS_ACTIVOS_SOLICITUD),
+        tiene_servicios,
+        ~tiene_no_finales,
+    )
+
+
+def _limite_lote(db: Session, columna, condicion, tamano_lote: int):
+    """
+    Clave hasta la que llega el próximo lote: la `tamano_lote`-ésima que cumple
+    `condicion` o, si quedan menos, la última. None si no queda ninguna.
+    """
+    limite = db.execute(
+        select(columna).where(condicion).order_by(columna).offset(tamano_lote - 1).limit(1)
+    ).scalar()
+    if limite is None:
+        limite = db.execute(select(func.max(columna)).where(condicion)).scalar()
+    return limite
+
+
+# Recibe los ids de las solicitudes modificadas por un lote ya confirmado, o None
+# si el motor no admite UPDATE ... RETURNING y no es posible saber cuáles fueron.
+AlConfirmarLote = Callable[[Optional[Iterable[int]]], None]
+
+
+def _actualizar(db: Session, sentencia, columna_id_solicitud):
+    """Ejecuta un UPDATE y devuelve (filas afectadas, ids de solicitud afectados o None)."""
+    sentencia = sentencia.execution_options(synchronize_session=False)
+    if db.get_bind().dialect.update_returning:
+        ids = db.execute(sentencia.returning(columna_id_solicitud)).scalars().all()
+        return len(ids), set(ids)
+    return db.execute(sentencia).rowcount, None
+
+
+def _vencer(db: Session, rango):
+    """
+    Marca como vencidos los servicios de `rango` y ajusta los contadores de sus
+    solicitudes en la misma transacción. Devuelve (filas, ids de solicitud afectados).
+    """
+    # El evento se registra antes del UPDATE: después, `rango` (servicios pendientes) ya no los incluye.
+    eventos.servicios(db, "servicio.vencido", rango, EstadoServicio.VENCIDO)
+    sentencia = (
+        update(Servicio)
+        .where(rango)
+        .values(estado_servicio=EstadoServicio.VENCIDO, version=Servicio.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        # Una entrada por servicio vencido: las repeticiones son el delta de cada solicitud.
+        ids = db.execute(sentencia.returning(Servicio.id_solicitud)).scalars().all()
+        contadores.mover(db, ids, EstadoServicio.PENDIENTE, EstadoServicio.VENCIDO)
+        if ids:
+            estadisticas.marcar(db, Solicitud.id.in_(set(ids)))
+        return len(ids), set(ids)
+    # Sin RETURNING las solicitudes del lote se leen antes de actualizar y sus
+    # contadores se recalculan después.
+    ids = set(db.execute(select(Servicio.id_solicitud).where(rango)).scalars())
+    filas = db.execute(sentencia).rowcount
+    if ids:
+        contadores.recalcular(db, Solicitud.id.in_(ids))
+        estadisticas.marcar(db, Solicitud.id.in_(ids))
+    return filas, ids
+
+
+def _procesar_por_lotes(
+    db: Session,
+    columna,
+    filtro,
+    tamano_lote: int,
+    aplicar: Callable,
+    dry_run: bool,
+    al_confirmar_lote: Optional[AlConfirmarLote] = None,
+):
+    """
+    Recorre por `columna` las filas que cumplen `filtro` en lotes de hasta `tamano_lote`
+    filas: cada lote va de la clave siguiente a la del anterior hasta la que marca
+    `_limite_lote`, así que ninguno queda vacío aunque las claves sean dispersas.
+    Devuelve (filas afectadas, lotes procesados).
+    """
+    total = 0
+    lotes = 0
+    ultimo = None
+    while True:
+        condicion = filtro if ultimo is None else and_(filtro, columna > ultimo)
+        limite = _limite_lote(db, columna, condicion, tamano_lote)
+        if limite is None:
+            break
+        rango = and_(condicion, columna <= limite)
+        if dry_run:
+            total += db.execute(select(func.count()).where(rango)).scalar_one()
+        else:
+            filas, ids_solicitud = aplicar(rango)
+            db.commit()
+            total += filas
+            if al_confirmar_lote is not None and filas:
+                al_confirmar_lote(ids_solicitud)
+        lotes += 1
+        ultimo = limite
+    return total, lotes
+
+
+def procesar_pendientes(
+    db: Session,
+    hoy=None,
+    tamano_lote: int = TAMANO_LOTE_POR_DEFECTO,
+    dry_run: bool = False,
+    al_confirmar_lote: Optional[AlConfirmarLote] = None,
+) -> dict:
+    """
+    Ejecuta las dos fases del procesamiento:
+    1. Marca como 'Vencido' los servicios pendientes con fecha de reunión pasada.
+    2. Cierra las solicitudes activas cuyos servicios están todos en estado final.
+
+    Cada lote se confirma por separado, por lo que un error a mitad de camino deja
+    aplicados los lotes ya confirmados; volver a ejecutar el proceso es seguro.
+    En modo `dry_run` solo se cuentan las filas que cambiarían, sin escribir.
+
+    `al_confirmar_lote` se invoca tras cada commit con las solicitudes modificadas
+    (p. ej. para invalidar la caché de respuestas).
+    """
+    hoy = hoy or datetime.utcnow().date()
+    inicio_total = time.perf_counter()
+
+    def vencer(rango):
+        return _vencer(db, rango)
+
+    inicio = time.perf_counter()
+    servicios_vencidos, lotes_servicios = _procesar_por_lotes(
+        db, Servicio.id_servicio, filtro_servicios_vencidos(hoy), tamano_lote, vencer, dry_run, al_confirmar_lote
+    )
+    tiempo_vencimiento = time.perf_counter() - inicio
+
+    def cerrar(rango):
+        estadisticas.marcar(db, rango)
+        eventos.solicitudes(db, "solicitud.cerrada", rango, EstadoSolicitud.CERRADA)
+        sentencia = (
+            update(Solicitud)
+            .where(rango)
+            .values(estado=EstadoSolicitud.CERRADA, fecha_ultima_modificacion=datetime.utcnow(), version=Solicitud.version + 1)
+        )
+        return _actualizar(db, sentencia, Solicitud.id)
+
+    inicio = time.perf_counter()
+    solicitudes_cerradas, lotes_solicitudes = _procesar_por_lotes(
+        db, Solicitud.id, filtro_solicitudes_a_cerrar(hoy, incluir_vencibles=dry_run), tamano_lote, cerrar, dry_run, al_confirmar_lote
+    )
+    tiempo_cierre = time.perf_counter() - inicio
+
+    return {
+        "servicios_marcados_vencidos": servicios_vencidos,
+        "solicitudes_cerradas_automaticamente": solicitudes_cerradas,
+        "dry_run": dry_run,
+        "lotes": {"servicios": lotes_servicios, "solicitudes": lotes_solicitudes},
+        "tiempos_ms": {
+            "vencer_servicios": round(tiempo_vencimiento * 1000, 2),
+            "cerrar_solicitudes": round(tiempo_cierre * 1000, 2),
+            "total": round((time.perf_counter() - inicio_total) * 1000, 2),
+        },
+    }
+
+
+def procesar_incremental(
+    db: Session,
+    desde: datetime,
+    hoy=None,
+    tamano_lote: int = TAMANO_LOTE_POR_DEFECTO,
+    al_confirmar_lote: Optional[AlConfirmarLote] = None,
+) -> dict:
+    """
+    Variante incremental de `procesar_pendientes` para el programador: vence solo los
+    servicios cuya fecha de reunión pasó desde `desde` (la marca de agua de la pasada
+    anterior) y revisa el cierre únicamente de las solicitudes de esos servicios.
+
+    Devuelve lo mismo que `procesar_pendientes` más `hasta`, la nueva marca de agua.
+    """
+    hoy = hoy or datetime.utcnow().date()
+    hasta = inicio_del_dia(hoy)
+    inicio_total = time.perf_counter()
+    afectadas: Set[int] = set()
+
+    def vencer(rango):
+        filas, ids = _vencer(db, rango)
+        afectadas.update(ids)
+        return filas, ids
+
+    inicio = time.perf_counter()
+    servicios_vencidos, lotes_servicios = 0, 0
+    if desde < hasta:
+        servicios_vencidos, lotes_servicios = _procesar_por_lotes(
+            db, Servicio.id_servicio, filtro_servicios_vencidos_entre(desde, hasta), tamano_lote, vencer, False, al_confirmar_lote
+        )
+    tiempo_vencimiento = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    solicitudes_cerradas, lotes_solicitudes = 0, 0
+    ids = sorted(afectadas)
+    for posicion in range(0, len(ids), tamano_lote):
+        lote = ids[posicion:posicion + tamano_lote]
+        rango = and_(filtro_solicitudes_a_cerrar(hoy), Solicitud.id.in_(lote))
+        estadisticas.marcar(db, rango)
+        eventos.solicitudes(db, "solicitud.cerrada", rango, EstadoSolicitud.CERRADA)
+        sentencia = (
+            update(Solicitud)
+            .where(rango)
+            .values(estado=EstadoSolicitud.CERRADA, fecha_ultima_modificacion=datetime.utcnow(), version=Solicitud.version + 1)
+        )
+        filas, cerradas = _actualizar(db, sentencia, Solicitud.id)
+        db.commit()
+        solicitudes_cerradas += filas
+        lotes_solicitudes += 1
+        if al_confirmar_lote is not None and filas:
+            al_confirmar_lote(cerradas)
+    tiempo_cierre = time.perf_counter() - inicio
+
+    return {
+        "servicios_marcados_vencidos": servicios_vencidos,
+        "solicitudes_cerradas_automaticamente": solicitudes_cerradas,
+        "solicitudes_revisadas": len(ids),
+        "desde": desde,
+        "hasta": hasta,
+        "lotes": {"servicios": lotes_servicios, "solicitudes": lotes_solicitudes},
+        "tiempos_ms": {
+            "vencer_servicios": round(tiempo_vencimiento * 1000, 2),
+            "cerrar_solicitudes": round(tiempo_cierre * 1000, 2),
+            "total": round((time.perf_counter() - inicio_total) * 1000, 2),
+        },
+    }
@@ -0,0 +1,114 @@
+# app/services/servicios.py
+"""
+Cambios de estado y costo de muchos servicios en una transacción (PATCH /servicios/bulk).
+
+Aplica las mismas reglas que `update_servicio`: el costo solo se fija en servicios
+aprobados y se borra al salir de APROBADO. En lugar de cargar y modificar cada
+servicio, lee los estados actuales con un solo SELECT ... IN (bloqueando las filas)
+y escribe con un UPDATE executemany por forma de cambio; los contadores de las
+solicitudes y las marcas de estadísticas se ajustan también en bloque.
+"""
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from app.models.servicio import EstadoServicio, Servicio
+from app.models.solicitud import Solicitud
+from app.schemas.servicio import ServicioCambio
+from app.services import contadores, estadisticas, eventos, procesamiento
+
+COSTO_SIN_APROBAR = "No se puede establecer un costo estimado si el servicio no está en estado 'Aprobado'."
+
+
+def _valores(cambio: ServicioCambio, estado_actual: EstadoServicio):
+    """Columnas a escribir para `cambio`, o (None, motivo) si viola una regla."""
+    fija_costo = "costo_estimado" in cambio.model_fields_set
+    valores = {}
+    if cambio.estado_servicio is not None:
+        valores["estado_servicio"] = cambio.estado_servicio
+        if cambio.estado_servicio != EstadoServicio.APROBADO:
+            if cambio.costo_estimado is not None:
+                return None, COSTO_SIN_APROBAR
+            # Al dejar (o no alcanzar) APROBADO el costo se borra.
+            valores["costo_estimado"] = None
+        elif fija_costo:
+            valores["costo_estimado"] = cambio.costo_estimado
+    elif fija_costo:
+        if cambio.costo_estimado is not None and estado_actual != EstadoServicio.APROBADO:
+            return None, "El costo estimado solo puede establecerse para servicios en estado 'Aprobado'."
+        valores["costo_estimado"] = cambio.costo_estimado
+    return valores, None
+
+
+def actualizar_en_lote(db: Session, cambios: List[ServicioCambio]):
+    """
+    Aplica `cambios` en una transacción y hace commit. Los cambios rechazados no
+    impiden aplicar el resto. Devuelve (resultados en el orden de `cambios`, ids de
+    las solicitudes modificadas).
+    """
+    ids = {cambio.id_servicio for cambio in cambios}
+    # FOR UPDATE: los estados leídos deciden las reglas y los contadores.
+    actuales = {
+        fila.id_servicio: fila
+        for fila in db.execute(
+            select(Servicio.id_servicio, Servicio.id_solicitud, Servicio.estado_servicio, Servicio.version)
+            .where(Servicio.id_servicio.in_(ids))
+            .with_for_update()
+        )
+    }
+
+    resultados = []
+    vistos = set()
+    # Forma del cambio (columnas escritas) -> parámetros del executemany.
+    por_forma: Dict[tuple, list] = defaultdict(list)
+    deltas: Dict[int, Counter] = defaultdict(Counter)
+    reabiertos = set()
+    for cambio in cambios:
+        id_servicio = cambio.id_servicio
+        actual = actuales.get(id_servicio)
+        if actual is None:
+            resultados.append({"id_servicio": id_servicio, "resultado": "no_encontrado", "detalle": "Servicio no encontrado"})
+            continue
+        if cambio.version is not None and cambio.version != actual.version:
+            resultados.append({"id_servicio": id_servicio, "resultado": "conflicto", "detalle": "El servicio fue modificado por otra operación."})
+            continue
+        if id_servicio in vistos:
+            resultados.append({"id_servicio": id_servicio, "resultado": "rechazado", "detalle": "Servicio repetido en el lote."})
+            continue
+        valores, motivo = _valores(cambio, actual.estado_servicio)
+        if motivo is not None:
+            resultados.append({"id_servicio": id_servicio, "resultado": "rechazado", "detalle": motivo})
+            continue
+        if not valores:
+            resultados.append({"id_servicio": id_servicio, "resultado": "omitido", "detalle": "Sin cambios."})
+            continue
+        vistos.add(id_servicio)
+        por_forma[tuple(sorted(valores))].append({"b_id": id_servicio, **{f"b_{c}": v for c, v in valores.items()}})
+        nuevo = valores.get("estado_servicio", actual.estado_servicio)
+        if nuevo != actual.estado_servicio:
+            deltas[actual.id_solicitud][actual.estado_servicio] -= 1
+            deltas[actual.id_solicitud][nuevo] += 1
+            if nuevo == EstadoServicio.PENDIENTE:
+                reabiertos.add(id_servicio)
+        resultados.append({"id_servicio": id_servicio, "resultado": "actualizado", "detalle": None})
+
+    tabla = Servicio.__table__
+    for columnas, parametros in por_forma.items():
+        sentencia = (
+            update(tabla)
+            .where(tabla.c.id_servicio == bindparam("b_id"))
+            .values({**{columna: bindparam(f"b_{columna}") for columna in columnas}, "version": tabla.c.version + 1})
+        )
+        db.execute(sentencia, parametros)
+
+    solicitudes = sorted({actuales[id_servicio].id_solicitud for id_servicio in vistos})
+    contadores.ajustar_varias(db, deltas)
+    if reabiertos:
+        procesamiento.reabrir_ventana(db, Servicio.id_servicio.in_(reabiertos))
+    if solicitudes:
+        estadisticas.marcar(db, Solicitud.id.in_(solicitudes))
+        eventos.servicios(db, "servicio.actualizado", Servicio.id_servicio.in_(vistos))
+    db.commit()
+    return resultados, solicitudes
@@ -0,0 +1,289 @@
+# app/services/solicitudes.py
+"""Construcción de las consultas de lectura de solicitudes compartidas por varios endpoints."""
+import base64
+import enum
+import json
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import ConfigDict, TypeAdapter, create_model
+from sqlalchemy import select, tuple_, union_all
+from sqlalchemy.orm import Session, aliased, load_only, selectinload
+
+from app.models.archivo import ServicioArchivado, SolicitudArchivada
+from app.models.servicio import Servicio
+from app.models.solicitud import Solicitud
+from app.schemas.servicio import ServicioOut
+from app.schemas.solicitud import CAMPOS_SOLICITUD_OUT, SolicitudOut
+from app.services import busqueda
+from app.services.explain import Explain
+
+
+def aplicar_filtros(db: Session, query, estado=None, cliente=None, fecha_desde=None, fecha_hasta=None, modelo=Solicitud):
+    """
+    Aplica los filtros del listado de solicitudes a `query` (Query o Select) sobre las
+    columnas de `modelo` (`Solicitud` o `SolicitudArchivada`).
+
+    El filtro de cliente (subcadena) se resuelve con el índice de texto del motor
+    (ver `app/services/busqueda.py`).
+
+    Las fechas se comparan como rango semiabierto sobre la columna sin envolver,
+    de modo que `ix_solicitudes_estado_fecha_solicitud` / `ix_solicitudes_fecha_solicitud`
+    siguen siendo utilizables.
+    """
+    if estado:
+        query = query.filter(modelo.estado == estado)
+    if cliente:
+        query = query.filter(busqueda.filtro_cliente(db, cliente, modelo))
+    if fecha_desde:
+        query = query.filter(modelo.fecha_solicitud >= fecha_desde)
+    if fecha_hasta:
+        query = query.filter(modelo.fecha_solicitud < (fecha_hasta + timedelta(days=1)))
+    return query
+
+
+# Columnas de cada elemento de `content` en el listado: todas las de la tabla.
+COLUMNAS_LISTADO = tuple(columna.name for columna in Solicitud.__table__.columns)
+
+
+def consulta_listado(db: Session, incluir_archivadas: bool, estado=None, cliente=None, fecha_desde=None, fecha_hasta=None):
+    """
+    Query filtrada del listado y la entidad sobre la que ordenar y paginar. La query
+    ya proyecta `COLUMNAS_LISTADO`: devuelve filas, no entidades.
+
+    Por defecto solo recorre `solicitudes` (el conjunto caliente). Con
+    `incluir_archivadas` filtra cada tabla por separado, para que cada una use sus
+    índices, y une ambas con UNION ALL (los ids no se repiten entre ellas); la entidad
+    devuelta es `Solicitud` sobre esa unión.
+    """
+    if incluir_archivadas:
+        partes = [
+            aplicar_filtros(db, select(*(getattr(modelo, columna) for columna in COLUMNAS_LISTADO)), estado, cliente, fecha_desde, fecha_hasta, modelo)
+            for modelo in (Solicitud, SolicitudArchivada)
+        ]
+        entidad = aliased(Solicitud, union_all(*partes).subquery("solicitudes_con_archivo"))
+    else:
+        entidad = Solicitud
+    query = db.query(*(getattr(entidad, columna) for columna in COLUMNAS_LISTADO))
+    if entidad is Solicitud:
+        query = aplicar_filtros(db, query, estado, cliente, fecha_desde, fecha_hasta)
+    return query, entidad
+
+
+ORDEN_RELEVANCIA = "relevancia"
+
+
+def columna_orden(ordenar_por: str, modelo=Solicitud):
+    """Devuelve la columna de `modelo` por la que ordenar, o None si no es una columna."""
+    if ordenar_por in Solicitud.__table__.columns:
+        return getattr(modelo, ordenar_por)
+    return None
+
+
+def ordenar(db: Session, query, ordenar_por: str, orden: str, cliente: Optional[str] = None, modelo=Solicitud):
+    """
+    Ordena por la columna `ordenar_por`. Con `ordenar_por="relevancia"` y un filtro de
+    cliente, ordena por similitud con el texto buscado ("mejores coincidencias").
+    """
+    if ordenar_por == ORDEN_RELEVANCIA and cliente:
+        return busqueda.ordenar_por_relevancia(db, query, cliente, modelo)
+    columna = columna_orden(ordenar_por, modelo)
+    if columna is not None:
+        query = query.order_by(columna.desc() if orden == "desc" else columna.asc())
+    return query
+
+
+# --- Paginación por cursor (keyset) -------------------------------------------------
+
+# Columnas admitidas como `ordenar_por` en modo cursor. Todas reciben valor al
+# insertar, por lo que la comparación por tuplas nunca encuentra NULL.
+COLUMNAS_CURSOR = ("id", "cliente", "email_cliente", "fecha_solicitud", "estado", "fecha_ultima_modificacion")
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no se puede decodificar o no corresponde al orden pedido."""
+
+
+def _valor_a_json(valor):
+    if isinstance(valor, datetime):
+        return {"t": "dt", "v": valor.isoformat()}
+    if isinstance(valor, enum.Enum):
+        return {"t": "enum", "v": valor.value}
+    return {"t": "raw", "v": valor}
+
+
+def _valor_desde_json(columna, dato):
+    tipo, valor = dato["t"], dato["v"]
+    if tipo == "dt":
+        return datetime.fromisoformat(valor)
+    if tipo == "enum":
+        return columna.type.enum_class(valor)
+    return valor
+
+
+def codificar_cursor(ordenar_por: str, orden: str, fila) -> str:
+    """Token opaco con el valor de ordenamiento y el id de la última fila de la página."""
+    contenido = {
+        "o": ordenar_por,
+        "d": orden,
+        "v": _valor_a_json(getattr(fila, ordenar_por)),
+        "id": fila.id,
+    }
+    crudo = json.dumps(contenido, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, ordenar_por: str, orden: str):
+    """Devuelve (valor, id) del cursor, validando que se generó con el mismo orden."""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        contenido = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if contenido["o"] != ordenar_por or contenido["d"] != orden:
+            raise CursorInvalido("El cursor no corresponde al ordenamiento solicitado.")
+        return _valor_desde_json(getattr(Solicitud, ordenar_por), contenido["v"]), int(contenido["id"])
+    except CursorInvalido:
+        raise
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorInvalido("Cursor inválido.") from e
+
+
+def paginar_por_cursor(query, ordenar_por: str, orden: str, cursor: Optional[str], size: int, modelo=Solicitud):
+    """
+    Devuelve (filas, next_cursor). Ordena por (columna, id) y, si hay cursor,
+    continúa estrictamente después de la última fila entregada, de modo que cada
+    página cuesta lo mismo sin importar su profundidad. `modelo` es la entidad que
+    devuelve `consulta_listado`.
+    """
+    if ordenar_por not in COLUMNAS_CURSOR:
+        raise CursorInvalido(f"En modo cursor 'ordenar_por' debe ser uno de: {', '.join(COLUMNAS_CURSOR)}.")
+    columna = getattr(modelo, ordenar_por)
+    descendente = orden == "desc"
+
+    if cursor:
+        valor, ultimo_id = decodificar_cursor(cursor, ordenar_por, orden)
+        if ordenar_por == "id":
+            query = query.filter(modelo.id < ultimo_id if descendente else modelo.id > ultimo_id)
+        else:
+            clave = tuple_(columna, modelo.id)
+            query = query.filter(clave < (valor, ultimo_id) if descendente else clave > (valor, ultimo_id))
+
+    if ordenar_por == "id":
+        query = query.order_by(modelo.id.desc() if descendente else modelo.id.asc())
+    elif descendente:
+        query = query.order_by(columna.desc(), modelo.id.desc())
+    else:
+        query = query.order_by(columna.asc(), modelo.id.asc())
+
+    # Se pide una fila de más para saber si existe una página siguiente.
+    filas = query.limit(size + 1).all()
+    if len(filas) <= size:
+        return filas, None
+    filas = filas[:size]
+    return filas, codificar_cursor(ordenar_por, orden, filas[-1])
+
+
+def estimar_total(db: Session, query) -> Optional[int]:
+    """
+    Total aproximado de filas de `query` según el planificador de PostgreSQL
+    (sin ejecutar el COUNT). En otros motores devuelve None.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    plan = db.execute(Explain(query.order_by(None).statement, formato_json=True)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def contar(db: Session, query, modo: str):
+    """
+    Devuelve (total, exacto) según `modo`: 'exacto' ejecuta COUNT, 'estimado' usa la
+    estimación del planificador (o COUNT si el motor no la ofrece) y 'ninguno' omite el total.
+    """
+    if modo == "ninguno":
+        return None, False
+    if modo == "estimado":
+        estimado = estimar_total(db, query)
+        if estimado is not None:
+            return estimado, False
+    return query.order_by(None).count(), True
+
+
+# --- Detalle -------------------------------------------------------------------------
+
+CAMPOS_SERVICIO_OUT = tuple(ServicioOut.model_fields)
+
+
+def detalle(db: Session, id_solicitud: int, archivada: bool = False) -> Optional[dict]:
+    """
+    La solicitud `id_solicitud` con sus servicios, como dict con la forma de
+    SolicitudOut, o None si no existe. Una sola consulta (LEFT JOIN) que lee solo las
+    columnas de la respuesta; con `archivada` lee las tablas del archivo.
+    """
+    modelo, modelo_servicio = (SolicitudArchivada, ServicioArchivado) if archivada else (Solicitud, Servicio)
+    campos = [campo for campo in CAMPOS_SOLICITUD_OUT if campo != "servicios"]
+    filas = db.execute(
+        select(
+            *(getattr(modelo, campo) for campo in campos),
+            *(getattr(modelo_servicio, campo).label(f"servicio_{campo}") for campo in CAMPOS_SERVICIO_OUT),
+        )
+        .select_from(modelo)
+        .outerjoin(modelo_servicio, modelo_servicio.id_solicitud == modelo.id)
+        .where(modelo.id == id_solicitud)
+        .order_by(modelo_servicio.id_servicio)
+    ).all()
+    if not filas:
+        return None
+    solicitud = {campo: getattr(filas[0], campo) for campo in campos}
+    solicitud["servicios"] = [
+        {campo: getattr(fila, f"servicio_{campo}") for campo in CAMPOS_SERVICIO_OUT}
+        for fila in filas
+        if fila.servicio_id_servicio is not None
+    ]
+    return solicitud
+
+
+# --- Lectura por lote ---------------------------------------------------------------
+
+
+def _normalizar_campos(campos: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """Campos pedidos en el orden de SolicitudOut, siempre con 'id'."""
+    if campos is None:
+        return CAMPOS_SOLICITUD_OUT
+    pedidos = set(campos) | {"id"}
+    return tuple(campo for campo in CAMPOS_SOLICITUD_OUT if campo in pedidos)
+
+
+@lru_cache(maxsize=64)
+def adaptador_lista(campos: Tuple[str, ...]) -> TypeAdapter:
+    """TypeAdapter de una lista de SolicitudOut reducido a `campos`."""
+    if campos == CAMPOS_SOLICITUD_OUT:
+        return TypeAdapter(List[SolicitudOut])
+    parcial = create_model(
+        "SolicitudParcial",
+        __config__=ConfigDict(from_attributes=True, use_enum_values=True),
+        **{campo: (SolicitudOut.model_fields[campo].annotation, ...) for campo in campos},
+    )
+    return TypeAdapter(List[parcial])
+
+
+def cargar_por_ids(db: Session, ids: Sequence[int], campos: Optional[Iterable[str]] = None):
+    """
+    Carga las solicitudes `ids` con una consulta IN (más una de `selectinload` para los
+    servicios, solo si se piden) y solo las columnas de `campos`.
+    Devuelve (JSON de la lista en el orden de `ids`, ids inexistentes).
+    """
+    campos = _normalizar_campos(campos)
+    unicos = list(dict.fromkeys(ids))
+    columnas = [getattr(Solicitud, campo) for campo in campos if campo != "servicios"]
+    consulta = select(Solicitud).where(Solicitud.id.in_(unicos)).options(load_only(*columnas))
+    if "servicios" in campos:
+        consulta = consulta.options(selectinload(Solicitud.servicios))
+    encontradas = {solicitud.id: solicitud for solicitud in db.execute(consulta).scalars()}
+
+    adaptador = adaptador_lista(campos)
+    ordenadas = [encontradas[id_solicitud] for id_solicitud in unicos if id_solicitud in encontradas]
+    contenido = adaptador.dump_json(adaptador.validate_python(ordenadas, from_attributes=True))
+    faltantes = [id_solicitud for id_solicitud in unicos if id_solicitud not in encontradas]
+    return contenido, faltantes
@@ -0,0 +1,110 @@
+"""
+Prueba de carga: compara el modo síncrono (threadpool) y el asíncrono (AsyncSession)
+de la API sobre la misma base de datos.
+
+Siembra la base si está vacía, levanta uvicorn una vez por modo con DB_MODO_ASYNC
+y la caché de respuestas desactivada (para que cada request llegue a la base) y
+lanza `--concurrencia` clientes durante `--duracion` segundos con una mezcla de
+lecturas: detalle de solicitud, servicios de una solicitud y listado filtrado.
+
+Uso:
+    python -m benchmarks.carga                                   # SQLite temporal
+    DATABASE_URL=postgresql://... python -m benchmarks.carga --concurrencia 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/carga.db"
+
+import httpx  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from benchmarks.comun import percentil, servidor_uvicorn  # noqa: E402
+from benchmarks.generador import generar  # noqa: E402
+
+MODOS = ("sync", "async")
+
+
+def _rutas(azar: random.Random, cantidad: int):
+    """Mezcla de lecturas calientes; siempre la misma secuencia para una semilla dada."""
+    while True:
+        id_solicitud = azar.randint(1, cantidad)
+        eleccion = azar.random()
+        if eleccion < 0.5:
+            yield f"/api/solicitudes/{id_solicitud}"
+        elif eleccion < 0.8:
+            yield f"/api/solicitudes/{id_solicitud}/servicios"
+        else:
+            yield "/api/solicitudes/?estado=Abierta&ordenar_por=fecha_solicitud&size=20&total=ninguno"
+
+
+async def _medir(url: str, concurrencia: int, duracion: float, cantidad: int, semilla: int) -> dict:
+    latencias = []
+    errores = 0
+    fin = time.monotonic() + duracion
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60) as cliente:
+        async def trabajador(numero: int):
+            nonlocal errores
+            rutas = _rutas(random.Random(semilla + numero), cantidad)
+            while time.monotonic() < fin:
+                inicio = time.perf_counter()
+                try:
+                    respuesta = await cliente.get(next(rutas))
+                    if respuesta.status_code >= 500:
+                        errores += 1
+                except httpx.HTTPError:
+                    errores += 1
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador(i) for i in range(concurrencia)))
+        transcurrido = time.perf_counter() - inicio
+
+    return {
+        "requests": len(latencias),
+        "errores": errores,
+        "req_s": round(len(latencias) / transcurrido, 1),
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+    }
+
+
+def ejecutar_modo(modo: str, args) -> dict:
+    with servidor_uvicorn(DB_MODO_ASYNC=str(modo == "async").lower(), CACHE_ACTIVA="false") as url:
+        async def correr():
+            # Calentamiento: conexiones del pool y cachés de sentencias.
+            await _medir(url, args.concurrencia, min(2.0, args.duracion), args.solicitudes, args.semilla)
+            return await _medir(url, args.concurrencia, args.duracion, args.solicitudes, args.semilla)
+
+        return asyncio.run(correr())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--solicitudes", type=int, default=5000, help="Solicitudes a sembrar si la base está vacía.")
+    parser.add_argument("--concurrencia", type=int, default=100, help="Clientes simultáneos.")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de medición por modo.")
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS))
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    generar(engine, args.solicitudes, semilla=args.semilla)
+
+    print(f"base: {engine.url.render_as_string(hide_password=True)}  concurrencia: {args.concurrencia}  duración: {args.duracion}s")
+    print(f"{'modo':<6} {'requests':>9} {'errores':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for modo in args.modos:
+        r = ejecutar_modo(modo, args)
+        print(f"{modo:<6} {r['requests']:>9} {r['errores']:>8} {r['req_s']:>9} {r['p50_ms']:>9} {r['p99_ms']:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
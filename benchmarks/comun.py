@@ -0,0 +1,55 @@
+"""Utilidades compartidas por los benchmarks: servidor uvicorn en subproceso y percentiles."""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import httpx
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentil(valores, p: float) -> float:
+    """Percentil `p` (0-100) por el método del rango más cercano."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def esperar_servidor(url: str, proceso: subprocess.Popen, limite: float = 30.0) -> None:
+    inicio = time.monotonic()
+    async with httpx.AsyncClient() as cliente:
+        while time.monotonic() - inicio < limite:
+            if proceso.poll() is not None:
+                raise RuntimeError("uvicorn terminó antes de aceptar conexiones")
+            try:
+                await cliente.get(f"{url}/internal/cache")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn no respondió a tiempo")
+
+
+@contextmanager
+def servidor_uvicorn(**entorno):
+    """Levanta `app.main:app` en un puerto libre con las variables de entorno dadas; devuelve su URL."""
+    puerto = puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(puerto), "--log-level", "warning"],
+        env=dict(os.environ, **entorno),
+    )
+    url = f"http://127.0.0.1:{puerto}"
+    try:
+        asyncio.run(esperar_servidor(url, proceso))
+        yield url
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
@@ -0,0 +1,180 @@
+"""
+Generador reproducible de datos sintéticos para `solicitudes` y `servicios`.
+
+Con la misma semilla y cantidad produce las mismas filas (ids incluidos), con
+fechas relativas al día en que se ejecuta.
+Las distribuciones imitan la producción:
+- estados de solicitud sesgados hacia cerradas;
+- fechas concentradas en los últimos meses;
+- pocos clientes con muchas solicitudes (distribución de Zipf aproximada);
+- de 1 a 4 servicios por solicitud, con estados coherentes con los de la solicitud.
+
+Inserta por lotes con INSERT multi-fila y un commit por lote, así que la memoria no
+depende de la escala (de 10 mil a 10 millones de solicitudes).
+
+Uso:
+    python -m benchmarks.generador --solicitudes 1000000
+    DATABASE_URL=postgresql://localhost/bench python -m benchmarks.generador --solicitudes 10000000 --recrear
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import unicodedata
+from datetime import datetime, timedelta
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+
+from sqlalchemy import func, insert, select, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database import Base, engine as motor_por_defecto  # noqa: E402
+from app.models import archivo, estadistica, evento, idempotencia, tarea  # noqa: E402,F401  (registra las tablas en Base.metadata)
+from app.models.servicio import EstadoServicio, Servicio  # noqa: E402
+from app.models.solicitud import EstadoSolicitud, Solicitud  # noqa: E402
+from app.services import contadores, estadisticas  # noqa: E402
+
+TAMANO_LOTE = 10000
+
+PESOS_ESTADO_SOLICITUD = {
+    EstadoSolicitud.ABIERTA: 0.30,
+    EstadoSolicitud.EN_PROCESO: 0.20,
+    EstadoSolicitud.CERRADA: 0.40,
+    EstadoSolicitud.CANCELADA: 0.10,
+}
+
+# Estados posibles de los servicios según el estado de su solicitud.
+PESOS_ESTADO_SERVICIO = {
+    EstadoSolicitud.ABIERTA: {EstadoServicio.PENDIENTE: 0.8, EstadoServicio.APROBADO: 0.2},
+    EstadoSolicitud.EN_PROCESO: {EstadoServicio.PENDIENTE: 0.5, EstadoServicio.APROBADO: 0.3, EstadoServicio.RECHAZADO: 0.2},
+    EstadoSolicitud.CERRADA: {EstadoServicio.APROBADO: 0.5, EstadoServicio.RECHAZADO: 0.2, EstadoServicio.VENCIDO: 0.3},
+    EstadoSolicitud.CANCELADA: {EstadoServicio.RECHAZADO: 0.6, EstadoServicio.PENDIENTE: 0.4},
+}
+
+PESOS_CANTIDAD_SERVICIOS = {1: 0.35, 2: 0.35, 3: 0.20, 4: 0.10}
+
+NOMBRES_SERVICIO = (
+    "Estudio de suelos", "Diseño estructural", "Interventoría", "Topografía",
+    "Diseño hidrosanitario", "Diseño eléctrico", "Estudio de impacto ambiental", "Avalúo técnico",
+)
+
+_PREFIJOS = ("Constructora", "Ingeniería", "Inversiones", "Consultores", "Grupo", "Desarrollos", "Proyectos", "Obras")
+_NUCLEOS = ("Andes", "Pacífico", "Caribe", "Orinoco", "Magdalena", "Cauca", "Sabana", "Llanos", "Altiplano", "Nevado",
+            "Cordillera", "Valle", "Bahía", "Meseta", "Sierra", "Laguna")
+_SUFIJOS = ("SAS", "Ltda", "S.A.", "& Cía", "Asociados", "")
+
+
+def _elegir(azar: random.Random, pesos: dict):
+    return azar.choices(list(pesos), weights=list(pesos.values()))[0]
+
+
+def nombres_clientes(cantidad: int, semilla: int) -> list:
+    """`cantidad` nombres de empresa distintos y deterministas."""
+    azar = random.Random(semilla)
+    nombres = []
+    vistos = set()
+    while len(nombres) < cantidad:
+        nombre = " ".join(p for p in (azar.choice(_PREFIJOS), azar.choice(_NUCLEOS), azar.choice(_SUFIJOS)) if p)
+        if nombre in vistos:
+            nombre = f"{nombre} {len(nombres)}"
+        vistos.add(nombre)
+        nombres.append(nombre)
+    return nombres
+
+
+def _dominio(cliente: str) -> str:
+    nucleo = unicodedata.normalize("NFKD", cliente.split()[1]).encode("ascii", "ignore").decode()
+    return f"{nucleo.lower()}.example.com"
+
+
+def _filas_lote(azar: random.Random, desde: int, hasta: int, clientes: list, ahora: datetime):
+    solicitudes = []
+    servicios = []
+    for id_solicitud in range(desde, hasta):
+        # Zipf aproximado: unos pocos clientes concentran la mayoría de solicitudes.
+        cliente = clientes[int(len(clientes) * azar.random() ** 3)]
+        estado = _elegir(azar, PESOS_ESTADO_SOLICITUD)
+        # Antigüedad exponencial (media de 90 días, máximo 3 años).
+        fecha_solicitud = ahora - timedelta(days=min(azar.expovariate(1 / 90), 3 * 365))
+        solicitudes.append(
+            {
+                "id": id_solicitud,
+                "cliente": cliente,
+                "email_cliente": f"contacto{id_solicitud % 997}@{_dominio(cliente)}",
+                "fecha_solicitud": fecha_solicitud,
+                "estado": estado,
+                "observaciones": None if azar.random() < 0.7 else "Requiere visita técnica.",
+                "fecha_ultima_modificacion": min(fecha_solicitud + timedelta(days=azar.random() * 10), ahora),
+            }
+        )
+        estados = []
+        for _ in range(_elegir(azar, PESOS_CANTIDAD_SERVICIOS)):
+            estado_servicio = _elegir(azar, PESOS_ESTADO_SERVICIO[estado])
+            estados.append(estado_servicio)
+            servicios.append(
+                {
+                    "id_solicitud": id_solicitud,
+                    "nombre_servicio": azar.choice(NOMBRES_SERVICIO),
+                    "fecha_reunion": fecha_solicitud + timedelta(days=1 + azar.random() * 60),
+                    "estado_servicio": estado_servicio,
+                    "comentarios": None,
+                    "costo_estimado": round(azar.uniform(500, 50000), 2) if estado_servicio == EstadoServicio.APROBADO else None,
+                }
+            )
+        solicitudes[-1].update(contadores.iniciales(estados))
+    return solicitudes, servicios
+
+
+def generar(motor=None, solicitudes: int = 10000, semilla: int = 42, tamano_lote: int = TAMANO_LOTE, recrear: bool = False) -> int:
+    """
+    Crea el esquema y siembra `solicitudes` solicitudes si la base está vacía (o si
+    `recrear`, que antes borra todo). Devuelve las solicitudes insertadas.
+    """
+    motor = motor or motor_por_defecto
+    if recrear:
+        Base.metadata.drop_all(bind=motor)
+    Base.metadata.create_all(bind=motor)
+    with motor.connect() as conexion:
+        if conexion.execute(select(func.count()).select_from(Solicitud)).scalar_one():
+            return 0
+
+    azar = random.Random(semilla)
+    clientes = nombres_clientes(max(50, solicitudes // 20), semilla)
+    # Las fechas son relativas al día de hoy (no al instante) para que las filas sean
+    # las mismas durante el día y los servicios de solicitudes abiertas sigan en el futuro.
+    ahora = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    for desde in range(1, solicitudes + 1, tamano_lote):
+        filas_solicitud, filas_servicio = _filas_lote(azar, desde, min(desde + tamano_lote, solicitudes + 1), clientes, ahora)
+        with motor.begin() as conexion:
+            conexion.execute(insert(Solicitud), filas_solicitud)
+            conexion.execute(insert(Servicio), filas_servicio)
+    # La siembra escribe sin pasar por la API: el resumen de estadísticas se arma entero.
+    with Session(motor) as db:
+        estadisticas.reconstruir(db)
+    with motor.begin() as conexion:
+        conexion.execute(text("ANALYZE"))
+    return solicitudes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--solicitudes", type=int, default=10000)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--tamano-lote", type=int, default=TAMANO_LOTE)
+    parser.add_argument("--recrear", action="store_true", help="Borra las tablas antes de sembrar.")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    insertadas = generar(solicitudes=args.solicitudes, semilla=args.semilla, tamano_lote=args.tamano_lote, recrear=args.recrear)
+    if not insertadas:
+        print("La base ya tiene datos; use --recrear para regenerarlos.")
+        return 0
+    print(f"{insertadas} solicitudes en {time.perf_counter() - inicio:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
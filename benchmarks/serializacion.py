@@ -0,0 +1,118 @@
+"""
+Micro-benchmark del costo de serializar por fila las respuestas de lectura.
+
+Compara, sobre las mismas filas, el camino anterior y el actual de cada ruta:
+- listado: entidades ORM + `jsonable_encoder` + `json.dumps` (lo que hacía FastAPI con
+  el dict devuelto) frente a columnas proyectadas + `Row._asdict` + orjson;
+- detalle: entidad con `joinedload` validada con `SolicitudOut` (from_attributes) y
+  `model_dump_json` frente a `solicitudes.detalle` + orjson.
+
+Cada caso incluye la consulta, porque materializar entidades es parte del costo que
+se evita. Reporta microsegundos por fila (mediana de `--repeticiones`) y verifica que
+ambos caminos producen el mismo JSON.
+
+Uso:
+    python -m benchmarks.serializacion --solicitudes 20000
+    DATABASE_URL=postgresql://localhost/bench python -m benchmarks.serializacion --filas 1000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.orm import Session, joinedload  # noqa: E402
+
+from app import serializacion  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.models.solicitud import Solicitud  # noqa: E402
+from app.schemas.solicitud import SolicitudOut  # noqa: E402
+from app.services import solicitudes as servicio_solicitudes  # noqa: E402
+from benchmarks.generador import generar  # noqa: E402
+
+
+def _medir(funcion, filas: int, repeticiones: int) -> float:
+    """Mediana en microsegundos por fila de `repeticiones` llamadas a `funcion`."""
+    funcion()  # calentamiento (cachés de compilación de SQLAlchemy y de Pydantic)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) / filas * 1e6
+
+
+def casos(db: Session, filas: int, ids: list):
+    """(nombre, filas por llamada, camino anterior, camino actual)."""
+
+    def listado_anterior():
+        entidades = db.query(Solicitud).order_by(Solicitud.id).limit(filas).all()
+        contenido = json.dumps(jsonable_encoder({"content": entidades}), ensure_ascii=False).encode()
+        db.expunge_all()
+        return contenido
+
+    def listado_actual():
+        query, _ = servicio_solicitudes.consulta_listado(db, False)
+        return serializacion.a_json({"content": serializacion.filas_a_dicts(query.order_by(Solicitud.id).limit(filas).all())})
+
+    def detalle_anterior():
+        partes = []
+        for id_solicitud in ids:
+            solicitud = db.query(Solicitud).options(joinedload(Solicitud.servicios)).filter(Solicitud.id == id_solicitud).first()
+            partes.append(SolicitudOut.model_validate(solicitud, from_attributes=True).model_dump_json().encode())
+        db.expunge_all()
+        return partes
+
+    def detalle_actual():
+        return [serializacion.a_json(servicio_solicitudes.detalle(db, id_solicitud)) for id_solicitud in ids]
+
+    return [
+        ("listado", filas, listado_anterior, listado_actual),
+        ("detalle", len(ids), detalle_anterior, detalle_actual),
+    ]
+
+
+def _mismo_json(anterior, actual) -> bool:
+    if isinstance(anterior, list):
+        return all(_mismo_json(a, b) for a, b in zip(anterior, actual)) and len(anterior) == len(actual)
+    anterior, actual = json.loads(anterior), json.loads(actual)
+    # El joinedload no ordena los servicios; `detalle` los devuelve por id.
+    if isinstance(anterior, dict) and "servicios" in anterior:
+        anterior["servicios"].sort(key=lambda servicio: servicio["id_servicio"])
+    return anterior == actual
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--solicitudes", type=int, default=20000, help="Solicitudes a sembrar si la base está vacía.")
+    parser.add_argument("--filas", type=int, default=5000, help="Filas del listado por llamada.")
+    parser.add_argument("--detalles", type=int, default=500, help="Solicitudes leídas por llamada en el caso detalle.")
+    parser.add_argument("--repeticiones", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    generar(solicitudes=args.solicitudes)
+    with Session(engine) as db:
+        total = db.execute(select(func.count()).select_from(Solicitud)).scalar_one()
+        filas = min(args.filas, total)
+        ids = db.execute(select(Solicitud.id).order_by(Solicitud.id).limit(args.detalles)).scalars().all()
+        print(f"{total} solicitudes en {engine.url.get_backend_name()}; listado de {filas} filas, {len(ids)} detalles\n")
+        print(f"{'caso':<10}{'anterior µs/fila':>18}{'actual µs/fila':>16}{'mejora':>9}")
+        for nombre, por_llamada, anterior, actual in casos(db, filas, ids):
+            if not _mismo_json(anterior(), actual()):
+                print(f"{nombre}: los dos caminos producen JSON distinto")
+                return 1
+            antes = _medir(anterior, por_llamada, args.repeticiones)
+            ahora = _medir(actual, por_llamada, args.repeticiones)
+            print(f"{nombre:<10}{antes:>18.1f}{ahora:>16.1f}{antes / ahora:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+"""
+Suite reproducible de benchmarks de los endpoints de la API.
+
+Siembra la base con `benchmarks.generador` si está vacía y recorre todas las rutas.
+Cada ruta es un escenario que se ejecuta durante `--duracion` segundos con
+`--concurrencia` clientes. Hay dos drivers:
+- `inproceso`: httpx sobre ASGI, sin red;
+- `socket`: uvicorn en un subproceso y httpx por TCP.
+
+Por escenario reporta throughput, latencias p50/p95/p99 y consultas SQL por request.
+Las consultas se leen de la cabecera Server-Timing (ver `app/instrumentacion.py`).
+El resultado se escribe en JSON. Con `--comparar` se contrasta contra una línea base
+guardada; si hay regresiones el proceso termina con código 1.
+
+Los escenarios de escritura modifican la base: para comparar corridas entre sí
+regenere los datos con `--recrear` y use la misma semilla.
+
+Uso:
+    python -m benchmarks.suite --solicitudes 100000 --salida base.json
+    python -m benchmarks.suite --solicitudes 100000 --recrear --comparar base.json
+    DATABASE_URL=postgresql://localhost/bench python -m benchmarks.suite --driver socket
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+import httpx
+
+from benchmarks.comun import percentil, servidor_uvicorn
+
+_RE_SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="(\d+) consultas"')
+
+# Métricas comparadas contra la línea base: (nombre, True si más alto es mejor).
+METRICAS_COMPARADAS = (("req_s", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("consultas_por_request", False))
+# Las consultas por request son un promedio (p. ej. con respuestas 404 mezcladas): se
+# ignoran variaciones menores a esta cantidad absoluta.
+TOLERANCIA_CONSULTAS = 0.05
+
+
+class Contexto:
+    """Ids y valores reales de la base con los que se arman las peticiones."""
+
+    def __init__(self, motor, semilla: int):
+        from sqlalchemy import func, select
+
+        from app.models.servicio import EstadoServicio, Servicio
+        from app.models.solicitud import EstadoSolicitud, Solicitud
+
+        azar = random.Random(semilla)
+
+        def muestra(consulta, limite=5000):
+            filas = list(conexion.execute(consulta.limit(limite)).scalars())
+            azar.shuffle(filas)
+            return filas
+
+        with motor.connect() as conexion:
+            self.id_maximo = conexion.execute(select(func.max(Solicitud.id))).scalar_one() or 0
+            self.total = conexion.execute(select(func.count()).select_from(Solicitud)).scalar_one()
+            self.clientes = muestra(select(Solicitud.cliente).distinct(), 500)
+            con_pendientes = (
+                select(Servicio.id_solicitud)
+                .join(Solicitud, Solicitud.id == Servicio.id_solicitud)
+                .where(Servicio.estado_servicio == EstadoServicio.PENDIENTE)
+            )
+            # Conjuntos disjuntos por estado de solicitud, para que un escenario no
+            # borre lo que otro necesita.
+            self.abiertas = muestra(con_pendientes.where(Solicitud.estado == EstadoSolicitud.ABIERTA).distinct())
+            self.servicios_actualizables = muestra(
+                select(Servicio.id_servicio)
+                .join(Solicitud, Solicitud.id == Servicio.id_solicitud)
+                .where(Solicitud.estado == EstadoSolicitud.EN_PROCESO, Servicio.estado_servicio == EstadoServicio.PENDIENTE)
+            )
+            self.servicios_eliminables = muestra(
+                select(Servicio.id_servicio)
+                .join(Solicitud, Solicitud.id == Servicio.id_solicitud)
+                .where(Solicitud.estado == EstadoSolicitud.CERRADA, Servicio.estado_servicio != EstadoServicio.APROBADO)
+            )
+            con_aprobados = select(Servicio.id_solicitud).where(Servicio.estado_servicio == EstadoServicio.APROBADO)
+            self.solicitudes_eliminables = muestra(
+                select(Solicitud.id).where(Solicitud.estado == EstadoSolicitud.CANCELADA, Solicitud.id.notin_(con_aprobados))
+            )
+
+    def id_solicitud(self, azar: random.Random) -> int:
+        return azar.randint(1, max(self.id_maximo, 1))
+
+
+@dataclass
+class Escenario:
+    nombre: str
+    # Devuelve (método, url, kwargs de httpx) o None cuando se agotan los datos del escenario.
+    peticion: Callable[[Contexto, random.Random], Optional[tuple]]
+    esperados: frozenset = frozenset({200})
+    concurrencia: Optional[int] = None
+    max_peticiones: Optional[int] = None
+
+
+def _futuro(dias: int = 30) -> str:
+    return (datetime.utcnow() + timedelta(days=dias)).isoformat()
+
+
+def _nueva_solicitud(azar: random.Random, contexto: Contexto) -> dict:
+    return {
+        "cliente": azar.choice(contexto.clientes) if contexto.clientes else "Cliente benchmark",
+        "email_cliente": "benchmark@example.com",
+        "servicios": [
+            {"nombre_servicio": "Estudio de suelos", "fecha_reunion": _futuro(azar.randint(1, 60))}
+            for _ in range(azar.randint(1, 3))
+        ],
+    }
+
+
+def _tomar(lista: list):
+    return lista.pop() if lista else None
+
+
+def _ndjson(azar: random.Random, contexto: Contexto, cantidad: int = 100) -> bytes:
+    return b"".join(json.dumps(_nueva_solicitud(azar, contexto)).encode() + b"\n" for _ in range(cantidad))
+
+
+def _con_id(plantilla: str, ids: list, metodo: str, **kwargs):
+    def peticion(contexto, azar):
+        identificador = _tomar(getattr(contexto, ids)) if metodo == "DELETE" else azar.choice(getattr(contexto, ids) or [None])
+        if identificador is None:
+            return None
+        return metodo, plantilla.format(id=identificador), kwargs
+    return peticion
+
+
+ESCENARIOS = (
+    Escenario("obtener_solicitud", lambda c, a: ("GET", f"/api/solicitudes/{c.id_solicitud(a)}", {}), frozenset({200, 404})),
+    Escenario("servicios_de_solicitud", lambda c, a: ("GET", f"/api/solicitudes/{c.id_solicitud(a)}/servicios", {}), frozenset({200, 404})),
+    Escenario(
+        "lote_solicitudes",
+        lambda c, a: ("POST", "/api/solicitudes/batch-get", {"json": {"ids": [c.id_solicitud(a) for _ in range(100)]}}),
+    ),
+    Escenario(
+        "lote_solicitudes_proyeccion",
+        lambda c, a: ("POST", "/api/solicitudes/batch-get", {"json": {"ids": [c.id_solicitud(a) for _ in range(100)], "fields": ["cliente", "estado"]}}),
+    ),
+    Escenario("listar_pagina", lambda c, a: ("GET", "/api/solicitudes/", {"params": {"page": a.randint(1, 20), "size": 20}})),
+    Escenario(
+        "listar_pagina_profunda",
+        lambda c, a: ("GET", "/api/solicitudes/", {"params": {"page": max(1, c.total // 40), "size": 20, "total": "ninguno"}}),
+    ),
+    Escenario(
+        "listar_por_estado",
+        lambda c, a: ("GET", "/api/solicitudes/", {"params": {"estado": a.choice(("Abierta", "En Proceso")), "ordenar_por": "fecha_solicitud", "orden": "desc", "size": 20}}),
+    ),
+    Escenario(
+        "listar_cursor",
+        lambda c, a: ("GET", "/api/solicitudes/", {"params": {"paginacion": "cursor", "estado": "Abierta", "ordenar_por": "fecha_solicitud", "size": 20}}),
+    ),
+    Escenario(
+        "buscar_cliente",
+        lambda c, a: ("GET", "/api/solicitudes/", {"params": {"cliente": a.choice(c.clientes).split()[1][:5], "size": 20, "total": "estimado"}}),
+    ),
+    Escenario(
+        "sugerir_clientes",
+        lambda c, a: ("GET", "/api/solicitudes/clientes/sugerencias", {"params": {"prefijo": a.choice(c.clientes)[:3]}}),
+    ),
+    Escenario("estadisticas", lambda c, a: ("GET", "/api/estadisticas", {"params": {"agrupar": a.choice(("dia", "semana", "mes"))}})),
+    Escenario(
+        "estadisticas_cliente",
+        lambda c, a: ("GET", "/api/estadisticas", {"params": {"cliente": a.choice(c.clientes), "agrupar": "mes"}}),
+    ),
+    Escenario("crear_solicitud", lambda c, a: ("POST", "/api/solicitudes/", {"json": _nueva_solicitud(a, c)}), frozenset({201})),
+    Escenario("actualizar_solicitud", _con_id("/api/solicitudes/{id}", "abiertas", "PUT", json={"observaciones": "Actualizada por benchmark"})),
+    Escenario(
+        "agregar_servicio",
+        _con_id("/api/solicitudes/{id}/servicios", "abiertas", "POST", json={"nombre_servicio": "Topografía", "fecha_reunion": _futuro()}),
+        frozenset({201}),
+    ),
+    Escenario("actualizar_servicio", _con_id("/api/servicios/{id}", "servicios_actualizables", "PUT", json={"comentarios": "Revisado"})),
+    Escenario(
+        "actualizar_servicios_lote",
+        # Reescribe el mismo estado: repetible sin agotar los servicios pendientes.
+        lambda c, a: ("PATCH", "/api/servicios/bulk", {"json": {"cambios": [
+            {"id_servicio": i, "estado_servicio": "Pendiente"} for i in a.sample(c.servicios_actualizables, min(50, len(c.servicios_actualizables)))
+        ]}}) if c.servicios_actualizables else None,
+    ),
+    Escenario("eliminar_servicio", _con_id("/api/servicios/{id}", "servicios_eliminables", "DELETE"), frozenset({204})),
+    Escenario("eliminar_solicitud", _con_id("/api/solicitudes/{id}", "solicitudes_eliminables", "DELETE"), frozenset({204})),
+    Escenario(
+        "importar_lote",
+        lambda c, a: ("POST", "/api/solicitudes/bulk", {"content": _ndjson(a, c), "headers": {"content-type": "application/x-ndjson"}}),
+        concurrencia=2,
+    ),
+    Escenario(
+        "exportar_recientes",
+        lambda c, a: ("GET", "/api/solicitudes/export", {"params": {"fecha_desde": (datetime.utcnow() - timedelta(days=3)).date().isoformat()}}),
+        concurrencia=2,
+    ),
+    Escenario("procesar_simulacion", lambda c, a: ("POST", "/api/procesar_solicitudes", {"params": {"dry_run": "true"}}), concurrencia=1),
+    Escenario("procesar", lambda c, a: ("POST", "/api/procesar_solicitudes", {}), concurrencia=1, max_peticiones=1),
+)
+
+
+async def medir_escenario(cliente: httpx.AsyncClient, escenario: Escenario, contexto: Contexto, args) -> dict:
+    concurrencia = min(escenario.concurrencia or args.concurrencia, args.concurrencia)
+    latencias, consultas, tiempos_db = [], [], []
+    errores = 0
+    estados = {}
+    restantes = escenario.max_peticiones
+    fin = time.monotonic() + args.duracion
+
+    async def trabajador(numero: int):
+        nonlocal errores, restantes
+        azar = random.Random(f"{args.semilla}:{escenario.nombre}:{numero}")
+        while time.monotonic() < fin:
+            if restantes is not None:
+                if restantes <= 0:
+                    return
+                restantes -= 1
+            peticion = escenario.peticion(contexto, azar)
+            if peticion is None:
+                return
+            metodo, url, kwargs = peticion
+            inicio = time.perf_counter()
+            respuesta = await cliente.request(metodo, url, **kwargs)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            estados[respuesta.status_code] = estados.get(respuesta.status_code, 0) + 1
+            if respuesta.status_code not in escenario.esperados:
+                errores += 1
+            coincidencia = _RE_SERVER_TIMING.search(respuesta.headers.get("server-timing", ""))
+            if coincidencia:
+                tiempos_db.append(float(coincidencia.group(1)))
+                consultas.append(int(coincidencia.group(2)))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador(i) for i in range(concurrencia)))
+    transcurrido = time.perf_counter() - inicio
+    return {
+        "requests": len(latencias),
+        "errores": errores,
+        "estados": {str(k): v for k, v in sorted(estados.items())},
+        "concurrencia": concurrencia,
+        "req_s": round(len(latencias) / transcurrido, 2) if transcurrido else 0.0,
+        "p50_ms": round(percentil(latencias, 50), 3),
+        "p95_ms": round(percentil(latencias, 95), 3),
+        "p99_ms": round(percentil(latencias, 99), 3),
+        "consultas_por_request": round(sum(consultas) / len(consultas), 2) if consultas else None,
+        "db_ms_por_request": round(sum(tiempos_db) / len(tiempos_db), 3) if tiempos_db else None,
+    }
+
+
+async def _recorrer(cliente: httpx.AsyncClient, escenarios, contexto: Contexto, args) -> dict:
+    resultados = {}
+    for escenario in escenarios:
+        resultados[escenario.nombre] = resultado = await medir_escenario(cliente, escenario, contexto, args)
+        print(
+            f"{escenario.nombre:<24} {resultado['requests']:>7} {resultado['errores']:>5} {resultado['req_s']:>9} "
+            f"{resultado['p50_ms']:>9} {resultado['p95_ms']:>9} {resultado['p99_ms']:>9} {resultado['consultas_por_request'] or '-':>8}",
+            flush=True,
+        )
+    return resultados
+
+
+def ejecutar(escenarios, contexto: Contexto, args) -> dict:
+    print(f"{'escenario':<24} {'requests':>7} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'consultas':>8}")
+    if args.driver == "socket":
+        with servidor_uvicorn() as url:
+            async def correr():
+                async with httpx.AsyncClient(base_url=url, timeout=300) as cliente:
+                    return await _recorrer(cliente, escenarios, contexto, args)
+            return asyncio.run(correr())
+
+    from app.main import app
+
+    # Las sospechas de N+1 ya quedan en /internal/consultas; no se mezclan con la tabla.
+    logging.getLogger("app.instrumentacion").setLevel(logging.ERROR)
+
+    async def correr():
+        transporte = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=300) as cliente:
+                return await _recorrer(cliente, escenarios, contexto, args)
+    return asyncio.run(correr())
+
+
+def comparar(actual: dict, base: dict, tolerancia: float) -> list:
+    """
+    Filas (escenario, métrica, base, actual, cambio relativo, es_regresión). Una métrica
+    empeora si cambia más que `tolerancia` en la dirección mala; para las consultas por
+    request cuenta cualquier aumento mayor que TOLERANCIA_CONSULTAS.
+    """
+    filas = []
+    for nombre, resultado in actual["escenarios"].items():
+        anterior = base.get("escenarios", {}).get(nombre)
+        if not anterior:
+            continue
+        for metrica, mas_es_mejor in METRICAS_COMPARADAS:
+            valor_base, valor = anterior.get(metrica), resultado.get(metrica)
+            if valor_base is None or valor is None:
+                continue
+            cambio = (valor - valor_base) / valor_base if valor_base else 0.0
+            if metrica == "consultas_por_request":
+                regresion = valor - valor_base > TOLERANCIA_CONSULTAS
+            else:
+                regresion = cambio < -tolerancia if mas_es_mejor else cambio > tolerancia
+            filas.append((nombre, metrica, valor_base, valor, cambio, regresion))
+    return filas
+
+
+def _commit_actual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--solicitudes", type=int, default=10000, help="Escala de la base (si está vacía o con --recrear).")
+    parser.add_argument("--recrear", action="store_true", help="Regenera los datos antes de medir.")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--driver", choices=("inproceso", "socket"), default="inproceso")
+    parser.add_argument("--modo", choices=("sync", "async"), default="sync", help="Valor de DB_MODO_ASYNC para la API.")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--duracion", type=float, default=5.0, help="Segundos por escenario.")
+    parser.add_argument("--escenarios", nargs="+", help="Subconjunto de escenarios a ejecutar.")
+    parser.add_argument("--con-cache", action="store_true", help="Deja activa la caché de respuestas.")
+    parser.add_argument("--salida", help="Archivo JSON de resultados.")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior usado como línea base.")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Cambio relativo tolerado antes de marcar regresión.")
+    args = parser.parse_args(argv)
+
+    # La configuración se lee al importar la app: el entorno se fija antes.
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/benchmark.db")
+    os.environ["DB_MODO_ASYNC"] = str(args.modo == "async").lower()
+    os.environ["CACHE_ACTIVA"] = str(args.con_cache).lower()
+
+    from app.database import engine
+    from benchmarks.generador import generar
+
+    nombres = {e.nombre for e in ESCENARIOS}
+    desconocidos = set(args.escenarios or ()) - nombres
+    if desconocidos:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+    escenarios = [e for e in ESCENARIOS if not args.escenarios or e.nombre in args.escenarios]
+
+    inicio = time.perf_counter()
+    if generar(engine, args.solicitudes, semilla=args.semilla, recrear=args.recrear):
+        print(f"Base sembrada con {args.solicitudes} solicitudes en {time.perf_counter() - inicio:.1f}s")
+    contexto = Contexto(engine, args.semilla)
+
+    resultado = {
+        "meta": {
+            "fecha": datetime.utcnow().isoformat(timespec="seconds"),
+            "commit": _commit_actual(),
+            "motor": engine.dialect.name,
+            "solicitudes": contexto.total,
+            "semilla": args.semilla,
+            "driver": args.driver,
+            "modo": args.modo,
+            "concurrencia": args.concurrencia,
+            "duracion_s": args.duracion,
+            "cache": args.con_cache,
+            "python": platform.python_version(),
+        },
+        "escenarios": ejecutar(escenarios, contexto, args),
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+        print(f"Resultados en {args.salida}")
+
+    if not args.comparar:
+        return 0
+    with open(args.comparar, encoding="utf-8") as archivo:
+        base = json.load(archivo)
+    distintos = [k for k in ("motor", "solicitudes", "driver", "modo", "concurrencia") if base["meta"].get(k) != resultado["meta"][k]]
+    if distintos:
+        print(f"Aviso: la línea base difiere en {', '.join(distintos)}; la comparación puede no ser significativa.")
+    filas = comparar(resultado, base, args.tolerancia)
+    regresiones = [f for f in filas if f[5]]
+    print(f"\n{'escenario':<24} {'métrica':<22} {'base':>10} {'actual':>10} {'cambio':>8}")
+    for nombre, metrica, valor_base, valor, cambio, regresion in filas:
+        marca = "  REGRESIÓN" if regresion else ""
+        print(f"{nombre:<24} {metrica:<22} {valor_base:>10} {valor:>10} {cambio:>+8.1%}{marca}")
+    print(f"\n{len(regresiones)} regresiones (tolerancia {args.tolerancia:.0%}).")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
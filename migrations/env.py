@@ -0,0 +1,66 @@
+# migrations/env.py
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from app.config import settings
+from app.database import Base
+from app.models import archivo, estadistica, evento, idempotencia, servicio, solicitud, tarea  # noqa: F401  (registra las tablas en Base.metadata)
+
+config = context.config
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Objetos que existen solo en un motor y que autogenerate no debe comparar en los demás.
+INDICES_SOLO_POSTGRESQL = {"ix_solicitudes_cliente_trgm", "ix_solicitudes_archivadas_cliente_trgm"}
+PREFIJO_TABLAS_FTS = "solicitudes_cliente_fts"
+
+
+def incluir_objeto(objeto, nombre, tipo, reflejado, comparado_con):
+    if tipo == "table" and nombre.startswith(PREFIJO_TABLAS_FTS):
+        return False
+    if tipo == "index" and nombre in INDICES_SOLO_POSTGRESQL:
+        return context.get_context().dialect.name == "postgresql"
+    return True
+
+
+def run_migrations_offline() -> None:
+    """Genera el SQL de las migraciones sin conectarse a la base de datos."""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        include_object=incluir_objeto,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=incluir_objeto,
+            # SQLite no soporta la mayoría de ALTER TABLE; batch recrea la tabla.
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
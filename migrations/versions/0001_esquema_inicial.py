@@ -0,0 +1,57 @@
+"""Esquema inicial: solicitudes y servicios.
+
+Corresponde a las tablas que creaba `Base.metadata.create_all`. En una base de
+datos existente basta con `alembic stamp 0001` antes de `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ESTADOS_SOLICITUD = ("ABIERTA", "EN_PROCESO", "CERRADA", "CANCELADA")
+ESTADOS_SERVICIO = ("PENDIENTE", "APROBADO", "RECHAZADO", "VENCIDO")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "solicitudes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cliente", sa.String(length=100), nullable=False),
+        sa.Column("email_cliente", sa.String(length=255), nullable=False),
+        sa.Column("fecha_solicitud", sa.DateTime(), nullable=True),
+        sa.Column("estado", sa.Enum(*ESTADOS_SOLICITUD, name="estadosolicitud"), nullable=True),
+        sa.Column("observaciones", sa.String(length=500), nullable=True),
+        sa.Column("fecha_ultima_modificacion", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_solicitudes_id", "solicitudes", ["id"])
+
+    op.create_table(
+        "servicios",
+        sa.Column("id_servicio", sa.Integer(), primary_key=True),
+        sa.Column("id_solicitud", sa.Integer(), sa.ForeignKey("solicitudes.id"), nullable=False),
+        sa.Column("nombre_servicio", sa.String(length=255), nullable=False),
+        sa.Column("fecha_reunion", sa.DateTime(), nullable=False),
+        sa.Column("estado_servicio", sa.Enum(*ESTADOS_SERVICIO, name="estadoservicio"), nullable=True),
+        sa.Column("comentarios", sa.String(length=500), nullable=True),
+        sa.Column("costo_estimado", sa.Float(), nullable=True),
+    )
+    op.create_index("ix_servicios_id_servicio", "servicios", ["id_servicio"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_servicios_id_servicio", table_name="servicios")
+    op.drop_table("servicios")
+    op.drop_index("ix_solicitudes_id", table_name="solicitudes")
+    op.drop_table("solicitudes")
+    sa.Enum(name="estadoservicio").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="estadosolicitud").drop(op.get_bind(), checkfirst=True)
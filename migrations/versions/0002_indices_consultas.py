@@ -0,0 +1,42 @@
+"""Índices para las consultas calientes de listado y procesamiento.
+
+- servicios(id_solicitud, estado_servicio): clave foránea y NOT EXISTS de cierre.
+- servicios(estado_servicio, fecha_reunion) parcial sobre pendientes: vencimiento.
+- solicitudes(estado, fecha_solicitud) y solicitudes(fecha_solicitud): listado.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SOLO_PENDIENTES = sa.text("estado_servicio = 'PENDIENTE'")
+
+
+def upgrade() -> None:
+    op.create_index("ix_servicios_id_solicitud_estado", "servicios", ["id_solicitud", "estado_servicio"])
+    op.create_index(
+        "ix_servicios_pendientes_fecha_reunion",
+        "servicios",
+        ["estado_servicio", "fecha_reunion"],
+        postgresql_where=SOLO_PENDIENTES,
+        sqlite_where=SOLO_PENDIENTES,
+    )
+    op.create_index("ix_solicitudes_estado_fecha_solicitud", "solicitudes", ["estado", "fecha_solicitud"])
+    op.create_index("ix_solicitudes_fecha_solicitud", "solicitudes", ["fecha_solicitud"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_solicitudes_fecha_solicitud", table_name="solicitudes")
+    op.drop_index("ix_solicitudes_estado_fecha_solicitud", table_name="solicitudes")
+    op.drop_index("ix_servicios_pendientes_fecha_reunion", table_name="servicios")
+    op.drop_index("ix_servicios_id_solicitud_estado", table_name="servicios")
@@ -0,0 +1,60 @@
+"""Índice de búsqueda por subcadena sobre solicitudes.cliente.
+
+- PostgreSQL: extensión pg_trgm e índice GIN `gin_trgm_ops`.
+- SQLite: tabla FTS5 de contenido externo con tokenizador trigram y sus triggers.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FTS = "solicitudes_cliente_fts"
+
+SQLITE_UPGRADE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS} USING fts5("
+    "cliente, content='solicitudes', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS}_ai AFTER INSERT ON solicitudes BEGIN "
+    f"INSERT INTO {FTS}(rowid, cliente) VALUES (new.id, new.cliente); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS}_ad AFTER DELETE ON solicitudes BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, cliente) VALUES ('delete', old.id, old.cliente); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS}_au AFTER UPDATE OF cliente ON solicitudes BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, cliente) VALUES ('delete', old.id, old.cliente); "
+    f"INSERT INTO {FTS}(rowid, cliente) VALUES (new.id, new.cliente); END",
+    # Indexa las filas ya existentes.
+    f"INSERT INTO {FTS}({FTS}) VALUES ('rebuild')",
+)
+
+
+def upgrade() -> None:
+    dialecto = op.get_bind().dialect.name
+    if dialecto == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            "ix_solicitudes_cliente_trgm",
+            "solicitudes",
+            ["cliente"],
+            postgresql_using="gin",
+            postgresql_ops={"cliente": "gin_trgm_ops"},
+        )
+    elif dialecto == "sqlite":
+        for sentencia in SQLITE_UPGRADE:
+            op.execute(sentencia)
+
+
+def downgrade() -> None:
+    dialecto = op.get_bind().dialect.name
+    if dialecto == "postgresql":
+        op.drop_index("ix_solicitudes_cliente_trgm", table_name="solicitudes")
+    elif dialecto == "sqlite":
+        for sufijo in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {FTS}_{sufijo}")
+        op.execute(f"DROP TABLE IF EXISTS {FTS}")
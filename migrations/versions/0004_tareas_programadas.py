@@ -0,0 +1,32 @@
+"""Tabla de coordinación de tareas en segundo plano (lease y marca de agua).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "tareas_programadas",
+        sa.Column("nombre", sa.String(length=100), nullable=False),
+        sa.Column("propietario", sa.String(length=255), nullable=True),
+        sa.Column("lease_hasta", sa.DateTime(), nullable=True),
+        sa.Column("marca_agua", sa.DateTime(), nullable=True),
+        sa.Column("ultima_ejecucion", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("nombre"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("tareas_programadas")
@@ -0,0 +1,48 @@
+"""Contadores de servicios por estado en solicitudes.
+
+Agrega servicios_pendientes/aprobados/rechazados/vencidos y los completa a partir
+de `servicios`. En adelante los mantiene la aplicación (app/services/contadores.py);
+`python -m scripts.contadores verificar` detecta desvíos.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNAS = {
+    "servicios_pendientes": "PENDIENTE",
+    "servicios_aprobados": "APROBADO",
+    "servicios_rechazados": "RECHAZADO",
+    "servicios_vencidos": "VENCIDO",
+}
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("solicitudes") as batch:
+        for columna in COLUMNAS:
+            batch.add_column(sa.Column(columna, sa.Integer(), nullable=False, server_default="0"))
+
+    # Carga inicial con subconsultas correlacionadas (usan ix_servicios_id_solicitud_estado).
+    asignaciones = ", ".join(
+        f"{columna} = (SELECT count(*) FROM servicios "
+        f"WHERE servicios.id_solicitud = solicitudes.id AND servicios.estado_servicio = '{estado}')"
+        for columna, estado in COLUMNAS.items()
+    )
+    op.execute(f"UPDATE solicitudes SET {asignaciones} WHERE EXISTS "
+               "(SELECT 1 FROM servicios WHERE servicios.id_solicitud = solicitudes.id)")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("solicitudes") as batch:
+        for columna in COLUMNAS:
+            batch.drop_column(columna)
@@ -0,0 +1,73 @@
+"""Resumen de estadísticas por (día, cliente), totales por día y cola de buckets a recalcular.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ESTADOS_SOLICITUD = {
+    "solicitudes_abiertas": "ABIERTA",
+    "solicitudes_en_proceso": "EN_PROCESO",
+    "solicitudes_cerradas": "CERRADA",
+    "solicitudes_canceladas": "CANCELADA",
+}
+CONTADORES_SERVICIOS = ["servicios_pendientes", "servicios_aprobados", "servicios_rechazados", "servicios_vencidos"]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "estadisticas_diarias",
+        sa.Column("dia", sa.Date(), nullable=False),
+        sa.Column("cliente", sa.String(length=100), nullable=False),
+        *(sa.Column(columna, sa.Integer(), nullable=False) for columna in [*ESTADOS_SOLICITUD, *CONTADORES_SERVICIOS]),
+        sa.Column("costo_aprobado", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("dia", "cliente"),
+    )
+    op.create_index("ix_estadisticas_diarias_cliente_dia", "estadisticas_diarias", ["cliente", "dia"])
+    op.create_table(
+        "estadisticas_por_dia",
+        sa.Column("dia", sa.Date(), nullable=False),
+        *(sa.Column(columna, sa.Integer(), nullable=False) for columna in [*ESTADOS_SOLICITUD, *CONTADORES_SERVICIOS]),
+        sa.Column("costo_aprobado", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("dia"),
+    )
+    op.create_table(
+        "estadisticas_pendientes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("dia", sa.Date(), nullable=False),
+        sa.Column("cliente", sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+    # Carga inicial: misma agregación que app/services/estadisticas.py.
+    por_estado = ", ".join(f"CASE WHEN estado = '{estado}' THEN 1 ELSE 0 END AS {columna}" for columna, estado in ESTADOS_SOLICITUD.items())
+    columnas = [*ESTADOS_SOLICITUD, *CONTADORES_SERVICIOS, "costo_aprobado"]
+    op.execute(
+        f"INSERT INTO estadisticas_diarias (dia, cliente, {', '.join(columnas)}) "
+        f"SELECT dia, cliente, {', '.join(f'SUM({c})' for c in columnas)} FROM ("
+        f"SELECT date(fecha_solicitud) AS dia, cliente, {por_estado}, {', '.join(CONTADORES_SERVICIOS)}, "
+        "(SELECT COALESCE(SUM(costo_estimado), 0) FROM servicios "
+        "WHERE servicios.id_solicitud = solicitudes.id AND servicios.estado_servicio = 'APROBADO') AS costo_aprobado "
+        "FROM solicitudes) AS por_solicitud GROUP BY dia, cliente"
+    )
+    op.execute(
+        f"INSERT INTO estadisticas_por_dia (dia, {', '.join(columnas)}) "
+        f"SELECT dia, {', '.join(f'SUM({c})' for c in columnas)} FROM estadisticas_diarias GROUP BY dia"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("estadisticas_pendientes")
+    op.drop_table("estadisticas_por_dia")
+    op.drop_index("ix_estadisticas_diarias_cliente_dia", table_name="estadisticas_diarias")
+    op.drop_table("estadisticas_diarias")
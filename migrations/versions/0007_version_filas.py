@@ -0,0 +1,28 @@
+"""Columna version en solicitudes y servicios (concurrencia optimista con If-Match).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for tabla in ("solicitudes", "servicios"):
+        with op.batch_alter_table(tabla) as batch:
+            batch.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    for tabla in ("servicios", "solicitudes"):
+        with op.batch_alter_table(tabla) as batch:
+            batch.drop_column("version")
@@ -0,0 +1,37 @@
+"""Registro de eventos de cambios para GET /api/eventos (SSE).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "eventos",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False),
+        sa.Column("fecha", sa.DateTime(), nullable=False),
+        sa.Column("tipo", sa.String(length=40), nullable=False),
+        sa.Column("id_solicitud", sa.Integer(), nullable=False),
+        sa.Column("id_servicio", sa.Integer(), nullable=True),
+        sa.Column("cliente", sa.String(length=100), nullable=True),
+        sa.Column("estado", sa.String(length=20), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sqlite_autoincrement=True,
+    )
+    op.create_index("ix_eventos_fecha", "eventos", ["fecha"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_eventos_fecha", table_name="eventos")
+    op.drop_table("eventos")
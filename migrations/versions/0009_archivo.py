@@ -0,0 +1,79 @@
+"""Tablas de archivo de solicitudes finalizadas y sus servicios.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ESTADOS_SOLICITUD = ("ABIERTA", "EN_PROCESO", "CERRADA", "CANCELADA")
+ESTADOS_SERVICIO = ("PENDIENTE", "APROBADO", "RECHAZADO", "VENCIDO")
+
+
+def _enum(valores, nombre):
+    # En PostgreSQL el tipo ya existe (lo creó 0001 para las tablas calientes).
+    return sa.Enum(*valores, name=nombre).with_variant(
+        postgresql.ENUM(*valores, name=nombre, create_type=False), "postgresql"
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        "solicitudes_archivadas",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("cliente", sa.String(length=100), nullable=False),
+        sa.Column("email_cliente", sa.String(length=255), nullable=False),
+        sa.Column("fecha_solicitud", sa.DateTime(), nullable=True),
+        sa.Column("estado", _enum(ESTADOS_SOLICITUD, "estadosolicitud"), nullable=True),
+        sa.Column("observaciones", sa.String(length=500), nullable=True),
+        sa.Column("fecha_ultima_modificacion", sa.DateTime(), nullable=True),
+        sa.Column("servicios_pendientes", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("servicios_aprobados", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("servicios_rechazados", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("servicios_vencidos", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.Column("fecha_archivado", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_solicitudes_archivadas_fecha_solicitud", "solicitudes_archivadas", ["fecha_solicitud"])
+    if op.get_bind().dialect.name == "postgresql":
+        op.create_index(
+            "ix_solicitudes_archivadas_cliente_trgm",
+            "solicitudes_archivadas",
+            ["cliente"],
+            postgresql_using="gin",
+            postgresql_ops={"cliente": "gin_trgm_ops"},
+        )
+
+    op.create_table(
+        "servicios_archivados",
+        sa.Column("id_servicio", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("id_solicitud", sa.Integer(), sa.ForeignKey("solicitudes_archivadas.id"), nullable=False),
+        sa.Column("nombre_servicio", sa.String(length=255), nullable=False),
+        sa.Column("fecha_reunion", sa.DateTime(), nullable=False),
+        sa.Column("estado_servicio", _enum(ESTADOS_SERVICIO, "estadoservicio"), nullable=True),
+        sa.Column("comentarios", sa.String(length=500), nullable=True),
+        sa.Column("costo_estimado", sa.Float(), nullable=True),
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        sa.PrimaryKeyConstraint("id_servicio"),
+    )
+    op.create_index("ix_servicios_archivados_id_solicitud", "servicios_archivados", ["id_solicitud"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_servicios_archivados_id_solicitud", table_name="servicios_archivados")
+    op.drop_table("servicios_archivados")
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_solicitudes_archivadas_cliente_trgm", table_name="solicitudes_archivadas")
+    op.drop_index("ix_solicitudes_archivadas_fecha_solicitud", table_name="solicitudes_archivadas")
+    op.drop_table("solicitudes_archivadas")
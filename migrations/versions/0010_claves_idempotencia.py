@@ -0,0 +1,35 @@
+"""Respuestas guardadas de los POST con Idempotency-Key.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "claves_idempotencia",
+        sa.Column("clave", sa.String(length=255), nullable=False),
+        sa.Column("ruta", sa.String(length=255), nullable=False),
+        sa.Column("huella", sa.String(length=64), nullable=False),
+        sa.Column("estado_http", sa.SmallInteger(), nullable=False),
+        sa.Column("cuerpo", sa.LargeBinary(), nullable=False),
+        sa.Column("expira", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("clave"),
+    )
+    op.create_index("ix_claves_idempotencia_expira", "claves_idempotencia", ["expira"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_claves_idempotencia_expira", table_name="claves_idempotencia")
+    op.drop_table("claves_idempotencia")
@@ -0,0 +1,63 @@
+"""AUTOINCREMENT en solicitudes y servicios (solo SQLite).
+
+Sin AUTOINCREMENT, SQLite asigna max(id) + 1, así que tras archivar o borrar la fila
+con el id más alto la siguiente alta reutiliza un id que sigue en el archivo. SQLite
+no permite cambiarlo con ALTER TABLE: las dos tablas se recrean con una operación
+batch. Al recrear `solicitudes` se pierden los triggers de la tabla FTS de 0003, que
+se vuelven a crear. La secuencia arranca en el id más alto de la tabla o de su
+archivo. PostgreSQL no reutiliza valores de una secuencia: no hay nada que cambiar.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FTS = "solicitudes_cliente_fts"
+
+TRIGGERS_FTS = (
+    f"CREATE TRIGGER IF NOT EXISTS {FTS}_ai AFTER INSERT ON solicitudes BEGIN "
+    f"INSERT INTO {FTS}(rowid, cliente) VALUES (new.id, new.cliente); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS}_ad AFTER DELETE ON solicitudes BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, cliente) VALUES ('delete', old.id, old.cliente); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS}_au AFTER UPDATE OF cliente ON solicitudes BEGIN "
+    f"INSERT INTO {FTS}({FTS}, rowid, cliente) VALUES ('delete', old.id, old.cliente); "
+    f"INSERT INTO {FTS}(rowid, cliente) VALUES (new.id, new.cliente); END",
+)
+
+# (tabla, clave, tabla de archivo)
+TABLAS = (("solicitudes", "id", "solicitudes_archivadas"), ("servicios", "id_servicio", "servicios_archivados"))
+
+
+def _recrear(autoincrement: bool) -> None:
+    for sufijo in ("ai", "ad", "au"):
+        op.execute(f"DROP TRIGGER IF EXISTS {FTS}_{sufijo}")
+    for tabla, _, _ in TABLAS:
+        with op.batch_alter_table(tabla, recreate="always", table_kwargs={"sqlite_autoincrement": autoincrement}):
+            pass
+    for sentencia in TRIGGERS_FTS:
+        op.execute(sentencia)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    _recrear(autoincrement=True)
+    for tabla, clave, archivo in TABLAS:
+        maximo = f"max(coalesce((SELECT max({clave}) FROM {tabla}), 0), coalesce((SELECT max({clave}) FROM {archivo}), 0))"
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{tabla}'")
+        op.execute(f"INSERT INTO sqlite_sequence (name, seq) VALUES ('{tabla}', {maximo})")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    _recrear(autoincrement=False)
@@ -0,0 +1,43 @@
+"""
+Verifica o repara los contadores de servicios por estado de `solicitudes`.
+
+Compara cada contador con el conteo real en `servicios`, por rangos de id. `verificar`
+solo informa y termina con código 1 si hay desvíos; `reparar` los corrige con un
+commit por rango y encola los buckets de estadísticas de las solicitudes corregidas,
+que el programador recalcula en su próxima pasada.
+
+Uso:
+    python -m scripts.contadores verificar
+    python -m scripts.contadores reparar [--lote 5000]
+"""
+import argparse
+import json
+import sys
+
+from app.database import SessionLocal
+from app.services import contadores, estadisticas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("accion", choices=["verificar", "reparar"])
+    parser.add_argument("--lote", type=int, default=contadores.TAMANO_LOTE_POR_DEFECTO, help="Solicitudes por rango.")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        resultado = contadores.recalcular_por_lotes(
+            db, args.lote, solo_verificar=args.accion == "verificar", al_reparar=estadisticas.marcar
+        )
+    finally:
+        db.close()
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.accion == "verificar" and resultado["con_desvio"]:
+        print(f"{resultado['con_desvio']} solicitudes con contadores desviados.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Simula réplicas de lectura locales con archivos SQLite.
+
+Copia la base primaria (DATABASE_URL) sobre cada archivo de DB_REPLICA_URLS con la
+API de backup de SQLite. Con `--intervalo` repite la copia cada N segundos, lo que
+equivale a una réplica con hasta N segundos de retraso: sirve para probar el ruteo de
+lecturas y el token X-Token-Lectura sin un servidor de bases de datos.
+
+Uso:
+    DATABASE_URL=sqlite:///./primaria.db \\
+    DB_REPLICA_URLS=sqlite:///./replica1.db,sqlite:///./replica2.db \\
+    python -m scripts.replica_local [--intervalo 2]
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+
+def _ruta(url: str) -> str:
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise SystemExit(f"Solo se admiten archivos SQLite: {url!r}")
+    return url.database
+
+
+def copiar(origen: str, destinos: list) -> None:
+    with sqlite3.connect(origen) as fuente:
+        for destino in destinos:
+            with sqlite3.connect(destino) as copia:
+                fuente.backup(copia)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--intervalo", type=float, default=0, help="Segundos entre copias (0: una sola copia).")
+    args = parser.parse_args(argv)
+
+    if not settings.DB_REPLICA_URLS:
+        print("DB_REPLICA_URLS está vacío.", file=sys.stderr)
+        return 1
+    origen = _ruta(settings.DATABASE_URL)
+    destinos = [_ruta(url) for url in settings.DB_REPLICA_URLS]
+    while True:
+        copiar(origen, destinos)
+        print(f"Copiado {origen} -> {', '.join(destinos)}")
+        if not args.intervalo:
+            return 0
+        time.sleep(args.intervalo)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Verifica que las consultas calientes de la API se resuelven con índices.
+
+Crea el esquema (si hace falta), siembra datos sintéticos cuando la base está vacía,
+ejecuta EXPLAIN sobre cada consulta -construida con el mismo código que usan los
+routers- y falla si el plan no usa el índice esperado.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m scripts.verificar_indices
+    python -m scripts.verificar_indices            # SQLite temporal
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/verificar_indices.db"
+
+from sqlalchemy import insert, select, text  # noqa: E402
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.servicio import EstadoServicio, Servicio  # noqa: E402
+from app.models.solicitud import EstadoSolicitud, Solicitud  # noqa: E402
+from app.services import contadores, procesamiento, solicitudes  # noqa: E402
+from app.services.explain import Explain  # noqa: E402
+
+
+def consultas_calientes(db):
+    """(nombre, sentencia, índice esperado) para cada consulta caliente."""
+    hoy = datetime.utcnow().date()
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    return [
+        (
+            "servicios vencidos (procesamiento)",
+            select(Servicio.id_servicio).where(procesamiento.filtro_servicios_vencidos(hoy)),
+            "ix_servicios_pendientes_fecha_reunion",
+        ),
+        (
+            "solicitudes a cerrar (procesamiento)",
+            select(Solicitud.id).where(procesamiento.filtro_solicitudes_a_cerrar(hoy)),
+            "ix_solicitudes_estado_fecha_solicitud",
+        ),
+        (
+            "listado por estado ordenado por fecha",
+            solicitudes.ordenar(
+                db,
+                solicitudes.aplicar_filtros(db, select(Solicitud), estado=EstadoSolicitud.ABIERTA),
+                "fecha_solicitud",
+                "asc",
+            ).limit(10),
+            "ix_solicitudes_estado_fecha_solicitud",
+        ),
+        (
+            "listado por rango de fechas",
+            solicitudes.aplicar_filtros(
+                db, select(Solicitud), fecha_desde=hoy - timedelta(days=7), fecha_hasta=hoy - timedelta(days=1)
+            ),
+            "ix_solicitudes_fecha_solicitud",
+        ),
+        (
+            "búsqueda por subcadena de cliente",
+            solicitudes.aplicar_filtros(db, select(Solicitud.id), cliente="liente 1"),
+            # En SQLite el índice es la tabla FTS5 (MATCH => "INDEX 0:M").
+            "solicitudes_cliente_fts VIRTUAL TABLE INDEX 0:M" if sqlite else "ix_solicitudes_cliente_trgm",
+        ),
+        (
+            "servicios de una solicitud",
+            select(Servicio).where(Servicio.id_solicitud == 1),
+            "ix_servicios_id_solicitud_estado",
+        ),
+    ]
+
+
+def sembrar(db, cantidad: int, semilla: int = 42) -> None:
+    """Inserta `cantidad` solicitudes con 1 a 4 servicios cada una si la base está vacía."""
+    if db.execute(select(Solicitud.id).limit(1)).first() is not None:
+        return
+    azar = random.Random(semilla)
+    ahora = datetime.utcnow()
+    estados = list(EstadoSolicitud)
+    estados_servicio = list(EstadoServicio)
+    filas = [
+        {
+            "id": i,
+            "cliente": f"Cliente {azar.randrange(cantidad // 10 + 1)}",
+            "email_cliente": f"cliente{i}@example.com",
+            "fecha_solicitud": ahora - timedelta(days=azar.randrange(365), seconds=azar.randrange(86400)),
+            "estado": azar.choice(estados),
+            "fecha_ultima_modificacion": ahora,
+        }
+        for i in range(1, cantidad + 1)
+    ]
+    db.execute(insert(Solicitud), filas)
+    servicios = [
+        {
+            "id_solicitud": fila["id"],
+            "nombre_servicio": "Servicio sintético",
+            "fecha_reunion": ahora + timedelta(days=azar.randrange(-180, 180)),
+            "estado_servicio": azar.choice(estados_servicio),
+        }
+        for fila in filas
+        for _ in range(azar.randint(1, 4))
+    ]
+    db.execute(insert(Servicio), servicios)
+    contadores.recalcular(db)
+    db.commit()
+
+
+def plan(db, sentencia) -> str:
+    filas = db.execute(Explain(sentencia)).all()
+    # SQLite devuelve (id, parent, notused, detail); PostgreSQL una columna de texto.
+    return "\n".join(str(fila[-1]) for fila in filas)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=20000, help="Solicitudes a sembrar si la base está vacía.")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        sembrar(db, args.filas)
+        db.execute(text("ANALYZE"))
+        db.commit()
+        fallos = 0
+        for nombre, sentencia, indice in consultas_calientes(db):
+            texto_plan = plan(db, sentencia)
+            ok = indice in texto_plan
+            fallos += not ok
+            print(f"[{'OK' if ok else 'FALLO'}] {nombre}: se espera {indice}")
+            if not ok:
+                print("    " + texto_plan.replace("\n", "\n    "))
+        return 1 if fallos else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())